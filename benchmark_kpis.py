@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark script to compare the single-pass KPI engine against the
+per-metric filter-and-copy implementation on synthetic production data
+"""
+
+import sys
+import os
+import time
+from datetime import datetime
+
+# Add the project root to Python path for imports
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+import pandas as pd
+from services.kpi_service import KPIService
+from utils.kpi_accumulator import KPIAccumulator
+from utils.duckdb_backend import DUCKDB_AVAILABLE, DuckDBMetrics, compare_backends
+from utils.data_cache import frame_cache, kpi_cache
+from services.detailed_report_service import DetailedReportService
+from config import config
+from utils.production_metrics import (
+    compute_metric_sackoff,
+    compute_metric_pdi_mean_agroindustrial,
+    compute_metric_dureza_mean_agroindustrial,
+    compute_metric_fino_mean_agroindustrial,
+    compute_metric_diferencia_toneladas,
+    filter_con_adiflow,
+    filter_sin_adiflow,
+)
+
+
+def generate_synthetic_data(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Genera órdenes de producción sintéticas con las columnas de produccion_aliar."""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(datetime.now()).normalize() + pd.Timedelta(days=1)
+    fechas = end - pd.to_timedelta(rng.uniform(0, 400, n_rows), unit="D")
+    a_producir = rng.uniform(5, 40, n_rows).round(2)
+    producidas = (a_producir * rng.uniform(0.97, 1.01, n_rows)).round(2)
+    anuladas = np.where(rng.random(n_rows) < 0.1, rng.uniform(0, 1, n_rows), 0).round(2)
+
+    def quality(mean, std):
+        values = rng.normal(mean, std, n_rows)
+        return np.where(rng.random(n_rows) < 0.1, np.nan, values)
+
+    return pd.DataFrame({
+        "orden_produccion": np.arange(n_rows).astype(str),
+        "fecha_produccion": fechas,
+        "planta": rng.choice(["Planta 1", "Planta 2"], n_rows),
+        "nombre_producto": rng.choice([f"PRODUCTO {i}" for i in range(40)], n_rows),
+        "toneladas_a_producir": a_producir,
+        "toneladas_producidas": producidas,
+        "toneladas_anuladas": anuladas,
+        "tiene_adiflow": rng.choice(["Con Adiflow", "Sin Adiflow"], n_rows),
+        "order_produccion_despachada": rng.choice(["Si", "No"], n_rows, p=[0.85, 0.15]),
+        "durabilidad_pct_qa_agroindustrial": quality(92, 2),
+        "dureza_qa_agroindustrial": quality(10, 1),
+        "finos_pct_qa_agroindustrial": quality(5, 1),
+        "peso_agua_kg": rng.uniform(100, 1200, n_rows),
+        "sackoff_por_orden_produccion": (a_producir - producidas - anuladas) / producidas * 100,
+    })
+
+
+def legacy_calculate_kpis(df: pd.DataFrame) -> dict:
+    """Cálculo de KPIs filtrando y copiando el DataFrame por cada métrica."""
+    now = datetime.now()
+    current_month, current_year = now.month, now.year
+    prev_month, prev_year = (12, current_year - 1) if current_month == 1 else (current_month - 1, current_year)
+
+    df_current = df[(df['fecha_produccion'].dt.month == current_month) & (df['fecha_produccion'].dt.year == current_year)]
+    df_prev = df[(df['fecha_produccion'].dt.month == prev_month) & (df['fecha_produccion'].dt.year == prev_year)]
+
+    def to_1_decimal(val):
+        return float(f"{val:.1f}") if val is not None else None
+
+    values = {
+        'pdi_mean_agroindustrial': (compute_metric_pdi_mean_agroindustrial, df_current, df_prev),
+        'dureza_mean_agroindustrial': (compute_metric_dureza_mean_agroindustrial, df_current, df_prev),
+        'fino_mean_agroindustrial': (compute_metric_fino_mean_agroindustrial, df_current, df_prev),
+        'sackoff_con_adiflow': (compute_metric_sackoff, filter_con_adiflow(df_current), filter_con_adiflow(df_prev)),
+        'sackoff_sin_adiflow': (compute_metric_sackoff, filter_sin_adiflow(df_current), filter_sin_adiflow(df_prev)),
+    }
+    kpis = {k: (to_1_decimal(fn(cur)), to_1_decimal(fn(prev))) for k, (fn, cur, prev) in values.items()}
+    kpis['diferencia_toneladas'] = (
+        round(compute_metric_diferencia_toneladas(df_current), 1),
+        round(compute_metric_diferencia_toneladas(df_prev), 1),
+    )
+    return kpis
+
+
+def time_call(fn, repeat: int) -> float:
+    """Devuelve el mejor tiempo (en ms) de varias ejecuciones."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def same_value(a, b, tolerance: float = 1e-9) -> bool:
+    """Igualdad con tolerancia: las sumas agrupadas pueden diferir en los últimos bits."""
+    if a is None or b is None:
+        return a is b
+    if pd.isna(a) and pd.isna(b):
+        return True
+    return bool(np.isclose(a, b, rtol=tolerance, atol=tolerance))
+
+
+def same_kpis(a: dict, b: dict) -> bool:
+    """Compara dos diccionarios de KPIs del tablero con same_value en cada número."""
+    if a.keys() != b.keys():
+        return False
+    for key in a:
+        for field, value in a[key].items():
+            other = b[key].get(field)
+            if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+                if not same_value(value, other):
+                    return False
+            elif value != other:
+                return False
+    return True
+
+
+def main() -> bool:
+    """Ejecuta el benchmark; devuelve False si algún resultado difiere."""
+    ok = True
+    print("⏱️ Benchmark de KPIs de Producción")
+    print("=" * 50)
+
+    for n_rows in (10_000, 100_000, 500_000):
+        df = generate_synthetic_data(n_rows)
+        service = KPIService(df)
+
+        # Verificar que el motor de una sola pasada reproduce el resultado anterior
+        kpis = service.calculate_kpis()
+        legacy = legacy_calculate_kpis(service.df)
+        mismatches = [
+            k for k, (cur, prev) in legacy.items()
+            if not (same_value(kpis[k]['current'], cur) and same_value(kpis[k]['previous'], prev))
+        ]
+
+        legacy_ms = time_call(lambda: legacy_calculate_kpis(service.df), repeat=5)
+        single_pass_ms = time_call(service.calculate_kpis, repeat=5)
+
+        print(f"\n📊 {n_rows:,} filas")
+        print(f"   Filtro y copia por métrica: {legacy_ms:8.1f} ms")
+        print(f"   Agregación de una pasada:   {single_pass_ms:8.1f} ms")
+        print(f"   Aceleración:                {legacy_ms / single_pass_ms:8.1f}x")
+        if mismatches:
+            print(f"   ❌ Diferencias en: {', '.join(mismatches)}")
+            ok = False
+        else:
+            print("   ✅ Resultados iguales (tolerancia 1e-9)")
+
+    # Llegada de nuevas órdenes: recálculo completo vs acumulador incremental
+    print("\n📥 Nuevas órdenes sobre 500,000 filas de histórico")
+    history = generate_synthetic_data(500_000)
+    new_orders = generate_synthetic_data(5_000, seed=7)
+    accumulator = KPIAccumulator(history)
+    full = pd.concat([history, new_orders], ignore_index=True)
+
+    full_ms = time_call(lambda: KPIService(full).calculate_kpis(), repeat=3)
+    start = time.perf_counter()
+    accumulator.add(new_orders)
+    incremental = accumulator.to_kpis()
+    incremental_ms = (time.perf_counter() - start) * 1000
+
+    print(f"   Recálculo completo:         {full_ms:8.1f} ms")
+    print(f"   Acumulador incremental:     {incremental_ms:8.1f} ms")
+    if same_kpis(incremental, KPIService(full).calculate_kpis()):
+        print("   ✅ Resultados iguales (tolerancia 1e-9)")
+    else:
+        print("   ❌ El acumulador difiere del recálculo completo")
+        ok = False
+
+    # Secciones del informe detallado: secuencial vs pool de hilos
+    print(f"\n🧵 Secciones del informe detallado (100,000 filas, {os.cpu_count()} núcleos)")
+    df = generate_synthetic_data(100_000)
+    configured_workers = config.REPORT_SECTION_WORKERS
+    for workers in sorted({1, 4, configured_workers}):
+        config.REPORT_SECTION_WORKERS = workers
+        kpi_cache.clear()
+        frame_cache.clear()
+        report = DetailedReportService(df).generate_detailed_report()
+        print(f"   {workers} hilo(s):                  {report['tiempo_total'] * 1000:8.1f} ms "
+              f"(suma {sum(report['tiempos_secciones'].values()) * 1000:.1f} ms, "
+              f"cadena crítica {report['tiempo_cadena_critica'] * 1000:.1f} ms)")
+    config.REPORT_SECTION_WORKERS = configured_workers
+
+    # Backend DuckDB opcional: paridad con el motor pandas y tiempos
+    print("\n🦆 Backend DuckDB")
+    if not DUCKDB_AVAILABLE:
+        print("   ⚠️ duckdb no está instalado (pip install duckdb); se omite la comparación")
+        return ok
+    for n_rows in (100_000, 500_000):
+        df = generate_synthetic_data(n_rows)
+        service = KPIService(df)
+        start = time.perf_counter()
+        backend = DuckDBMetrics(service.df)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        pandas_ms = time_call(service.calculate_kpis, repeat=5)
+        duckdb_ms = time_call(backend.calculate_kpis, repeat=5)
+        mismatches = {
+            by: compare_backends(df, by)
+            for by in (("nombre_producto",), ("planta", "tiene_adiflow"), ("nombre_producto", "tiene_adiflow"))
+        }
+        mismatches = {by: cols for by, cols in mismatches.items() if cols}
+
+        print(f"\n📊 {n_rows:,} filas")
+        print(f"   pandas:                     {pandas_ms:8.1f} ms")
+        print(f"   DuckDB:                     {duckdb_ms:8.1f} ms")
+        print(f"   Carga en DuckDB (una vez):  {load_ms:8.1f} ms")
+        kpis_match = same_kpis(backend.calculate_kpis(), service.calculate_kpis())
+        backend.close()
+        if not kpis_match or mismatches:
+            ok = False
+        if not kpis_match:
+            print("   ❌ Los KPIs del dashboard difieren entre backends")
+        elif mismatches:
+            for by, cols in mismatches.items():
+                print(f"   ❌ Medidas por {', '.join(by)} difieren en: {', '.join(cols)}")
+        else:
+            print("   ✅ Resultados iguales (tolerancia 1e-9)")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -66,6 +66,25 @@ class Config:
     MAX_IMAGES_PER_SESSION: int = int(os.getenv("MAX_IMAGES_PER_SESSION", "20"))  # Máximo número de imágenes por sesión
     CLEANUP_INTERVAL_SECONDS: int = int(os.getenv("CLEANUP_INTERVAL_SECONDS", "691200"))  # Intervalo de limpieza en segundos (8 días)
     
+    # KPI Cache Configuration
+    KPI_CACHE_MAX_ENTRIES: int = int(os.getenv("KPI_CACHE_MAX_ENTRIES", "128"))  # Máximo de resultados de KPIs memorizados
+    FRAME_CACHE_MAX_ENTRIES: int = int(os.getenv("FRAME_CACHE_MAX_ENTRIES", "8"))  # Máximo de motores de periodos y cubos de KPIs memorizados (guardan copias de los datos)
+    REPORT_CACHE_MAX_ENTRIES: int = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "4"))  # Máximo de informes detallados memorizados (incluyen gráficos)
+    REPORT_SECTION_WORKERS: int = int(os.getenv("REPORT_SECTION_WORKERS", "1"))  # Hilos para generar las secciones del informe (1 = secuencial; más hilos solo ayudan con varios núcleos)
+    
+    # Period Configuration
+    PLANT_TIMEZONE: str = os.getenv("PLANT_TIMEZONE", "America/Bogota")  # Zona horaria de la planta ('' = hora del servidor)
+    FISCAL_MONTH_START_DAY: int = int(os.getenv("FISCAL_MONTH_START_DAY", "1"))  # Día de inicio del mes fiscal (1 = mes calendario)
+    SHIFT_START_TIMES: str = os.getenv("SHIFT_START_TIMES", "06:00,14:00,22:00")  # Horas de inicio de los turnos
+    
+    # Bootstrap Configuration
+    BOOTSTRAP_RESAMPLES: int = int(os.getenv("BOOTSTRAP_RESAMPLES", "2000"))  # Remuestras de los intervalos de confianza
+    BOOTSTRAP_CONFIDENCE: float = float(os.getenv("BOOTSTRAP_CONFIDENCE", "0.95"))  # Nivel de confianza de los intervalos
+    
+    # Metrics Backend Configuration
+    METRICS_BACKEND: str = os.getenv("METRICS_BACKEND", "pandas").lower()  # 'pandas' o 'duckdb' (requiere pip install duckdb)
+    DUCKDB_THREADS: int = int(os.getenv("DUCKDB_THREADS", "0"))  # Hilos de DuckDB (0 = todos los núcleos)
+    
     @classmethod
     def validate_config(cls) -> bool:
         """Validate that all required configuration is present."""
@@ -33,8 +33,21 @@ try:
         filter_sin_adiflow,
         calculate_kpis,
         analyze_trends,
-        detect_anomalies
+        summarize_trends,
+        detect_anomalies,
+        compute_product_sackoff,
+        rank_products_by_sackoff,
+        compute_rolling_kpis,
+        ProductionFilter
     )
+    from services.kpi_cube import get_kpi_cube
+    from utils.anomaly_detection import detect_anomalies_robust, get_anomaly_table
+    from utils.sackoff_decomposition import get_sackoff_decomposition
+    from utils.bootstrap import bootstrap_sackoff, bootstrap_sackoff_difference, bootstrap_mean_difference
+    from utils.adiflow_simulator import get_adiflow_simulation
+    from utils.change_points import get_weekly_change_points
+    from utils.forecasting import get_kpi_forecasts
+    from utils.spc import get_spc_limits, get_spc_summary
     PRODUCTION_METRICS_AVAILABLE = True
 except ImportError as e:
     logger.warning(f"Could not import production metrics: {e}")
@@ -341,7 +354,24 @@ def create_safe_execution_environment() -> dict:
             'filter_sin_adiflow': filter_sin_adiflow,
             'calculate_kpis': calculate_kpis,
             'analyze_trends': analyze_trends,
+            'summarize_trends': summarize_trends,
             'detect_anomalies': detect_anomalies,
+            'compute_product_sackoff': compute_product_sackoff,
+            'rank_products_by_sackoff': rank_products_by_sackoff,
+            'compute_rolling_kpis': compute_rolling_kpis,
+            'ProductionFilter': ProductionFilter,
+            'get_kpi_cube': get_kpi_cube,
+            'detect_anomalies_robust': detect_anomalies_robust,
+            'get_anomaly_table': get_anomaly_table,
+            'get_sackoff_decomposition': get_sackoff_decomposition,
+            'bootstrap_sackoff': bootstrap_sackoff,
+            'bootstrap_sackoff_difference': bootstrap_sackoff_difference,
+            'bootstrap_mean_difference': bootstrap_mean_difference,
+            'get_adiflow_simulation': get_adiflow_simulation,
+            'get_weekly_change_points': get_weekly_change_points,
+            'get_kpi_forecasts': get_kpi_forecasts,
+            'get_spc_limits': get_spc_limits,
+            'get_spc_summary': get_spc_summary,
         })
     
     # Agregar función de conversión de fechas segura
@@ -359,8 +389,9 @@ def create_safe_execution_environment() -> dict:
             if date_column not in df.columns:
                 return df
             
-            # Asegurar que la columna de fecha sea datetime
-            df[date_column] = pd.to_datetime(df[date_column])
+            # Asegurar que la columna de fecha sea datetime (en una copia: el DataFrame
+            # es compartido y su versión en caché no detecta cambios de valores)
+            df = df.assign(**{date_column: pd.to_datetime(df[date_column])})
             
             if start_date:
                 df = df[df[date_column] >= pd.to_datetime(start_date)]
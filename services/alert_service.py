@@ -0,0 +1,231 @@
+"""
+Alert Service for OkuoAgent
+Declarative KPI threshold rules evaluated incrementally on weekly additive state
+"""
+
+import operator
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.production_metrics import compute_additive_measures, derive_kpi_columns, period_start
+from utils.kpi_accumulator import MEASURE_COLUMNS
+from utils.data_cache import memoize_kpis
+from utils.period_engine import plant_now
+
+
+GROUP_KEYS = ['semana', 'nombre_producto', 'tiene_adiflow']
+MISSING_KEY = '(sin dato)'
+ONE_WEEK = pd.Timedelta(weeks=1)
+
+# Threshold operators on the KPI value; 'cae'/'sube' compare against the previous week
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+}
+CHANGE_OPERATORS = ('cae', 'sube')
+
+# Rule fields:
+#   id, kpi (derive_kpi_columns column), operador, umbral, por (subset of
+#   nombre_producto / tiene_adiflow), filtros ({level: value or [values]}),
+#   min_ordenes (dispatched orders needed to evaluate), severidad, mensaje
+DEFAULT_ALERT_RULES = [
+    {
+        'id': 'sackoff_semanal_adiflow',
+        'kpi': 'sackoff',
+        'operador': '>',
+        'umbral': -0.3,
+        'por': ['tiene_adiflow'],
+        'filtros': {'tiene_adiflow': ['Con Adiflow', 'Sin Adiflow']},
+        'min_ordenes': 1,
+        'severidad': 'alta',
+        'mensaje': 'Sackoff semanal por encima de la línea objetivo de -0.3%',
+    },
+    {
+        'id': 'caida_pdi_producto',
+        'kpi': 'pdi_mean_agroindustrial',
+        'operador': 'cae',
+        'umbral': 1.0,
+        'por': ['nombre_producto'],
+        'filtros': {},
+        'min_ordenes': 0,
+        'severidad': 'media',
+        'mensaje': 'El PDI del producto cayó frente a la semana anterior',
+    },
+]
+
+
+def _validate_rule(rule: Dict) -> Dict:
+    rule = {'por': [], 'filtros': {}, 'min_ordenes': 0, 'severidad': 'media', 'mensaje': '', **rule}
+    for field in ('id', 'kpi', 'operador', 'umbral'):
+        if field not in rule:
+            raise ValueError(f"Alert rule is missing '{field}': {rule}")
+    if rule['operador'] not in OPERATORS and rule['operador'] not in CHANGE_OPERATORS:
+        raise ValueError(f"Unknown operator '{rule['operador']}' in rule '{rule['id']}'")
+    unknown = [level for level in [*rule['por'], *rule['filtros']] if level not in GROUP_KEYS[1:]]
+    if unknown:
+        raise ValueError(f"Unknown group levels {unknown} in rule '{rule['id']}'")
+    rule['por'] = list(rule['por'])
+    return rule
+
+
+class AlertEngine:
+    """
+    Incremental evaluation of declarative KPI threshold rules
+
+    The engine keeps additive measures per (semana, producto, Adiflow).
+    New orders are aggregated on their own and added to that state, and
+    only the (week, group) cells they touch are re-evaluated, plus the
+    following week for rules that compare against the previous week.
+    The order history is never rescanned.
+    """
+
+    def __init__(self, rules: Optional[List[Dict]] = None, df: Optional[pd.DataFrame] = None):
+        """
+        Initialize the engine
+
+        Args:
+            rules: Alert rules (defaults to DEFAULT_ALERT_RULES)
+            df: Initial production history (optional)
+        """
+        self.rules = [_validate_rule(rule) for rule in (rules or DEFAULT_ALERT_RULES)]
+        self._state = pd.DataFrame(
+            {col: pd.Series(dtype=float) for col in MEASURE_COLUMNS},
+            index=pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), [], []], names=GROUP_KEYS),
+        )
+        self._alerts: Dict[tuple, Dict] = {}
+        if df is not None:
+            self.add(df)
+
+    @staticmethod
+    def _measures(rows: pd.DataFrame) -> pd.DataFrame:
+        """Additive measures of a batch of orders per (semana, producto, Adiflow)"""
+        semana = period_start(rows['fecha_produccion'], 'W').rename('semana')
+        keys = [
+            semana,
+            rows['nombre_producto'].fillna(MISSING_KEY).rename('nombre_producto'),
+            rows['tiene_adiflow'].fillna(MISSING_KEY).rename('tiene_adiflow'),
+        ]
+        measures = compute_additive_measures(rows, keys, mask=semana.notna().to_numpy())
+        return measures[MEASURE_COLUMNS].astype(float)
+
+    def _apply(self, delta: pd.DataFrame, sign: float) -> None:
+        if delta.empty:
+            return
+        state = self._state.add(delta * sign, fill_value=0.0)
+        counts = state[[col for col in MEASURE_COLUMNS if col == 'ordenes_despachadas' or col.endswith('_count')]]
+        self._state = state[(counts != 0).any(axis=1)]
+        for rule in self.rules:
+            self._evaluate(rule, delta.index)
+
+    def add(self, rows: pd.DataFrame) -> 'AlertEngine':
+        """Add new production orders and re-check the affected groups"""
+        self._apply(self._measures(rows), 1.0)
+        return self
+
+    def remove(self, rows: pd.DataFrame) -> 'AlertEngine':
+        """Remove previously added orders and re-check the affected groups"""
+        self._apply(self._measures(rows), -1.0)
+        return self
+
+    def _rule_frame(self, rule: Dict, levels: List[str]) -> Tuple[np.ndarray, pd.Index]:
+        """State index restricted to the rule filters and projected to the rule levels"""
+        index = self._state.index
+        mask = np.ones(len(index), dtype=bool)
+        for level, value in rule['filtros'].items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= index.get_level_values(level).isin(list(values))
+        return mask, index.droplevel([level for level in GROUP_KEYS if level not in levels])
+
+    def _evaluate(self, rule: Dict, touched: pd.MultiIndex) -> None:
+        """Re-evaluate a rule on the (week, group) cells touched by a batch"""
+        levels = ['semana'] + rule['por']
+        affected = touched.droplevel([level for level in GROUP_KEYS if level not in levels]).unique()
+        is_change = rule['operador'] in CHANGE_OPERATORS
+        if is_change:
+            # A new week also changes the comparison of the following one
+            shifted = affected.set_levels(affected.levels[0] + ONE_WEEK, level=0) \
+                if len(levels) > 1 else affected + ONE_WEEK
+            affected = affected.union(shifted)
+        needed = affected
+        if is_change:
+            previous = affected.set_levels(affected.levels[0] - ONE_WEEK, level=0) \
+                if len(levels) > 1 else affected - ONE_WEEK
+            needed = affected.union(previous)
+
+        mask, projected = self._rule_frame(rule, levels)
+        selected = mask & projected.isin(needed)
+        measures = self._state[selected].groupby(level=levels).sum()
+        kpis = derive_kpi_columns(measures)
+        valid = kpis['ordenes_despachadas'] >= rule['min_ordenes']
+        values = kpis[rule['kpi']].where(valid)
+
+        if is_change:
+            index = values.index
+            previous_keys = index.set_levels(index.levels[0] - ONE_WEEK, level=0) \
+                if len(levels) > 1 else index - ONE_WEEK
+            reference = pd.Series(values.reindex(previous_keys).to_numpy(), index=index)
+            change = values - reference
+            fired = change <= -rule['umbral'] if rule['operador'] == 'cae' else change >= rule['umbral']
+        else:
+            reference = pd.Series(rule['umbral'], index=values.index)
+            fired = OPERATORS[rule['operador']](values, rule['umbral'])
+        fired &= values.notna() & reference.notna()
+
+        for key in affected:
+            self._alerts.pop((rule['id'], key), None)
+        for key in values.index[fired.to_numpy()].intersection(affected):
+            key_tuple = key if isinstance(key, tuple) else (key,)
+            self._alerts[(rule['id'], key)] = {
+                'regla': rule['id'],
+                'kpi': rule['kpi'],
+                'tipo': 'cambio' if is_change else 'umbral',
+                'semana': key_tuple[0],
+                'grupo': dict(zip(rule['por'], key_tuple[1:])),
+                'valor': values[key],
+                'referencia': reference[key],
+                'umbral': rule['umbral'],
+                'severidad': rule['severidad'],
+                'mensaje': rule['mensaje'],
+            }
+
+    def alerts(self, last_weeks: Optional[int] = None, now: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        Fired alerts, most recent week first
+
+        Args:
+            last_weeks: Only alerts of the last N weeks, current week included (all when None)
+            now: Reference date for last_weeks (defaults to the plant's current time)
+
+        Returns:
+            DataFrame with regla, kpi, tipo ('umbral' or 'cambio'), semana,
+            grupo, valor, referencia (threshold or previous week), umbral,
+            severidad and mensaje
+        """
+        columns = ['regla', 'kpi', 'tipo', 'semana', 'grupo', 'valor', 'referencia', 'umbral', 'severidad', 'mensaje']
+        table = pd.DataFrame(list(self._alerts.values()), columns=columns)
+        if last_weeks is not None and not table.empty:
+            semanas = pd.to_datetime(table['semana'])
+            now = plant_now() if now is None else pd.Timestamp(now)
+            current_week = period_start(pd.Series([now]), 'W').iloc[0]
+            table = table[semanas > current_week - last_weeks * ONE_WEEK]
+        return table.sort_values(['semana', 'severidad', 'regla'], ascending=[False, True, True]).reset_index(drop=True)
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+
+def get_alert_engine(df: pd.DataFrame) -> AlertEngine:
+    """
+    Alert engine with the default rules, built once per data version
+
+    Args:
+        df: DataFrame with production data
+
+    Returns:
+        Shared AlertEngine instance; call add() on it for new orders
+    """
+    return memoize_kpis(df, 'alert_engine', lambda: AlertEngine(df=df))
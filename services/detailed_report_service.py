@@ -10,6 +10,7 @@ from typing import Dict, List, Optional, Tuple
 import json
 import os
 from services.kpi_service import KPIService
+from services.kpi_cube import KPICube, get_kpi_cube
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
@@ -22,7 +23,25 @@ from utils.production_metrics import (
     filter_con_adiflow,
     filter_sin_adiflow,
     compute_metric_diferencia_toneladas,
+    compute_additive_measures,
+    derive_kpi_columns,
+    ProductionFilter,
+    analyze_trends,
+    summarize_trends,
 )
+from utils.bootstrap import bootstrap_mean_difference, bootstrap_sackoff_difference
+from utils.adiflow_simulator import get_adiflow_simulation
+from utils.change_points import detect_change_points_batch, get_weekly_change_points
+from utils.forecasting import get_kpi_forecasts
+from utils.spc import SPC_METRICS, get_spc_summary
+from utils.period_engine import REPORTING_MONTH, get_period_engine, local_dates
+from utils.data_cache import BoundedCache, get_data_version, kpi_cache, kpi_cache_key, memoize_kpis
+from utils.section_executor import Section, run_sections
+from utils.logger import logger
+
+
+# Informes completos memorizados; pocos, porque cada uno guarda sus gráficos
+report_cache = BoundedCache(config.REPORT_CACHE_MAX_ENTRIES)
 
 
 class DetailedReportService:
@@ -35,41 +54,33 @@ class DetailedReportService:
         Args:
             df: DataFrame con datos de producción
         """
-        self.df = df.copy()
+        # Sin copias: los análisis solo leen self.df (nunca lo modifiques en sitio)
+        self.df = df
         self.kpi_service = KPIService(df)
+        self.data_version = get_data_version(df)
+        self._source_df = df
         
-        # Preparar datos
+        # Preparar datos: mismo orden y mismos cortes de periodo que KPIService (el DataFrame
+        # ordenado del motor es compartido por versión de datos)
+        self.periods = None
+        self.time_index = None
         if 'fecha_produccion' in self.df.columns:
-            self.df['fecha_produccion'] = pd.to_datetime(self.df['fecha_produccion'])
-            self.df = self.df.sort_values('fecha_produccion')
+            self.periods = get_period_engine(df)
+            self.time_index = self.periods.time_index
+            self.df = self.periods.df
+    
+    @property
+    def kpi_cube(self) -> KPICube:
+        """Cubo de KPIs compartido por versión de datos"""
+        return get_kpi_cube(self._source_df)
     
     def _get_period_data(self) -> Dict:
         """Obtiene datos para diferentes períodos temporales"""
         
-        # Usar exactamente el mismo método que kpi_service.py
-        now = datetime.now()
-        current_month = now.month
-        current_year = now.year
-        
-        # Mes anterior
-        if current_month == 1:
-            prev_month = 12
-            prev_year = current_year - 1
-        else:
-            prev_month = current_month - 1
-            prev_year = current_year
-        
-        # Mes actual - usar exactamente el mismo filtro que kpi_service
-        current_month_data = self.df[
-            (self.df['fecha_produccion'].dt.month == current_month) & 
-            (self.df['fecha_produccion'].dt.year == current_year)
-        ]
-        
-        # Mes anterior - usar exactamente el mismo filtro que kpi_service
-        previous_month_data = self.df[
-            (self.df['fecha_produccion'].dt.month == prev_month) & 
-            (self.df['fecha_produccion'].dt.year == prev_year)
-        ]
+        # Mismos periodos y cortes que kpi_service.py (posiciones cacheadas del motor)
+        current, previous = self.periods.current_and_previous(REPORTING_MONTH)
+        current_month_data = self.df.iloc[slice(*self.periods.bounds(current))]
+        previous_month_data = self.df.iloc[slice(*self.periods.bounds(previous))]
         
         # Para compatibilidad, mantener los nombres originales
         return {
@@ -79,6 +90,11 @@ class DetailedReportService:
             'previous_week': previous_month_data  # Usar mes anterior como semana para compatibilidad
         }
     
+    def _get_period_kpis(self, period: Tuple[int, int], df: pd.DataFrame) -> Dict:
+        """KPIs de un mes (año, mes) memorizados por versión de datos"""
+        key = kpi_cache_key(self.data_version, 'report_period_kpis', period)
+        return kpi_cache.get_or_compute(key, lambda: self._calculate_period_kpis(df))
+    
     def _calculate_period_kpis(self, df: pd.DataFrame) -> Dict:
         """Calcula KPIs para un período específico"""
         if df.empty:
@@ -93,18 +109,17 @@ class DetailedReportService:
                 'toneladas_a_producir': 0
             }
         
-        # Calcular diferencia de toneladas
-        cond = df["order_produccion_despachada"] == 'Si'
-        df = df[cond].copy()
-        diferencia_toneladas = compute_metric_diferencia_toneladas(df)
+        # Órdenes despachadas como máscara, sin materializar el subconjunto
+        despachadas = ProductionFilter(df).despachada()
+        diferencia_toneladas = despachadas.diferencia_toneladas()
         
         # Calcular sackoff
-        sackoff = compute_metric_sackoff(df)
+        sackoff = despachadas.sackoff()
         
-        # Calcular métricas de calidad usando funciones centralizadas
-        durabilidad = compute_metric_pdi_mean_agroindustrial(df)
-        dureza = compute_metric_dureza_mean_agroindustrial(df)
-        finos = compute_metric_fino_mean_agroindustrial(df)
+        # Calcular métricas de calidad sobre las mismas órdenes despachadas
+        durabilidad = round(despachadas.mean('durabilidad_pct_qa_agroindustrial'), 3)
+        dureza = round(despachadas.mean('dureza_qa_agroindustrial'), 3)
+        finos = round(despachadas.mean('finos_pct_qa_agroindustrial'), 3)
         
         return {
             'diferencia_toneladas': diferencia_toneladas,
@@ -112,9 +127,9 @@ class DetailedReportService:
             'durabilidad_promedio': durabilidad,
             'dureza_promedio': dureza,
             'finos_promedio': finos,
-            'total_ordenes': len(df),
-            'toneladas_producidas': df['toneladas_producidas'].sum(),
-            'toneladas_a_producir': df['toneladas_a_producir'].sum()
+            'total_ordenes': len(despachadas),
+            'toneladas_producidas': despachadas.sum('toneladas_producidas'),
+            'toneladas_a_producir': despachadas.sum('toneladas_a_producir')
         }
     
     def _calculate_comparisons(self, current: Dict, previous: Dict) -> Dict:
@@ -150,6 +165,81 @@ class DetailedReportService:
         
         return comparisons
     
+    def _analyze_trends(self, months: int = 6, top_n: int = 5, min_weeks: int = 4) -> Dict:
+        """Tendencias de los últimos meses y productos cuyo sackoff semanal más empeora"""
+        mensual = analyze_trends(self.df, freq='M')
+        semanal = summarize_trends(analyze_trends(self.df, freq='W', group_col='nombre_producto'),
+                                   group_col='nombre_producto')
+        semanal = semanal[(semanal['periodos'] >= min_weeks) & (semanal['sackoff_pendiente'] > 0)]
+        
+        mensual_cols = ['periodo', 'sackoff', 'sackoff_delta', 'sackoff_variacion_pct', 'sackoff_aceleracion',
+                        'diferencia_toneladas', 'diferencia_toneladas_variacion_pct',
+                        'pdi_mean_agroindustrial', 'pdi_mean_agroindustrial_variacion_pct']
+        productos_cols = ['nombre_producto', 'periodos', 'sackoff', 'sackoff_variacion_pct', 'sackoff_pendiente']
+        return {
+            'mensual': mensual[mensual_cols].tail(months).to_dict('records'),
+            'productos_deterioro': semanal.nlargest(top_n, 'sackoff_pendiente')[productos_cols].to_dict('records'),
+        }
+    
+    def _simulate_adiflow_adoption(self) -> Dict:
+        """Simulación de mayor adopción de Adiflow sobre el último mes completo"""
+        if self.periods is None:
+            return {}
+        _, previous = self.periods.current_and_previous(REPORTING_MONTH)
+        month = self.periods.slice(previous)
+        simulation = get_adiflow_simulation(month)
+        if simulation['resumen'].empty:
+            return {}
+        return {
+            'periodo': previous.label,
+            'sackoff_actual': simulation['sackoff_actual'],
+            'adopcion_actual': simulation['adopcion_actual'],
+            'n_escenarios': simulation['n_escenarios'],
+            'escenarios': simulation['resumen'].to_dict('records'),
+        }
+    
+    def _detect_regime_changes(self, weeks: int = 8) -> List[Dict]:
+        """Cambios de régimen del sackoff semanal por producto y Adiflow en las últimas semanas"""
+        if self.periods is None:
+            return []
+        changes = get_weekly_change_points(self._source_df, 'sackoff', by=('producto', 'adiflow'))
+        if changes.empty:
+            return []
+        current_week = self.periods.period('week')
+        desde = current_week.start - pd.Timedelta(weeks=weeks - 1)
+        semanas = local_dates(changes['semana'], self.periods.calendar.timezone)
+        recientes = changes[(semanas >= desde).to_numpy()].assign(semana=semanas)
+        recientes = recientes.sort_values(['semana', 'cambio'], ascending=[False, False])
+        return recientes.to_dict('records')
+    
+    def _forecast_next_month(self, top_n: int = 10) -> Dict:
+        """Pronóstico del próximo mes de los productos con mayor producción pronosticada"""
+        if self.periods is None:
+            return {}
+        forecasts = get_kpi_forecasts(self._source_df)
+        if forecasts['productos'].empty:
+            return {}
+        return {
+            'periodo': forecasts['periodo'],
+            'ultima_semana': forecasts['ultima_semana'],
+            'tarjetas': forecasts['tarjetas'],
+            'productos': forecasts['productos'].head(top_n).to_dict('records'),
+        }
+    
+    def _analyze_spc(self, days: int = 28, top_n: int = 15) -> List[Dict]:
+        """Series de calidad por producto con órdenes fuera de control o EWMA fuera de sus límites"""
+        if self.periods is None:
+            return []
+        summary = get_spc_summary(self._source_df, days=days)
+        alertas = summary[(summary['fuera_control'] > 0) | (summary['estado_ewma'] != 'en control')]
+        alertas = alertas.assign(metrica_nombre=alertas['metrica'].map(SPC_METRICS))
+        return alertas.head(top_n).to_dict('records')
+    
+    @staticmethod
+    def _bootstrap_params() -> Dict:
+        """Parámetros del bootstrap que forman parte de la clave de caché"""
+        return {'remuestras': config.BOOTSTRAP_RESAMPLES, 'confianza': config.BOOTSTRAP_CONFIDENCE}
+    
     def _analyze_correlations(self) -> List[Dict]:
         """Analiza correlaciones entre diferentes métricas"""
         correlations = []
@@ -165,26 +255,48 @@ class DetailedReportService:
                     'descripcion': f"Correlación de {corr:.3f} entre durabilidad y dureza"
                 })
         
-        # Impacto del uso de Adiflow
+        # Impacto del uso de Adiflow (sackoff con intervalo de confianza bootstrap)
         if 'tiene_adiflow' in self.df.columns:
-            con_adiflow = self.df[self.df['tiene_adiflow'] == True]
-            sin_adiflow = self.df[self.df['tiene_adiflow'] == False]
+            con_adiflow = filter_con_adiflow(self.df)
+            sin_adiflow = filter_sin_adiflow(self.df)
             
             if not con_adiflow.empty and not sin_adiflow.empty:
                 diferencia_con = compute_metric_diferencia_toneladas(con_adiflow)
                 diferencia_sin = compute_metric_diferencia_toneladas(sin_adiflow)
-                
                 mejora = diferencia_sin - diferencia_con  # Menor diferencia es mejor
+                
+                # Miles de remuestras por grupo: se memoriza por versión de datos como los demás análisis
+                ic = memoize_kpis(self._source_df, 'report_adiflow_sackoff_bootstrap',
+                                  lambda: bootstrap_sackoff_difference(con_adiflow, sin_adiflow),
+                                  params=self._bootstrap_params())
+                lower, upper = ic['ic_diferencia']
+                confianza = f"IC {ic['confianza']:.0%}"
+                # Menor sackoff es mejor; sin diferencia significativa el resultado no es concluyente
+                if ic['significativo']:
+                    impacto = 'positivo' if ic['diferencia'] < 0 else 'negativo'
+                else:
+                    impacto = 'no concluyente'
                 correlations.append({
                     'factor': 'Uso de Adiflow',
-                    'impacto': 'positivo' if mejora > 0 else 'negativo',
-                    'descripcion': f"Las órdenes con Adiflow muestran {abs(mejora):.2f} toneladas {'menor' if mejora > 0 else 'mayor'} diferencia"
+                    'impacto': impacto,
+                    'sackoff_con_adiflow': ic['valor_a'],
+                    'sackoff_sin_adiflow': ic['valor_b'],
+                    'diferencia_sackoff': ic['diferencia'],
+                    'ic_diferencia': ic['ic_diferencia'],
+                    'confianza': ic['confianza'],
+                    'significativo': ic['significativo'],
+                    'descripcion': (
+                        f"Sackoff con Adiflow {ic['valor_a']:.2f}% vs sin Adiflow {ic['valor_b']:.2f}%: "
+                        f"diferencia de {ic['diferencia']:+.2f} pp ({confianza}: {lower:+.2f} a {upper:+.2f} pp"
+                        f"{'' if ic['significativo'] else ', no significativa'}). "
+                        f"Las órdenes con Adiflow muestran {abs(mejora):.2f} toneladas {'menor' if mejora > 0 else 'mayor'} diferencia"
+                    )
                 })
         
         # Correlación entre diferencia de toneladas y peso de agua
         if 'peso_agua_kg' in self.df.columns:
-            self.df['diferencia_por_orden'] = (self.df['toneladas_a_producir'] - self.df['toneladas_producidas'] - self.df['toneladas_anuladas']).fillna(0)
-            corr = self.df['diferencia_por_orden'].corr(self.df['peso_agua_kg'])
+            diferencia_por_orden = (self.df['toneladas_a_producir'] - self.df['toneladas_producidas'] - self.df['toneladas_anuladas']).fillna(0)
+            corr = diferencia_por_orden.corr(self.df['peso_agua_kg'])
             if not pd.isna(corr):
                 correlations.append({
                     'factor': 'Diferencia vs Peso Agua',
@@ -218,36 +330,62 @@ class DetailedReportService:
             Dict con el informe estructurado
         """
         
-        # Obtener datos por período
-        period_data = self._get_period_data()
-        
-        # Calcular KPIs para cada período
-        current_month_kpis = self._calculate_period_kpis(period_data['current_month'])
-        previous_month_kpis = self._calculate_period_kpis(period_data['previous_month'])
-        current_week_kpis = self._calculate_period_kpis(period_data['current_week'])
-        previous_week_kpis = self._calculate_period_kpis(period_data['previous_week'])
-        
-        # Calcular comparaciones
-        month_comparisons = self._calculate_comparisons(current_month_kpis, previous_month_kpis)
-        week_comparisons = self._calculate_comparisons(current_week_kpis, previous_week_kpis)
-        
-        # Analizar correlaciones
-        correlations = self._analyze_correlations()
-        
-    
-        
-        # Generar recomendaciones
-        recomendaciones = self._generate_recommendations(month_comparisons, correlations)
-        
-        # Generar gráficos con colores corporativos
-        quality_chart = self._generate_quality_chart()
-        efficiency_chart = self._generate_efficiency_chart()
-        sackoff_adiflow_chart = self._generate_sackoff_adiflow_chart()
-        toneladas_adiflow_chart = self._generate_toneladas_adiflow_chart()
-        sackoff_agua_chart = self._generate_sackoff_agua_chart()
-        
-        # Analizar relación entre sackoff y dosis de agua
-        sackoff_agua_analysis = self._analyze_sackoff_agua_relationship()
+        # Secciones independientes en paralelo (REPORT_SECTION_WORKERS hilos); cada una
+        # recibe los resultados de sus dependencias
+        current, previous = self.periods.current_and_previous(REPORTING_MONTH)
+        current_period, previous_period = current.key, previous.key
+        run = run_sections({
+            # Datos y KPIs por período (las "semanas" usan los mismos meses)
+            'period_data': Section(self._get_period_data),
+            'current_month_kpis': Section(
+                lambda data: self._get_period_kpis(current_period, data['current_month']), ('period_data',)),
+            'previous_month_kpis': Section(
+                lambda data: self._get_period_kpis(previous_period, data['previous_month']), ('period_data',)),
+            'current_week_kpis': Section(
+                lambda data: self._get_period_kpis(current_period, data['current_week']), ('period_data',)),
+            'previous_week_kpis': Section(
+                lambda data: self._get_period_kpis(previous_period, data['previous_week']), ('period_data',)),
+            'month_comparisons': Section(self._calculate_comparisons, ('current_month_kpis', 'previous_month_kpis')),
+            'week_comparisons': Section(self._calculate_comparisons, ('current_week_kpis', 'previous_week_kpis')),
+            # Análisis
+            'correlations': Section(self._analyze_correlations),
+            'trend_analysis': Section(self._analyze_trends),
+            'recomendaciones': Section(self._generate_recommendations, ('month_comparisons', 'correlations')),
+            'sackoff_agua_analysis': Section(self._analyze_sackoff_agua_relationship),
+            'simulacion_adiflow': Section(self._simulate_adiflow_adoption),
+            'cambios_regimen': Section(self._detect_regime_changes),
+            'pronostico': Section(self._forecast_next_month),
+            'control_estadistico': Section(self._analyze_spc),
+            # Gráficos con colores corporativos
+            'quality_chart': Section(self._generate_quality_chart),
+            'efficiency_chart': Section(self._generate_efficiency_chart),
+            'sackoff_adiflow_chart': Section(self._generate_sackoff_adiflow_chart),
+            'toneladas_adiflow_chart': Section(self._generate_toneladas_adiflow_chart),
+            'sackoff_agua_chart': Section(self._generate_sackoff_agua_chart),
+        }, max_workers=config.REPORT_SECTION_WORKERS)
+        slowest = max(run.timings, key=run.timings.get)
+        logger.info(f"Detailed report sections took {run.total:.2f}s with "
+                    f"{config.REPORT_SECTION_WORKERS} workers (sum: {sum(run.timings.values()):.2f}s, "
+                    f"critical path: {run.critical_path:.2f}s, slowest: {slowest}, {run.timings[slowest]:.2f}s)")
+        
+        sections = run.results
+        current_month_kpis = sections['current_month_kpis']
+        current_week_kpis = sections['current_week_kpis']
+        month_comparisons = sections['month_comparisons']
+        week_comparisons = sections['week_comparisons']
+        correlations = sections['correlations']
+        trend_analysis = sections['trend_analysis']
+        recomendaciones = sections['recomendaciones']
+        quality_chart = sections['quality_chart']
+        efficiency_chart = sections['efficiency_chart']
+        sackoff_adiflow_chart = sections['sackoff_adiflow_chart']
+        toneladas_adiflow_chart = sections['toneladas_adiflow_chart']
+        sackoff_agua_chart = sections['sackoff_agua_chart']
+        sackoff_agua_analysis = sections['sackoff_agua_analysis']
+        simulacion_adiflow = sections['simulacion_adiflow']
+        cambios_regimen = sections['cambios_regimen']
+        pronostico = sections['pronostico']
+        control_estadistico = sections['control_estadistico']
         
         # Construir el informe
         report = {
@@ -270,7 +408,9 @@ class DetailedReportService:
             "tendencias": {
                 "diferencia_toneladas_tendencia": month_comparisons['diferencia_toneladas']['tendencia'],
                 "calidad_tendencia": month_comparisons['durabilidad_promedio']['tendencia'],
-                "sackoff_tendencia": month_comparisons['sackoff_total']['tendencia']
+                "sackoff_tendencia": month_comparisons['sackoff_total']['tendencia'],
+                "mensual": trend_analysis['mensual'],
+                "productos_deterioro": trend_analysis['productos_deterioro']
             },
 
             "graficos": {
@@ -280,7 +420,14 @@ class DetailedReportService:
                 "toneladas_adiflow": toneladas_adiflow_chart,
                 "sackoff_agua": sackoff_agua_chart
             },
-            "sackoff_agua_analysis": sackoff_agua_analysis
+            "sackoff_agua_analysis": sackoff_agua_analysis,
+            "simulacion_adiflow": simulacion_adiflow,
+            "cambios_regimen": cambios_regimen,
+            "pronostico": pronostico,
+            "control_estadistico": control_estadistico,
+            "tiempos_secciones": {name: round(seconds, 3) for name, seconds in run.timings.items()},
+            "tiempo_total": round(run.total, 3),
+            "tiempo_cadena_critica": round(run.critical_path, 3)
         }
         
         return report
@@ -467,13 +614,13 @@ class DetailedReportService:
             return go.Figure()
         
         # Calcular diferencia de toneladas por orden
-        self.df['diferencia_por_orden'] = (self.df['toneladas_a_producir'] - self.df['toneladas_producidas'] - self.df['toneladas_anuladas']).fillna(0)
+        diferencia_por_orden = (self.df['toneladas_a_producir'] - self.df['toneladas_producidas'] - self.df['toneladas_anuladas']).fillna(0)
         
         fig = go.Figure()
         
         # Scatter plot de diferencia de toneladas vs sackoff
         fig.add_trace(go.Scatter(
-            x=self.df['diferencia_por_orden'],
+            x=diferencia_por_orden,
             y=self.df['sackoff_por_orden_produccion'] if 'sackoff_por_orden_produccion' in self.df.columns else [0] * len(self.df),
             mode='markers',
             name='Órdenes',
@@ -488,12 +635,12 @@ class DetailedReportService:
         
         # Línea de tendencia
         if len(self.df) > 1:
-            z = np.polyfit(self.df['diferencia_por_orden'], 
+            z = np.polyfit(diferencia_por_orden, 
                           self.df['sackoff_por_orden_produccion'] if 'sackoff_por_orden_produccion' in self.df.columns else [0] * len(self.df), 1)
             p = np.poly1d(z)
             fig.add_trace(go.Scatter(
-                x=self.df['diferencia_por_orden'],
-                y=p(self.df['diferencia_por_orden']),
+                x=diferencia_por_orden,
+                y=p(diferencia_por_orden),
                 mode='lines',
                 name='Tendencia',
                 line=dict(
@@ -528,44 +675,75 @@ class DetailedReportService:
         
         return fig 
 
+    def _add_change_point_markers(self, fig: go.Figure, weekly: pd.DataFrame, kpi: str,
+                                  adiflow: str, color: str, unit: str) -> None:
+        """Marca sobre la serie semanal de un grupo de Adiflow sus cambios de régimen (PELT)"""
+        if weekly.empty:
+            return
+        changes = self._weekly_change_points(kpi)
+        changes = changes[changes['adiflow'] == adiflow]
+        points = weekly.merge(changes[['semana', 'media_anterior', 'media_posterior']], on='semana')
+        if points.empty:
+            return
+        fig.add_trace(go.Scatter(
+            x=points['rango_fechas'],
+            y=points[kpi],
+            mode='markers',
+            name=f'Cambio de régimen ({adiflow})',
+            marker=dict(symbol='diamond-open', size=18, color=color, line=dict(width=3)),
+            customdata=points[['media_anterior', 'media_posterior']].to_numpy(),
+            hovertemplate=(f'<b>Cambio de régimen: {adiflow}</b><br>Semana: %{{x}}<br>'
+                           f'Media anterior: %{{customdata[0]:,.2f}}{unit}<br>'
+                           f'Media posterior: %{{customdata[1]:,.2f}}{unit}<extra></extra>')
+        ))
+    
+    def _weekly_adiflow(self) -> pd.DataFrame:
+        """
+        KPIs por semana del calendario de la planta × Adiflow, compartidos por las gráficas semanales.
+        
+        Una sola agregación de medidas aditivas (toneladas de órdenes despachadas)
+        por (semana, Adiflow); el sackoff se deriva de las sumas y las etiquetas de
+        rango se formatean una vez por semana distinta.
+        """
+        def compute() -> pd.DataFrame:
+            semana = self.periods.period_start('week').rename('semana')
+            measures = compute_additive_measures(self.df, [semana, self.df['tiene_adiflow'].rename('adiflow')],
+                                                 mask=semana.notna().to_numpy())
+            weekly = derive_kpi_columns(measures)
+            weekly = weekly[weekly['ordenes_despachadas'] > 0].reset_index()
+            weekly = weekly.sort_values(['adiflow', 'semana'], kind='stable', ignore_index=True)
+            
+            # Etiqueta "lunes - domingo" por semana distinta, repartida a las filas por código
+            codes, semanas = pd.factorize(weekly['semana'])
+            semanas = pd.DatetimeIndex(semanas)
+            etiquetas = semanas.strftime('%d/%m') + ' - ' + (semanas + pd.Timedelta(days=6)).strftime('%d/%m')
+            weekly['rango_fechas'] = np.asarray(etiquetas, dtype=object)[codes]
+            return weekly
+        
+        return memoize_kpis(self._source_df, 'report_weekly_adiflow', compute).copy()
+    
+    def _weekly_change_points(self, kpi: str) -> pd.DataFrame:
+        """
+        Cambios de régimen de un KPI por Adiflow sobre la tabla semanal de las gráficas.
+        
+        Se detectan sobre las mismas semanas del calendario de la planta que se
+        grafican, así cada cambio coincide con un punto de la serie sea cual sea
+        la zona horaria de los datos.
+        """
+        def compute() -> pd.DataFrame:
+            return detect_change_points_batch(self._weekly_adiflow(), kpi, ['adiflow'], 'semana')
+        
+        return memoize_kpis(self._source_df, 'report_weekly_change_points', compute, params={'kpi': kpi}).copy()
+    
     def _generate_sackoff_adiflow_chart(self) -> go.Figure:
         """Genera gráfico de sackoff por semana con y sin Adiflow con colores corporativos"""
         if self.df.empty:
             return go.Figure()
         
-        # Filtrar datos con y sin Adiflow
-        df_con_adiflow = filter_con_adiflow(self.df)
-        df_sin_adiflow = filter_sin_adiflow(self.df)
-        
-        # Calcular sackoff semanal para cada grupo
-        def calculate_weekly_sackoff(df_group):
-            if df_group.empty:
-                return pd.DataFrame()
-            
-            # Crear columna de semana
-            df_group = df_group.copy()
-            df_group['semana'] = df_group['fecha_produccion'].dt.to_period('W')
-            
-            # Agrupar por semana y calcular sackoff semanal
-            weekly_sackoff = df_group.groupby('semana', observed=True).apply(
-                lambda x: compute_metric_sackoff(x)
-            ).reset_index()
-            weekly_sackoff.columns = ['semana', 'sackoff']
-            
-            # Convertir periodo a fecha de inicio de semana
-            weekly_sackoff['fecha_inicio_semana'] = weekly_sackoff['semana'].dt.start_time
-            weekly_sackoff['fecha_fin_semana'] = weekly_sackoff['semana'].dt.end_time
-            
-            # Crear etiqueta con rango de fechas
-            weekly_sackoff['rango_fechas'] = weekly_sackoff.apply(
-                lambda row: f"{row['fecha_inicio_semana'].strftime('%d/%m')} - {row['fecha_fin_semana'].strftime('%d/%m')}", 
-                axis=1
-            )
-            
-            return weekly_sackoff
-        
-        weekly_con_adiflow = calculate_weekly_sackoff(df_con_adiflow)
-        weekly_sin_adiflow = calculate_weekly_sackoff(df_sin_adiflow)
+        # Sackoff semanal de cada grupo desde la agregación compartida
+        weekly = self._weekly_adiflow()
+        weekly_con_adiflow = weekly[weekly['adiflow'] == 'Con Adiflow']
+        weekly_sin_adiflow = weekly[weekly['adiflow'] == 'Sin Adiflow']
         
         fig = go.Figure()
         
@@ -605,6 +783,10 @@ class DetailedReportService:
                 hovertemplate='<b>Sin Adiflow</b><br>Semana: %{x}<br>Sackoff: %{y:.2f}%<extra></extra>'
             ))
         
+        # Cambios de régimen detectados en cada serie
+        self._add_change_point_markers(fig, weekly_con_adiflow, 'sackoff', 'Con Adiflow', '#1C8074', '%')
+        self._add_change_point_markers(fig, weekly_sin_adiflow, 'sackoff', 'Sin Adiflow', '#666666', '%')
+        
         # Línea de referencia para sackoff óptimo (-0.3%)
         if not weekly_con_adiflow.empty or not weekly_sin_adiflow.empty:
             fig.add_hline(
@@ -655,37 +837,10 @@ class DetailedReportService:
         if self.df.empty:
             return go.Figure()
         
-        # Filtrar datos con y sin Adiflow
-        df_con_adiflow = filter_con_adiflow(self.df)
-        df_sin_adiflow = filter_sin_adiflow(self.df)
-        
-        # Calcular toneladas semanales para cada grupo
-        def calculate_weekly_toneladas(df_group):
-            if df_group.empty:
-                return pd.DataFrame()
-            
-            # Crear columna de semana
-            df_group = df_group.copy()
-            df_group['semana'] = df_group['fecha_produccion'].dt.to_period('W')
-            
-            # Agrupar por semana y calcular toneladas semanales
-            weekly_toneladas = df_group.groupby('semana', observed=True)['toneladas_producidas'].sum().reset_index()
-            weekly_toneladas.columns = ['semana', 'toneladas_producidas']
-            
-            # Convertir periodo a fecha de inicio de semana
-            weekly_toneladas['fecha_inicio_semana'] = weekly_toneladas['semana'].dt.start_time
-            weekly_toneladas['fecha_fin_semana'] = weekly_toneladas['semana'].dt.end_time
-            
-            # Crear etiqueta con rango de fechas
-            weekly_toneladas['rango_fechas'] = weekly_toneladas.apply(
-                lambda row: f"{row['fecha_inicio_semana'].strftime('%d/%m')} - {row['fecha_fin_semana'].strftime('%d/%m')}", 
-                axis=1
-            )
-            
-            return weekly_toneladas
-        
-        weekly_con_adiflow = calculate_weekly_toneladas(df_con_adiflow)
-        weekly_sin_adiflow = calculate_weekly_toneladas(df_sin_adiflow)
+        # Toneladas semanales de cada grupo desde la agregación compartida
+        weekly = self._weekly_adiflow()
+        weekly_con_adiflow = weekly[weekly['adiflow'] == 'Con Adiflow']
+        weekly_sin_adiflow = weekly[weekly['adiflow'] == 'Sin Adiflow']
         
         fig = go.Figure()
         
@@ -725,28 +880,25 @@ class DetailedReportService:
                 hovertemplate='<b>Sin Adiflow</b><br>Semana: %{x}<br>Toneladas: %{y:,.0f} ton<extra></extra>'
             ))
         
+        # Cambios de régimen detectados en cada serie
+        self._add_change_point_markers(fig, weekly_con_adiflow, 'toneladas_producidas', 'Con Adiflow', '#1C8074', ' ton')
+        self._add_change_point_markers(fig, weekly_sin_adiflow, 'toneladas_producidas', 'Sin Adiflow', '#666666', ' ton')
+        
         # Línea de promedio semanal total (opcional)
         if not weekly_con_adiflow.empty or not weekly_sin_adiflow.empty:
-            # Combinar todas las semanas para calcular promedio
-            all_weeks = pd.concat([
-                weekly_con_adiflow[['rango_fechas', 'toneladas_producidas']] if not weekly_con_adiflow.empty else pd.DataFrame(),
-                weekly_sin_adiflow[['rango_fechas', 'toneladas_producidas']] if not weekly_sin_adiflow.empty else pd.DataFrame()
-            ])
+            # Toneladas totales de cada semana (ambos grupos)
+            total_weekly = pd.concat([weekly_con_adiflow, weekly_sin_adiflow]).groupby('semana')['toneladas_producidas'].sum()
+            promedio_total = total_weekly.mean()
             
-            if not all_weeks.empty:
-                # Agrupar por rango de fechas y sumar toneladas
-                total_weekly = all_weeks.groupby('rango_fechas', observed=True)['toneladas_producidas'].sum().reset_index()
-                promedio_total = total_weekly['toneladas_producidas'].mean()
-                
-                # Agregar línea horizontal del promedio
-                fig.add_hline(
-                    y=promedio_total,
-                    line_dash="dot",
-                    line_color="#94AF92",  # PANTONE 7494 U
-                    annotation_text=f"Promedio Semanal: {promedio_total:,.0f} ton",
-                    annotation_position="top right",
-                    line_width=2
-                )
+            # Agregar línea horizontal del promedio
+            fig.add_hline(
+                y=promedio_total,
+                line_dash="dot",
+                line_color="#94AF92",  # PANTONE 7494 U
+                annotation_text=f"Promedio Semanal: {promedio_total:,.0f} ton",
+                annotation_position="top right",
+                line_width=2
+            )
         
         fig.update_layout(
             title={
@@ -817,7 +969,12 @@ class DetailedReportService:
         df_bajo_agua = df_valid[df_valid['peso_agua_kg'] <= 500]
         
         if not df_alto_agua.empty and not df_bajo_agua.empty:
-            # Calcular diferencias
+            # Diferencia de medias con intervalo de confianza bootstrap
+            # (memorizada por versión de datos: el bootstrap domina el costo del análisis)
+            ic = memoize_kpis(self._source_df, 'report_agua_sackoff_bootstrap',
+                              lambda: bootstrap_mean_difference(df_alto_agua['sackoff_por_orden_produccion'],
+                                                                df_bajo_agua['sackoff_por_orden_produccion']),
+                              params=self._bootstrap_params())
             sackoff_alto_agua = df_alto_agua['sackoff_por_orden_produccion'].mean()
             sackoff_bajo_agua = df_bajo_agua['sackoff_por_orden_produccion'].mean()
             
@@ -831,11 +988,16 @@ class DetailedReportService:
                 'stats_por_rango': stats_por_rango.to_dict(),
                 'sackoff_alto_agua': sackoff_alto_agua,
                 'sackoff_bajo_agua': sackoff_bajo_agua,
+                'ic_alto_agua': ic['ic_a'],
+                'ic_bajo_agua': ic['ic_b'],
+                'ic_diferencia': ic['ic_diferencia'],
+                'confianza': ic['confianza'],
                 'porcentaje_cerca_cero': porcentaje_cerca_cero,
                 'total_alto_agua': total_alto_agua,
                 'sackoff_cerca_cero_alto': sackoff_cerca_cero_alto,
                 'tiene_tendencia_cerca_cero': porcentaje_cerca_cero >= 50,  # Si más del 50% están cerca de cero
-                'diferencia_significativa': abs(sackoff_alto_agua - sackoff_bajo_agua) > 0.5
+                # Diferencia relevante (> 0.5 pp) y estadísticamente distinta de cero
+                'diferencia_significativa': abs(sackoff_alto_agua - sackoff_bajo_agua) > 0.5 and ic['significativo']
             }
         
         return {
@@ -925,4 +1087,27 @@ class DetailedReportService:
             )
         )
         
-        return fig 
\ No newline at end of file
+        return fig 
+
+
+def get_detailed_report(df: pd.DataFrame, user_context: str = "") -> Dict:
+    """
+    Informe detallado memorizado por versión de datos, día y parámetros.
+
+    Los reruns de la página y la descarga del PDF reutilizan el mismo
+    informe mientras no cambien los datos. El día de la planta es parte de
+    la llave porque los periodos del informe (mes, semana, últimos días)
+    dependen de la fecha actual.
+
+    Args:
+        df: DataFrame con datos de producción
+        user_context: Contexto adicional del usuario
+
+    Returns:
+        Informe compartido de generate_detailed_report (no lo modifiques)
+    """
+    today = get_period_engine(df).calendar.period('day').key
+    key = kpi_cache_key(get_data_version(df), 'detailed_report', today,
+                        params={'user_context': user_context})
+    return report_cache.get_or_compute(
+        key, lambda: DetailedReportService(df).generate_detailed_report(user_context))
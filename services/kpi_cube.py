@@ -0,0 +1,280 @@
+"""
+KPI Cube for OkuoAgent
+Additive production measures by plant × product × Adiflow × week × month with
+filter / roll-up / drill-down queries
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.production_metrics import QUALITY_METRICS, compute_additive_measures, derive_kpi_columns
+from utils.data_cache import BoundedCache, freeze, memoize_frame
+from utils.period_engine import REPORTING_MONTH, PeriodCalendar
+from utils.quantile_sketch import TDigestSet
+
+
+MISSING_KEY = '(sin dato)'
+
+# Cube dimension -> source column (semana and mes are derived from fecha_produccion)
+DIMENSIONS = {
+    'planta': 'planta',
+    'producto': 'nombre_producto',
+    'adiflow': 'tiene_adiflow',
+    'semana': 'fecha_produccion',
+    'mes': 'fecha_produccion',
+}
+
+DEFAULT_PERCENTILES = (0.1, 0.5, 0.9)
+
+
+def _as_list(value) -> list:
+    if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+        return list(value)
+    return [value]
+
+
+class KPICube:
+    """
+    Additive measures per cell (planta, producto, adiflow, semana, mes)
+
+    Cells hold sums and counts only, so any slice or roll-up is a small
+    reduction over cells and never touches the order-level data again.
+    semana is the Monday that starts the plant-time week; mes is the
+    reporting (fiscal) month as 'YYYY-MM', like the period engine. Orders
+    without fecha_produccion are not part of the cube.
+
+    Each cell also keeps a t-digest of every quality column, so percentiles
+    of any slice are answered by merging the digests of its cells.
+    """
+
+    def __init__(self, df: Optional[pd.DataFrame] = None):
+        """
+        Build the cube from production data
+
+        Args:
+            df: DataFrame with production data from produccion_aliar table
+        """
+        self._labels: Dict[str, np.ndarray] = {}
+        self._codes: Dict[str, np.ndarray] = {}
+        self._values = np.zeros((0, 0))
+        self.measure_columns: List[str] = []
+        # Quality digests are indexed by the cell ids of the full cube
+        self._cells = np.zeros(0, dtype=np.int64)
+        self._sketches: Dict[str, TDigestSet] = {}
+        # Cubes are immutable: slices and roll-ups are cached per query
+        self._queries = BoundedCache(256)
+        if df is not None:
+            self._build(df)
+
+    def _build(self, df: pd.DataFrame) -> None:
+        # Same weeks and reporting months as the period engine, in plant time
+        calendar = PeriodCalendar()
+        fechas = df['fecha_produccion']
+        valid = fechas.notna().to_numpy()
+        keys = []
+        for dim, column in DIMENSIONS.items():
+            if dim == 'semana':
+                key = calendar.period_start(fechas, 'week')
+            elif dim == 'mes':
+                key = calendar.month_key(fechas, REPORTING_MONTH)
+            elif column in df.columns:
+                key = df[column].fillna(MISSING_KEY)
+            else:
+                key = pd.Series(MISSING_KEY, index=df.index)
+            keys.append(key.rename(dim))
+
+        cells, cell_ids = compute_additive_measures(df, keys, mask=valid, return_group_ids=True)
+        self.measure_columns = list(cells.columns)
+        self._values = cells.to_numpy(dtype=float)
+        self._cells = np.arange(len(cells))
+        rows = np.flatnonzero(valid)
+        self._sketches = {
+            col: TDigestSet.from_values(cell_ids, df[col].to_numpy(dtype=float, na_value=np.nan)[rows], len(cells))
+            for col in QUALITY_METRICS.values()
+        }
+        for level, dim in enumerate(DIMENSIONS):
+            codes, labels = pd.factorize(cells.index.get_level_values(level), sort=True)
+            if dim == 'mes':
+                labels = pd.Index([f'{key // 100:04d}-{key % 100:02d}' for key in labels])
+            self._codes[dim] = codes
+            self._labels[dim] = labels
+
+    def _subset(self, rows: np.ndarray) -> 'KPICube':
+        cube = KPICube()
+        cube.measure_columns = self.measure_columns
+        cube._labels = self._labels
+        cube._codes = {dim: codes[rows] for dim, codes in self._codes.items()}
+        cube._values = self._values[rows]
+        cube._cells = self._cells[rows]
+        cube._sketches = self._sketches
+        return cube
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def dimensions(self) -> List[str]:
+        return list(DIMENSIONS)
+
+    def members(self, dim: str) -> list:
+        """Values of a dimension present in this (possibly filtered) cube"""
+        return list(self._labels[dim][np.unique(self._codes[dim])])
+
+    def filter(self, **criteria) -> 'KPICube':
+        """
+        Slice/dice the cube
+
+        Args:
+            **criteria: dimension=value or dimension=[values]. semana accepts
+                anything convertible to a Timestamp (any day of the week)
+
+        Returns:
+            New KPICube restricted to the matching cells
+        """
+        return self._queries.get_or_compute(('filter', freeze(criteria)), lambda: self._filter(criteria))
+
+    def _filter(self, criteria: Dict) -> 'KPICube':
+        rows = np.ones(len(self), dtype=bool)
+        for dim, value in criteria.items():
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown cube dimension '{dim}'. Available: {list(DIMENSIONS)}")
+            wanted = _as_list(value)
+            if dim == 'semana':
+                wanted = [PeriodCalendar().period_at('week', v).start for v in wanted]
+                member_codes = np.flatnonzero(self._labels[dim].isin(wanted))
+            else:
+                member_codes = np.flatnonzero(self._labels[dim].isin(wanted))
+            rows &= np.isin(self._codes[dim], member_codes)
+        return self._subset(np.flatnonzero(rows))
+
+    def measures(self, *dims: str) -> pd.DataFrame:
+        """
+        Additive measures rolled up to the given dimensions
+
+        Args:
+            *dims: Dimensions to keep (none = grand total)
+
+        Returns:
+            DataFrame indexed by the kept dimensions with summed measures
+        """
+        self._check_dims(dims)
+        return self._queries.get_or_compute(('measures', dims), lambda: self._measures(dims)).copy()
+
+    def _check_dims(self, dims: tuple) -> None:
+        for dim in dims:
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown cube dimension '{dim}'. Available: {list(DIMENSIONS)}")
+
+    def _groups(self, dims: tuple):
+        """Group of each cell and the index of the groups for a roll-up to dims"""
+        if not dims:
+            return np.zeros(len(self), dtype=np.int64), pd.RangeIndex(1)
+        sizes = [len(self._labels[dim]) for dim in dims]
+        combined = np.ravel_multi_index([self._codes[dim] for dim in dims], sizes)
+        groups, inverse = np.unique(combined, return_inverse=True)
+
+        level_codes = np.unravel_index(groups, sizes)
+        levels = [self._labels[dim][codes] for dim, codes in zip(dims, level_codes)]
+        if len(dims) == 1:
+            index = levels[0].rename(dims[0])
+        else:
+            index = pd.MultiIndex.from_arrays(levels, names=list(dims))
+        return inverse.ravel(), index
+
+    def _measures(self, dims: tuple) -> pd.DataFrame:
+        if not dims:
+            return pd.DataFrame([self._values.sum(axis=0)], columns=self.measure_columns)
+
+        inverse, index = self._groups(dims)
+        sums = np.column_stack([
+            np.bincount(inverse, weights=self._values[:, j], minlength=len(index))
+            for j in range(self._values.shape[1])
+        ]) if len(index) else np.zeros((0, self._values.shape[1]))
+        return pd.DataFrame(sums, index=index, columns=self.measure_columns)
+
+    def rollup(self, *dims: str) -> pd.DataFrame:
+        """
+        KPIs (sackoff, diferencia_toneladas, tonnage, quality means) by dimensions
+
+        Args:
+            *dims: Dimensions to keep (none = grand total)
+
+        Returns:
+            DataFrame with derive_kpi_columns output per group
+        """
+        self._check_dims(dims)
+        kpis = self._queries.get_or_compute(('rollup', dims), lambda: derive_kpi_columns(self._measures(dims)))
+        return kpis.copy()
+
+    def percentiles(self, metric: str, *dims: str, q: Sequence[float] = DEFAULT_PERCENTILES) -> pd.DataFrame:
+        """
+        Quality percentiles by dimensions, merged from the per-cell t-digests
+
+        Args:
+            metric: Quality KPI (pdi_mean_agroindustrial, ...) or its source column
+            *dims: Dimensions to keep (none = whole cube)
+            q: Quantiles between 0 and 1
+
+        Returns:
+            DataFrame with one column per quantile (p10, p50, ...) and n
+            (number of values) per group; NaN where the group has no values
+        """
+        column = QUALITY_METRICS.get(metric, metric)
+        if column not in self._sketches:
+            raise ValueError(f"Unknown quality metric '{metric}'. Available: {list(QUALITY_METRICS)}")
+        self._check_dims(dims)
+        q = tuple(float(value) for value in q)
+        return self._queries.get_or_compute(
+            ('percentiles', column, dims, q), lambda: self._percentiles(column, dims, q)).copy()
+
+    def _percentiles(self, column: str, dims: tuple, q: tuple) -> pd.DataFrame:
+        inverse, index = self._groups(dims)
+        sketch = self._sketches[column]
+        mapping = np.full(sketch.n_groups, -1, dtype=np.int64)
+        mapping[self._cells] = inverse
+        merged = sketch.merge(mapping, len(index))
+        columns = [f"p{100 * value:g}" for value in q]
+        result = pd.DataFrame(merged.quantiles(q).round(3), index=index, columns=columns)
+        result['n'] = merged.count().astype(np.int64)
+        return result
+
+    def drilldown(self, dim: str, **criteria) -> pd.DataFrame:
+        """
+        Break a slice down by one more dimension, e.g. drilldown('producto', mes='2025-06')
+
+        Args:
+            dim: Dimension to expand
+            **criteria: Slice to drill into (same syntax as filter)
+
+        Returns:
+            KPIs of the slice per member of dim
+        """
+        return self.filter(**criteria).rollup(dim)
+
+    def kpi(self, metric: str = 'sackoff', **criteria) -> float:
+        """
+        Single KPI value of a slice
+
+        Args:
+            metric: Column of derive_kpi_columns (sackoff, pdi_mean_agroindustrial, ...)
+            **criteria: Slice (same syntax as filter)
+
+        Returns:
+            KPI value
+        """
+        return self.filter(**criteria).rollup()[metric].iloc[0]
+
+
+def get_kpi_cube(df: pd.DataFrame) -> KPICube:
+    """
+    KPI cube built once per data version
+
+    Args:
+        df: DataFrame with production data
+
+    Returns:
+        Shared KPICube instance for this data version
+    """
+    return memoize_frame(df, 'kpi_cube', lambda: KPICube(df))
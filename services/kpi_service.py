@@ -5,17 +5,168 @@ Handles all KPI calculations and data processing for production metrics
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from utils.production_metrics import (
-    compute_metric_sackoff,
-    compute_metric_pdi_mean_agroindustrial,
-    compute_metric_dureza_mean_agroindustrial,
-    compute_metric_fino_mean_agroindustrial,
-    filter_con_adiflow,
-    filter_sin_adiflow,
-    compute_metric_diferencia_toneladas,
+    compute_additive_measures,
+    derive_kpi_arrays,
+    derive_kpi_columns,
+    compute_product_sackoff,
+    rank_products_by_sackoff,
+    compute_rolling_kpis,
 )
+from utils.period_engine import REPORTING_MONTH, PeriodCalendar, get_period_engine, local_dates, plant_now
+from utils.data_cache import memoize_kpis
+from utils.duckdb_backend import get_metrics_backend
+
+
+# Dashboard KPI cards: (key, display name, icon, unit, inverted, source column in derive_kpi_columns)
+KPI_DEFINITIONS = [
+    ('pdi_mean_agroindustrial', 'PDI Mean Agroindustrial', '📊', '%', False, 'pdi_mean_agroindustrial'),
+    ('dureza_mean_agroindustrial', 'Dureza Mean Agroindustrial', '💪', '', False, 'dureza_mean_agroindustrial'),
+    ('fino_mean_agroindustrial', 'Fino Mean Agroindustrial', '🔬', '%', False, 'fino_mean_agroindustrial'),
+    ('sackoff_con_adiflow', 'Sackoff con Adiflow', '📉', '%', True, 'sackoff'),
+    ('sackoff_sin_adiflow', 'Sackoff sin Adiflow', '📉', '%', True, 'sackoff'),
+    ('diferencia_toneladas', 'Diferencia Toneladas', '⚖️', '', True, 'diferencia_toneladas'),
+]
+
+
+SUMMARY_ROWS = [(periodo, row) for periodo in ('current', 'previous') for row in ('total', 'con', 'sin')]
+
+
+def _summarize_periods(totals: Optional[pd.DataFrame], by_adiflow: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Derive total, con Adiflow and sin Adiflow KPIs for the current and previous period
+    
+    Args:
+        totals: Additive measures indexed by periodo (None = sum of by_adiflow per periodo)
+        by_adiflow: Additive measures indexed by (periodo, tiene_adiflow)
+        
+    Returns:
+        Derived KPI columns as arrays aligned with SUMMARY_ROWS; groups without
+        rows count as zero measures
+    """
+    columns = by_adiflow.columns if totals is None else totals.columns
+    adiflow_values = by_adiflow[columns].to_numpy(dtype=float)
+    positions = {key: i for i, key in enumerate(by_adiflow.index)}
+    total_positions = {} if totals is None else {key: i for i, key in enumerate(totals.index)}
+    total_values = None if totals is None else totals.to_numpy(dtype=float)
+    adiflow_groups = {'con': 'Con Adiflow', 'sin': 'Sin Adiflow'}
+
+    measures = np.zeros((len(SUMMARY_ROWS), len(columns)))
+    for i, (periodo, row) in enumerate(SUMMARY_ROWS):
+        if row != 'total':
+            position = positions.get((periodo, adiflow_groups[row]))
+            if position is not None:
+                measures[i] = adiflow_values[position]
+        elif totals is None:
+            rows = [j for (key_periodo, _), j in positions.items() if key_periodo == periodo]
+            measures[i] = adiflow_values[rows].sum(axis=0)
+        elif periodo in total_positions:
+            measures[i] = total_values[total_positions[periodo]]
+    return derive_kpi_arrays(dict(zip(columns, measures.T)))
+
+
+def build_kpis_from_measures(totals: Optional[pd.DataFrame], by_adiflow: pd.DataFrame) -> Dict:
+    """
+    Build the dashboard KPI dictionary from additive measures
+    
+    Args:
+        totals: Output of compute_additive_measures indexed by periodo
+            ('current' or 'previous'); None to sum by_adiflow per periodo
+        by_adiflow: Output of compute_additive_measures indexed by (periodo, tiene_adiflow)
+        
+    Returns:
+        Dictionary with the same structure returned by KPIService.calculate_kpis
+    """
+    summary = _summarize_periods(totals, by_adiflow)
+    position = {key: i for i, key in enumerate(SUMMARY_ROWS)}
+
+    # Usar 1 decimal para mostrar y calcular change_pct
+    def to_1_decimal(val):
+        return float(f"{val:.1f}") if val is not None else None
+
+    # Calcular change_pct usando los valores redondeados a 1 decimal
+    def pct_change_display(current, previous):
+        if current is None or previous is None:
+            return 0
+        current_disp = round(current, 1)
+        previous_disp = round(previous, 1)
+        if previous_disp == 0:
+            return 0
+        if current_disp == previous_disp:
+            return 0
+        return round(((current_disp - previous_disp) / previous_disp) * 100, 1)
+
+    kpis = {}
+    for key, name, icon, unit, inverted, column in KPI_DEFINITIONS:
+        row = 'con' if key == 'sackoff_con_adiflow' else 'sin' if key == 'sackoff_sin_adiflow' else 'total'
+        if key == 'diferencia_toneladas':
+            current_val = round(summary[column][position[('current', row)]], 1)
+            previous_val = round(summary[column][position[('previous', row)]], 1)
+        else:
+            current_val = to_1_decimal(summary[column][position[('current', row)]])
+            previous_val = to_1_decimal(summary[column][position[('previous', row)]])
+        kpis[key] = {
+            'name': name,
+            'icon': icon,
+            'unit': unit,
+            'inverted': inverted,
+            'current': current_val,
+            'previous': previous_val,
+            'change_pct': pct_change_display(current_val, previous_val),
+        }
+    return kpis
+
+
+def compute_kpi_history(df: pd.DataFrame, freq: str = 'M', periods: int = 12,
+                        now: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Monthly or weekly series of every dashboard KPI in one grouped pass
+    
+    Args:
+        df: DataFrame with production data
+        freq: 'M' for reporting months or 'W' for ISO weeks (Monday start)
+        periods: Number of periods up to and including the current one
+        now: Reference date in plant time (defaults to the plant's current time)
+        
+    Returns:
+        DataFrame indexed by period start (oldest first) with one column per
+        KPI_DEFINITIONS key; NaN for periods without data
+    """
+    if freq not in ('M', 'W'):
+        raise ValueError(f"Unsupported frequency: {freq}. Use 'M' or 'W'")
+    calendar = PeriodCalendar()
+    kind = REPORTING_MONTH if freq == 'M' else 'week'
+    current = calendar.period(kind, 0, now)
+    index = pd.DatetimeIndex([calendar.offset(current, -k).start for k in reversed(range(periods))],
+                             name='periodo')
+    fechas = local_dates(df['fecha_produccion'], calendar.timezone)
+    periodo = calendar.period_start(fechas, kind).rename('periodo')
+    start, end = index[0], index[-1]
+
+    # Measures per (period, Adiflow); totals are their sum since the measures are additive
+    valid = ((periodo >= start) & (periodo <= end)).to_numpy()
+    by_adiflow = compute_additive_measures(df, [periodo, 'tiene_adiflow'], mask=valid)
+    adiflow = by_adiflow.index.get_level_values('tiene_adiflow')
+
+    def derive(measures: pd.DataFrame) -> pd.DataFrame:
+        kpis = derive_kpi_columns(measures).reindex(index)
+        # Without dispatched orders sackoff and tonnage are undefined, not 0
+        dispatched = kpis['ordenes_despachadas'] > 0
+        kpis[['sackoff', 'diferencia_toneladas']] = kpis[['sackoff', 'diferencia_toneladas']].where(dispatched, axis=0)
+        return kpis
+
+    rows = {
+        'total': derive(by_adiflow.groupby(level='periodo').sum()),
+        'con': derive(by_adiflow[adiflow == 'Con Adiflow'].droplevel('tiene_adiflow')),
+        'sin': derive(by_adiflow[adiflow == 'Sin Adiflow'].droplevel('tiene_adiflow')),
+    }
+    history = pd.DataFrame(index=index)
+    for key, name, icon, unit, inverted, column in KPI_DEFINITIONS:
+        row = 'con' if key == 'sackoff_con_adiflow' else 'sin' if key == 'sackoff_sin_adiflow' else 'total'
+        history[key] = rows[row][column].astype(float)
+    return history
 
 
 class KPIService:
@@ -28,9 +179,11 @@ class KPIService:
         Args:
             df: DataFrame with production data from produccion_aliar table
         """
-        self.df = df.copy()
-        if self.df['fecha_produccion'].dtype != 'datetime64[ns]':
-            self.df['fecha_produccion'] = pd.to_datetime(self.df['fecha_produccion'])
+        # Rows sorted by date with cached period boundaries, shared per data version
+        # (the sorted frame may be the caller's own object: never modify self.df)
+        self.periods = get_period_engine(df)
+        self.time_index = self.periods.time_index
+        self.df = self.periods.df
     
     def _validate_data(self) -> None:
         """Validate that required columns exist in the dataset"""
@@ -48,7 +201,7 @@ class KPIService:
     def _prepare_data(self) -> None:
         """Prepare data for KPI calculations"""
         # Convert date column to datetime
-        self.df['fecha_produccion'] = pd.to_datetime(self.df['fecha_produccion'])
+        self.df = self.df.assign(fecha_produccion=pd.to_datetime(self.df['fecha_produccion']))
         
         # Sort by date to ensure proper temporal analysis
         self.df = self.df.sort_values('fecha_produccion')
@@ -64,11 +217,11 @@ class KPIService:
         Returns:
             Tuple of (current_period_data, previous_period_data)
         """
-        # Get current period (last N days)
-        current_data = self.df.tail(current_days)
-        
-        # Get previous period (days N+1 to M from the end)
-        previous_data = self.df.tail(previous_days).head(previous_days - current_days)
+        # Current period: last N calendar days; previous period: the days before it up to M days back
+        now = plant_now()
+        current_data = self.periods.slice_range(now - pd.Timedelta(days=current_days), None)
+        previous_data = self.periods.slice_range(now - pd.Timedelta(days=previous_days),
+                                                 now - pd.Timedelta(days=current_days))
         
         return current_data, previous_data
     
@@ -76,118 +229,83 @@ class KPIService:
         if len(data) == 0:
             return None, None
         
-        # Obtener todos los productos únicos
-        productos = data['nombre_producto'].unique()
-        resultados = []
-        for producto in productos:
-            df_prod = data[data['nombre_producto'] == producto]
-            sackoff = compute_metric_sackoff(df_prod)
-            resultados.append({
-                'nombre_producto': producto,
-                'sackoff': sackoff
-            })
-        if not resultados:
+        # Sackoff de todos los productos en una sola agregación (en orden de aparición)
+        products = compute_product_sackoff(data)
+        if products.empty:
             return None, None
-        # Ordenar por sackoff
-        resultados = sorted(resultados, key=lambda x: x['sackoff'])
-        best = resultados[0]
-        worst = resultados[-1]
-        return worst, best
+        sackoff = products['sackoff'].to_numpy(dtype=float)
+        # Mismo desempate que el ordenamiento estable: mejor = primer mínimo, peor = último máximo
+        best = int(np.argmin(sackoff))
+        worst = len(sackoff) - 1 - int(np.argmax(sackoff[::-1]))
+        records = products[['nombre_producto', 'sackoff']].to_dict('records')
+        return records[worst], records[best]
+    
+    def get_product_ranking(self, k: int = 5, min_toneladas_producidas: float = 0.0,
+                            days: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Rank products by sackoff
+        
+        Args:
+            k: Number of products at each end of the ranking
+            min_toneladas_producidas: Minimum dispatched tonnage to be ranked
+            days: Restrict to the last N days (all data when None)
+            
+        Returns:
+            Dictionary with 'mayor_sackoff' and 'menor_sackoff' DataFrames
+        """
+        data = self.df if days is None else self.get_last_n_days(days)
+        return rank_products_by_sackoff(data, k=k, min_toneladas_producidas=min_toneladas_producidas)
+    
+    def get_rolling_kpis(self, windows: Tuple[int, ...] = (7, 30, 90)) -> pd.DataFrame:
+        """
+        Rolling-window KPIs for every calendar day
+        
+        Args:
+            windows: Window sizes in days
+            
+        Returns:
+            DataFrame indexed by day with sackoff, PDI, dureza, finos and
+            produced tonnage per window (see compute_rolling_kpis)
+        """
+        return compute_rolling_kpis(self.df, windows=windows)
+    
+    def get_kpi_history(self, freq: str = 'M', periods: int = 12) -> pd.DataFrame:
+        """
+        Monthly or weekly history of every dashboard KPI
+        
+        Args:
+            freq: 'M' for months or 'W' for weeks
+            periods: Number of periods up to and including the current one
+            
+        Returns:
+            DataFrame indexed by period start (see compute_kpi_history)
+        """
+        return compute_kpi_history(self.df, freq=freq, periods=periods)
     
     def get_last_n_days(self, n: int) -> pd.DataFrame:
-        date_n_days_ago = datetime.now() - timedelta(days=n)
-        return self.df[self.df['fecha_produccion'] >= date_n_days_ago]
+        return self.periods.last_n_days(n)
 
     def calculate_kpis(self):
-        # Mes actual
-        now = datetime.now()
-        current_month = now.month
-        current_year = now.year
-        # Mes anterior
-        if current_month == 1:
-            prev_month = 12
-            prev_year = current_year - 1
-        else:
-            prev_month = current_month - 1
-            prev_year = current_year
-
-        df_current = self.df[(self.df['fecha_produccion'].dt.month == current_month) & (self.df['fecha_produccion'].dt.year == current_year)]
-        df_prev = self.df[(self.df['fecha_produccion'].dt.month == prev_month) & (self.df['fecha_produccion'].dt.year == prev_year)]
-
-        # Con/Sin Adiflow
-        df_current_con_adiflow = filter_con_adiflow(df_current)
-        df_current_sin_adiflow = filter_sin_adiflow(df_current)
-        df_prev_con_adiflow = filter_con_adiflow(df_prev)
-        df_prev_sin_adiflow = filter_sin_adiflow(df_prev)
-
-        # Usar 1 decimal para mostrar y calcular change_pct
-        def to_1_decimal(val):
-            return float(f"{val:.1f}") if val is not None else None
-
-        kpis = {
-            'pdi_mean_agroindustrial': {
-                'name': 'PDI Mean Agroindustrial',
-                'icon': '📊',
-                'unit': '%',
-                'inverted': False,
-                'current': to_1_decimal(compute_metric_pdi_mean_agroindustrial(df_current)),
-                'previous': to_1_decimal(compute_metric_pdi_mean_agroindustrial(df_prev)),
-            },
-            'dureza_mean_agroindustrial': {
-                'name': 'Dureza Mean Agroindustrial',
-                'icon': '💪',
-                'unit': '',
-                'inverted': False,
-                'current': to_1_decimal(compute_metric_dureza_mean_agroindustrial(df_current)),
-                'previous': to_1_decimal(compute_metric_dureza_mean_agroindustrial(df_prev)),
-            },
-            'fino_mean_agroindustrial': {
-                'name': 'Fino Mean Agroindustrial',
-                'icon': '🔬',
-                'unit': '%',
-                'inverted': False,
-                'current': to_1_decimal(compute_metric_fino_mean_agroindustrial(df_current)),
-                'previous': to_1_decimal(compute_metric_fino_mean_agroindustrial(df_prev)),
-            },
-            'sackoff_con_adiflow': {
-                'name': 'Sackoff con Adiflow',
-                'icon': '📉',
-                'unit': '%',
-                'inverted': True,
-                'current': to_1_decimal(compute_metric_sackoff(df_current_con_adiflow)),
-                'previous': to_1_decimal(compute_metric_sackoff(df_prev_con_adiflow)),
-            },
-            'sackoff_sin_adiflow': {
-                'name': 'Sackoff sin Adiflow',
-                'icon': '📉',
-                'unit': '%',
-                'inverted': True,
-                'current': to_1_decimal(compute_metric_sackoff(df_current_sin_adiflow)),
-                'previous': to_1_decimal(compute_metric_sackoff(df_prev_sin_adiflow)),
-            },
-            'diferencia_toneladas': {
-                'name': 'Diferencia Toneladas',
-                'icon': '⚖️',
-                'unit': '',
-                'inverted': True,
-                'current': round(compute_metric_diferencia_toneladas(df_current), 1),
-                'previous': round(compute_metric_diferencia_toneladas(df_prev), 1),
-            }
-        }
-        # Calcular change_pct usando los valores redondeados a 1 decimal
-        def pct_change_display(current, previous):
-            if current is None or previous is None:
-                return 0
-            current_disp = round(current, 1)
-            previous_disp = round(previous, 1)
-            if previous_disp == 0:
-                return 0
-            if current_disp == previous_disp:
-                return 0
-            return round(((current_disp - previous_disp) / previous_disp) * 100, 1)
-        for k in kpis:
-            kpis[k]['change_pct'] = pct_change_display(kpis[k]['current'], kpis[k]['previous'])
-        return kpis
+        # Optional DuckDB execution (config.METRICS_BACKEND), built once per data version
+        metrics_backend = get_metrics_backend(self.df)
+        if metrics_backend is not None:
+            return metrics_backend.calculate_kpis()
+
+        # Mes actual y mes anterior (hora de la planta, límites cacheados por versión de datos)
+        current, previous = self.periods.current_and_previous(REPORTING_MONTH)
+
+        # Con los datos ordenados, el mes anterior y el actual son un único bloque contiguo
+        prev_start, prev_end = self.periods.bounds(previous)
+        current_start, current_end = self.periods.bounds(current)
+        data = self.df.iloc[prev_start:current_end]
+
+        # Agregación única sobre las filas de ambos meses por grupo de Adiflow; los totales
+        # son su suma porque las medidas son aditivas
+        codes = np.repeat(np.array([1, 0], dtype=np.int8),
+                          [prev_end - prev_start, current_end - current_start])
+        periodo = pd.Series(pd.Categorical.from_codes(codes, ['current', 'previous']), name='periodo')
+        by_adiflow = compute_additive_measures(data, [periodo, 'tiene_adiflow'])
+        return build_kpis_from_measures(None, by_adiflow)
     
     def calculate_product_kpis(self, current_days: int = 7, previous_days: int = 30) -> Dict:
         """
@@ -250,19 +368,8 @@ class KPIService:
         }
     
     def get_period_info(self):
-        now = datetime.now()
-        current_month = now.month
-        current_year = now.year
-        if current_month == 1:
-            prev_month = 12
-            prev_year = current_year - 1
-        else:
-            prev_month = current_month - 1
-            prev_year = current_year
-        import calendar
-        current_month_name = calendar.month_name[current_month]
-        prev_month_name = calendar.month_name[prev_month]
-        return f"Comparativo: {current_month_name} {current_year} vs {prev_month_name} {prev_year}"
+        current, previous = self.periods.current_and_previous(REPORTING_MONTH)
+        return f"Comparativo: {current.label} vs {previous.label}"
 
 
 def create_kpi_service(df: pd.DataFrame) -> KPIService:
@@ -275,4 +382,71 @@ def create_kpi_service(df: pd.DataFrame) -> KPIService:
     Returns:
         KPIService instance
     """
-    return KPIService(df) 
\ No newline at end of file
+    return KPIService(df) 
+
+def apply_filters(df: pd.DataFrame, filters: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Filter production data by column values
+    
+    Args:
+        df: DataFrame with production data
+        filters: Mapping of column to a value or a list of accepted values
+        
+    Returns:
+        Filtered DataFrame (the same object when there are no filters)
+    """
+    if not filters:
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    for column, value in filters.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        mask &= df[column].isin(list(values)).to_numpy()
+    return df[mask]
+
+
+def get_dashboard_kpis(df: pd.DataFrame, filters: Optional[Dict] = None) -> Dict:
+    """
+    Dashboard KPIs memoized by (data version, current date, filter set)
+    
+    Args:
+        df: DataFrame with production data
+        filters: Optional column filters applied before computing KPIs
+        
+    Returns:
+        Dictionary with 'kpis', 'period_info' and 'product_kpis'
+    """
+    # Product KPIs use day windows, so results are keyed by the current date
+    today = plant_now().date()
+
+    def compute() -> Dict:
+        service = KPIService(apply_filters(df, filters))
+        return {
+            'kpis': service.calculate_kpis(),
+            'period_info': service.get_period_info(),
+            'product_kpis': service.calculate_product_kpis(),
+        }
+
+    return memoize_kpis(df, 'dashboard_kpis', compute, period=today, filters=filters)
+
+
+def get_kpi_history(df: pd.DataFrame, freq: str = 'M', periods: int = 12,
+                    filters: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    KPI history memoized by (data version, current date, filter set)
+    
+    Args:
+        df: DataFrame with production data
+        freq: 'M' for months or 'W' for weeks
+        periods: Number of periods up to and including the current one
+        filters: Optional column filters applied before computing the history
+        
+    Returns:
+        Copy of the DataFrame returned by compute_kpi_history
+    """
+    today = plant_now().date()
+    history = memoize_kpis(
+        df, 'kpi_history',
+        lambda: compute_kpi_history(apply_filters(df, filters), freq=freq, periods=periods),
+        period=today, filters=filters, params={'freq': freq, 'periods': periods},
+    )
+    return history.copy()
@@ -45,7 +45,13 @@ from .kpi_view import (
     calculate_kpis,
     render_kpis_only,
     render_period_analysis_only,
-    render_product_analysis_only
+    render_product_analysis_only,
+    get_product_ranking,
+    render_product_ranking,
+    get_rolling_kpis,
+    render_rolling_kpis,
+    render_kpi_cube_explorer,
+    render_alerts
 )
 
 # Imports de gestión de depuración
@@ -94,6 +100,12 @@ __all__ = [
     'render_kpis_only',
     'render_period_analysis_only',
     'render_product_analysis_only',
+    'get_product_ranking',
+    'render_product_ranking',
+    'get_rolling_kpis',
+    'render_rolling_kpis',
+    'render_kpi_cube_explorer',
+    'render_alerts',
     
     # Debug View
     'render_debug_tab',
@@ -41,13 +41,11 @@ class DetailedReportAgent:
             Dict con el informe estructurado
         """
         
-        # Usar el servicio especializado para generar el informe
-        from services.detailed_report_service import DetailedReportService
+        # Usar el servicio especializado (memorizado por versión de datos)
+        from services.detailed_report_service import get_detailed_report
         
         try:
-            report_service = DetailedReportService(df)
-            report = report_service.generate_detailed_report()
-            return report
+            return get_detailed_report(df)
         except Exception as e:
             st.error(f"Error generando informe: {str(e)}")
             # Fallback a informe básico
@@ -212,13 +210,15 @@ def render_detailed_report_page():
     # Inicializar agente
     agent = DetailedReportAgent()
     
+    # Un solo informe por versión de datos: lo comparten la página y el PDF
+    with st.spinner("🔄 Generando informe detallado..."):
+        report = agent.generate_report(df)
+    
     # Botón de descarga PDF al inicio
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         if st.button("📄 Descargar Informe PDF", type="primary", use_container_width=True):
-            # Generar informe para PDF
             with st.spinner("🔄 Generando PDF..."):
-                report = agent.generate_report(df)
                 if report:
                     pdf_bytes = generate_pdf_report(report)
                     if pdf_bytes:
@@ -234,10 +234,6 @@ def render_detailed_report_page():
     
     st.markdown("---")
     
-    # Generar informe automáticamente (sin configuración visible)
-    with st.spinner("🔄 Generando informe detallado..."):
-        report = agent.generate_report(df)
-    
     if report:
         # Mostrar informe en una sola hoja
         st.success("✅ Informe generado exitosamente!")
@@ -353,6 +349,10 @@ def render_detailed_report_page():
                         value=f"{analysis['sackoff_alto_agua']:.2f}%",
                         delta=f"{analysis['sackoff_alto_agua'] - analysis['sackoff_bajo_agua']:.2f}% vs ≤500kg"
                     )
+                    if 'ic_alto_agua' in analysis:
+                        st.caption(f"IC {analysis['confianza']:.0%}: "
+                                   f"{analysis['ic_alto_agua'][0]:.2f}% a {analysis['ic_alto_agua'][1]:.2f}% · "
+                                   f"diferencia {analysis['ic_diferencia'][0]:+.2f} a {analysis['ic_diferencia'][1]:+.2f} pp")
                     
                     st.metric(
                         label="Órdenes con >500kg agua",
@@ -365,6 +365,9 @@ def render_detailed_report_page():
                         label="Sackoff Promedio (≤500kg agua)",
                         value=f"{analysis['sackoff_bajo_agua']:.2f}%"
                     )
+                    if 'ic_bajo_agua' in analysis:
+                        st.caption(f"IC {analysis['confianza']:.0%}: "
+                                   f"{analysis['ic_bajo_agua'][0]:.2f}% a {analysis['ic_bajo_agua'][1]:.2f}%")
                     
                     st.metric(
                         label="% Órdenes cerca de cero (>500kg)",
@@ -428,6 +431,10 @@ def render_detailed_report_page():
                         st.write(f"**Factor:** {corr['factor']}")
                         if 'correlacion' in corr:
                             st.write(f"**Correlación:** {corr['correlacion']}")
+                        if 'ic_diferencia' in corr:
+                            lower, upper = corr['ic_diferencia']
+                            st.write(f"**Diferencia de sackoff:** {corr['diferencia_sackoff']:+.2f} pp "
+                                     f"(IC {corr['confianza']:.0%}: {lower:+.2f} a {upper:+.2f} pp)")
                         st.write(f"**Impacto:** {corr['impacto']}")
                     
                     with col2:
@@ -438,9 +445,129 @@ def render_detailed_report_page():
                         st.success("✅ Impacto Positivo")
                     elif corr['impacto'] == 'negativo':
                         st.error("❌ Impacto Negativo")
+                    elif corr['impacto'] == 'no concluyente':
+                        st.info("➖ Diferencia no significativa: el intervalo de confianza incluye el 0")
                     else:
                         st.info("ℹ️ Impacto Bajo")
         
+        # Tendencias por periodo
+        tendencias = report.get('tendencias', {})
+        if tendencias.get('mensual') or tendencias.get('productos_deterioro'):
+            st.subheader("📈 Tendencias")
+
+            if tendencias.get('mensual'):
+                mensual = pd.DataFrame(tendencias['mensual'])
+                st.dataframe(
+                    pd.DataFrame({
+                        'Mes': pd.to_datetime(mensual['periodo']).dt.strftime('%Y-%m'),
+                        'Sackoff (%)': mensual['sackoff'].round(2),
+                        'Var. Sackoff (%)': mensual['sackoff_variacion_pct'].round(1),
+                        'Aceleración Sackoff': mensual['sackoff_aceleracion'].round(3),
+                        'Diferencia Toneladas': mensual['diferencia_toneladas'].round(1),
+                        'PDI Promedio': mensual['pdi_mean_agroindustrial'].round(2),
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+            if tendencias.get('productos_deterioro'):
+                st.write("**Productos con sackoff semanal en aumento**")
+                productos = pd.DataFrame(tendencias['productos_deterioro'])
+                st.dataframe(
+                    pd.DataFrame({
+                        'Producto': productos['nombre_producto'],
+                        'Semanas': productos['periodos'],
+                        'Sackoff Última Semana (%)': productos['sackoff'].round(2),
+                        'Pendiente (pp/semana)': productos['sackoff_pendiente'].round(3),
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+        # Cambios de régimen recientes
+        if report.get('cambios_regimen'):
+            st.subheader("🔀 Cambios de Régimen en el Sackoff Semanal")
+            st.caption("Cambios de nivel detectados (PELT) en la serie semanal de cada producto y grupo de "
+                       "Adiflow durante las últimas 8 semanas. Los rombos en los gráficos semanales marcan "
+                       "los cambios de la serie total de cada grupo.")
+            cambios = pd.DataFrame(report['cambios_regimen'])
+            st.dataframe(
+                pd.DataFrame({
+                    'Semana': pd.to_datetime(cambios['semana']).dt.strftime('%d/%m/%Y'),
+                    'Producto': cambios['producto'],
+                    'Adiflow': cambios['adiflow'],
+                    'Sackoff Anterior (%)': cambios['media_anterior'].round(2),
+                    'Sackoff Nuevo (%)': cambios['media_posterior'].round(2),
+                    'Cambio (pp)': cambios['cambio'].round(2),
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        # Control estadístico de procesos
+        if report.get('control_estadistico'):
+            st.subheader("📐 Control Estadístico de Calidad")
+            st.caption("Órdenes de las últimas 4 semanas fuera de los límites Shewhart (centro ± 3σ, σ por "
+                       "rango móvil) de cada producto, y estado actual del EWMA (λ = 0.2).")
+            control = pd.DataFrame(report['control_estadistico'])
+            st.dataframe(
+                pd.DataFrame({
+                    'Métrica': control['metrica_nombre'],
+                    'Producto': control['producto'],
+                    'Centro': control['centro'].round(2),
+                    'Límites': control['lci'].round(2).astype(str) + ' a ' + control['lcs'].round(2).astype(str),
+                    'Fuera de Control': control['fuera_control'].astype(str) + ' de ' +
+                                        control['evaluadas'].astype(str),
+                    'EWMA': control['ewma'].round(2),
+                    'Estado EWMA': control['estado_ewma'],
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        # Pronóstico del próximo mes por producto
+        pronostico = report.get('pronostico', {})
+        if pronostico.get('productos'):
+            st.subheader(f"🔮 Pronóstico {pronostico['periodo']}")
+            st.caption(f"Suavizamiento exponencial (nivel + tendencia) de las series semanales hasta la semana "
+                       f"del {pronostico['ultima_semana']}. Productos con mayor producción pronosticada; "
+                       f"el error típico es el de un pronóstico a una semana.")
+            productos = pd.DataFrame(pronostico['productos'])
+            st.dataframe(
+                pd.DataFrame({
+                    'Producto': productos['producto'],
+                    'Toneladas Producidas': productos['toneladas_producidas'].round(0),
+                    'Sackoff (%)': productos['sackoff'].round(2),
+                    'Error Típico Sackoff (pp)': productos['rmse_sackoff'].round(2),
+                    'PDI': productos['pdi_mean_agroindustrial'].round(1),
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        # Simulación de adopción de Adiflow
+        simulacion = report.get('simulacion_adiflow', {})
+        if simulacion.get('escenarios'):
+            st.subheader("🧪 Simulación: Mayor Adopción de Adiflow")
+            st.caption(
+                f"Base: {simulacion['periodo']} (sackoff {simulacion['sackoff_actual']:.2f}%, "
+                f"{simulacion['adopcion_actual']:.1f}% de órdenes con Adiflow). "
+                f"{simulacion['n_escenarios']:,} escenarios Monte Carlo por nivel."
+            )
+            escenarios = pd.DataFrame(simulacion['escenarios'])
+            st.dataframe(
+                pd.DataFrame({
+                    'Adopción Adicional (pp)': escenarios['adopcion_adicional'].round(0),
+                    'Adopción Simulada (%)': escenarios['adopcion_simulada'].round(1),
+                    'Sackoff Esperado (%)': escenarios['sackoff_medio'].round(2),
+                    'Rango 90% (%)': escenarios['sackoff_p5'].round(2).astype(str) + ' a ' +
+                                     escenarios['sackoff_p95'].round(2).astype(str),
+                    'Prob. de Mejora': (escenarios['prob_mejora'] * 100).round(1).astype(str) + '%',
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
         # Recomendaciones
         st.subheader("💡 Recomendaciones")
         
@@ -704,6 +831,11 @@ def generate_pdf_report(report: Dict) -> bytes:
         • Órdenes analizadas con >500kg: {analysis['total_alto_agua']}<br/>
         • Porcentaje cerca de cero (>500kg): {analysis['porcentaje_cerca_cero']:.1f}%<br/>
         """
+        if 'ic_diferencia' in analysis:
+            lower, upper = analysis['ic_diferencia']
+            analysis_text += (f"• Diferencia (>500kg vs ≤500kg): IC {analysis['confianza']:.0%} de "
+                              f"{lower:+.2f} a {upper:+.2f} pp"
+                              f"{'' if lower > 0 or upper < 0 else ' (incluye el 0: no significativa)'}<br/>")
         
         if analysis['tiene_tendencia_cerca_cero']:
             analysis_text += f"<br/><b>🎯 Conclusión:</b> Las órdenes con más de 500kg de agua tienden a tener sackoff cercano a cero, sugiriendo optimización del proceso."
@@ -766,6 +898,110 @@ def generate_pdf_report(report: Dict) -> bytes:
         
         story.append(Spacer(1, 15))
     
+    # Simulación de adopción de Adiflow
+    simulacion = report.get('simulacion_adiflow', {})
+    if simulacion.get('escenarios'):
+        story.append(Paragraph("🧪 SIMULACIÓN DE ADOPCIÓN DE ADIFLOW", subtitle_style))
+        story.append(Paragraph(
+            f"Base: {simulacion['periodo']} (sackoff {simulacion['sackoff_actual']:.2f}%, "
+            f"{simulacion['adopcion_actual']:.1f}% de órdenes con Adiflow), "
+            f"{simulacion['n_escenarios']:,} escenarios por nivel.", normal_style))
+        
+        sim_data = [['Adopción Adicional', 'Adopción Simulada', 'Sackoff Esperado', 'Rango 90%', 'Prob. Mejora']]
+        for escenario in simulacion['escenarios']:
+            sim_data.append([
+                f"+{escenario['adopcion_adicional']:.0f} pp",
+                f"{escenario['adopcion_simulada']:.1f}%",
+                f"{escenario['sackoff_medio']:.2f}%",
+                f"{escenario['sackoff_p5']:.2f}% a {escenario['sackoff_p95']:.2f}%",
+                f"{escenario['prob_mejora']:.0%}",
+            ])
+        
+        sim_table = Table(sim_data, colWidths=[1.2*inch, 1.2*inch, 1.2*inch, 1.6*inch, 1*inch])
+        sim_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(corporate_colors['accent'])),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor(corporate_colors['gray'])),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor(corporate_colors['light'])])
+        ]))
+        
+        story.append(sim_table)
+        story.append(Spacer(1, 15))
+    
+    # Control estadístico de procesos
+    if report.get('control_estadistico'):
+        story.append(Paragraph("📐 CONTROL ESTADÍSTICO DE CALIDAD", subtitle_style))
+        story.append(Paragraph(
+            "Órdenes de las últimas 4 semanas fuera de los límites Shewhart (centro ± 3σ) y estado del EWMA.",
+            normal_style))
+        
+        spc_data = [['Métrica', 'Producto', 'Límites', 'Fuera de Control', 'EWMA']]
+        for serie in report['control_estadistico']:
+            spc_data.append([
+                serie['metrica_nombre'],
+                str(serie['producto']),
+                f"{serie['lci']:.2f} a {serie['lcs']:.2f}",
+                f"{serie['fuera_control']} de {serie['evaluadas']}",
+                f"{serie['ewma']:.2f} ({serie['estado_ewma']})",
+            ])
+        
+        spc_table = Table(spc_data, colWidths=[1.3*inch, 1.5*inch, 1.3*inch, 1.1*inch, 1.3*inch])
+        spc_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(corporate_colors['accent'])),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor(corporate_colors['gray'])),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor(corporate_colors['light'])])
+        ]))
+        
+        story.append(spc_table)
+        story.append(Spacer(1, 15))
+    
+    # Pronóstico del próximo mes
+    pronostico = report.get('pronostico', {})
+    if pronostico.get('productos'):
+        story.append(Paragraph(f"🔮 PRONÓSTICO {pronostico['periodo'].upper()}", subtitle_style))
+        story.append(Paragraph(
+            f"Suavizamiento exponencial de las series semanales hasta la semana del "
+            f"{pronostico['ultima_semana']}.", normal_style))
+        
+        forecast_data = [['Producto', 'Toneladas', 'Sackoff', 'PDI']]
+        for producto in pronostico['productos']:
+            forecast_data.append([
+                str(producto['producto']),
+                f"{producto['toneladas_producidas']:,.0f}",
+                f"{producto['sackoff']:.2f}%",
+                f"{producto['pdi_mean_agroindustrial']:.1f}",
+            ])
+        
+        forecast_table = Table(forecast_data, colWidths=[2.4*inch, 1.4*inch, 1.2*inch, 1.2*inch])
+        forecast_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(corporate_colors['accent'])),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor(corporate_colors['gray'])),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor(corporate_colors['light'])])
+        ]))
+        
+        story.append(forecast_table)
+        story.append(Spacer(1, 15))
+    
     # Recomendaciones
     story.append(Paragraph("💡 RECOMENDACIONES", subtitle_style))
     for i, rec in enumerate(report['recomendaciones'], 1):
@@ -5,7 +5,9 @@ Maneja la visualización de KPIs y métricas de producción.
 
 import streamlit as st
 import pandas as pd
-from services.kpi_service import KPIService
+from services.kpi_service import KPIService, get_dashboard_kpis, get_kpi_history
+from services.kpi_cube import get_kpi_cube
+from services.alert_service import get_alert_engine
 from utils.kpi_components import (
     render_main_kpis_section, 
     render_product_analysis_section,
@@ -13,27 +15,49 @@ from utils.kpi_components import (
     render_debug_info,
     render_error_message
 )
+from utils.data_cache import memoize_kpis
+from utils.forecasting import get_kpi_forecasts
+from utils.period_engine import plant_now
 
 
 def render_kpis_section(df):
     """Renderiza la sección completa de KPIs."""
     if df is not None and len(df) > 0:
         try:
-            # Instanciar el servicio de KPIs
-            kpi_service = KPIService(df)
-            kpis = kpi_service.calculate_kpis()
-            period_info = kpi_service.get_period_info()
-            product_kpis = kpi_service.calculate_product_kpis()
+            # KPIs memorizados por versión de datos: un rerun sin cambios no recalcula
+            dashboard = get_dashboard_kpis(df)
+            kpis = dashboard['kpis']
+            period_info = dashboard['period_info']
+            product_kpis = dashboard['product_kpis']
+            # Serie de 12 meses de cada KPI (una sola agregación, memorizada)
+            history = get_kpi_history(df, freq='M', periods=12)
+            # Pronóstico del próximo mes (ajuste por lotes, memorizado por versión de datos)
+            forecasts = get_kpi_forecasts(df)
             
             # Display main KPIs
-            render_main_kpis_section(kpis)
+            render_main_kpis_section(kpis, history, forecasts)
+            
+            # Alertas de umbrales de las últimas semanas
+            render_alerts(df)
             
             # Display period information
             render_period_info(period_info)
             
             # Display product analysis
             render_product_analysis_section(product_kpis)
-            
+
+            # KPIs en ventanas móviles de días (sumas acumuladas, memorizados)
+            with st.expander("📈 KPIs móviles (7/30/90 días)", expanded=False):
+                render_rolling_kpis(df)
+
+            # Ranking de productos por sackoff
+            with st.expander("🏭 Ranking de productos por sackoff", expanded=False):
+                render_product_ranking(df)
+
+            # Exploración multidimensional de KPIs
+            with st.expander("🧊 Explorar KPIs por dimensión", expanded=False):
+                render_kpi_cube_explorer(df)
+
             st.divider()
             
         except ValueError as e:
@@ -52,23 +76,173 @@ def calculate_kpis(df):
         return None, None, None
     
     try:
-        kpi_service = KPIService(df)
-        kpis = kpi_service.calculate_kpis()
-        period_info = kpi_service.get_period_info()
-        product_kpis = kpi_service.calculate_product_kpis()
-        return kpis, period_info, product_kpis
+        dashboard = get_dashboard_kpis(df)
+        return dashboard['kpis'], dashboard['period_info'], dashboard['product_kpis']
     except Exception as e:
         st.error(f"Error al calcular KPIs: {str(e)}")
         return None, None, None
 
 
+def get_product_ranking(df, k=5, min_toneladas_producidas=0.0, days=None):
+    """Calcula el ranking de productos por sackoff (mayor y menor sackoff)."""
+    if df is None or len(df) == 0:
+        return None
+    
+    try:
+        # Con ventana en días el resultado depende de la fecha actual
+        period = plant_now().date() if days is not None else None
+        return memoize_kpis(
+            df, 'product_ranking',
+            lambda: KPIService(df).get_product_ranking(
+                k=k, min_toneladas_producidas=min_toneladas_producidas, days=days
+            ),
+            period=period,
+            params={'k': k, 'min_toneladas_producidas': min_toneladas_producidas, 'days': days},
+        )
+    except Exception as e:
+        st.error(f"Error al calcular ranking de productos: {str(e)}")
+        return None
+
+
+def get_rolling_kpis(df, windows=(7, 30, 90)):
+    """Calcula los KPIs en ventanas móviles de días (7/30/90 por defecto)."""
+    if df is None or len(df) == 0:
+        return None
+    
+    try:
+        return memoize_kpis(
+            df, 'rolling_kpis',
+            lambda: KPIService(df).get_rolling_kpis(windows=tuple(windows)),
+            params={'windows': tuple(windows)},
+        )
+    except Exception as e:
+        st.error(f"Error al calcular KPIs móviles: {str(e)}")
+        return None
+
+
+ROLLING_KPI_LABELS = {
+    'sackoff': 'Sackoff (%)',
+    'pdi_mean_agroindustrial': 'PDI (%)',
+    'dureza_mean_agroindustrial': 'Dureza',
+    'fino_mean_agroindustrial': 'Finos (%)',
+    'toneladas_producidas': 'Toneladas producidas',
+}
+
+
+def render_rolling_kpis(df, windows=(7, 30, 90), days=180):
+    """Renderiza los KPIs del último día por ventana y la serie de sackoff móvil."""
+    rolling = get_rolling_kpis(df, windows=windows)
+    if rolling is None or rolling.empty:
+        st.info("No hay fechas de producción para calcular KPIs móviles")
+        return
+    
+    last_day = rolling.index[-1]
+    latest = pd.DataFrame(
+        {f"{w} días": [rolling.at[last_day, f'{metric}_{w}d'] for metric in ROLLING_KPI_LABELS]
+         for w in windows},
+        index=list(ROLLING_KPI_LABELS.values()),
+    ).round(2)
+    st.markdown(f"**Ventanas que terminan el {last_day.strftime('%d/%m/%Y')}**")
+    st.dataframe(latest, use_container_width=True)
+    
+    sackoff = rolling[[f'sackoff_{w}d' for w in windows]].tail(days)
+    sackoff.columns = [f"Sackoff {w} días" for w in windows]
+    st.line_chart(sackoff)
+
+
+def render_product_ranking(df, k=5, min_toneladas_producidas=0.0, days=None):
+    """Renderiza el ranking de productos por sackoff."""
+    ranking = get_product_ranking(df, k=k, min_toneladas_producidas=min_toneladas_producidas, days=days)
+    if ranking is None:
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**🔴 Mayor sackoff**")
+        st.dataframe(ranking['mayor_sackoff'], hide_index=True, use_container_width=True)
+    with col2:
+        st.markdown("**🟢 Menor sackoff**")
+        st.dataframe(ranking['menor_sackoff'], hide_index=True, use_container_width=True)
+
+
+ALERT_SEVERITY_ICONS = {'alta': '🔴', 'media': '🟠', 'baja': '🟡'}
+
+
+def render_alerts(df, last_weeks=4):
+    """Renderiza las alertas de umbrales disparadas en las últimas semanas."""
+    if df is None or len(df) == 0:
+        return
+    
+    try:
+        alerts = get_alert_engine(df).alerts(last_weeks=last_weeks)
+        if alerts.empty:
+            st.success(f"✅ Sin alertas de umbrales en las últimas {last_weeks} semanas")
+            return
+        
+        with st.expander(f"🚨 Alertas de umbrales ({len(alerts)}) - últimas {last_weeks} semanas", expanded=True):
+            for alert in alerts.itertuples(index=False):
+                grupo = ", ".join(str(v) for v in alert.grupo.values()) or "Total"
+                semana = pd.Timestamp(alert.semana).strftime('%d/%m/%Y')
+                if alert.tipo == 'umbral':
+                    detalle = f"valor {alert.valor:.2f} (umbral {alert.umbral:+.2f})"
+                else:
+                    detalle = f"valor {alert.valor:.2f} vs {alert.referencia:.2f} la semana anterior"
+                icon = ALERT_SEVERITY_ICONS.get(alert.severidad, '⚠️')
+                st.markdown(f"{icon} **{alert.mensaje}** — {grupo}, semana del {semana}: {detalle}")
+    except Exception as e:
+        render_error_message(f"Error al evaluar alertas: {str(e)}")
+
+
+CUBE_DIMENSION_LABELS = {
+    'planta': 'Planta',
+    'producto': 'Producto',
+    'adiflow': 'Adiflow',
+    'semana': 'Semana',
+    'mes': 'Mes',
+}
+
+
+def render_kpi_cube_explorer(df):
+    """Renderiza una tabla de KPIs agregada por las dimensiones elegidas (cubo de KPIs)."""
+    if df is None or len(df) == 0:
+        return
+    
+    try:
+        cube = get_kpi_cube(df)
+        col1, col2 = st.columns(2)
+        with col1:
+            dims = st.multiselect(
+                "Agrupar por",
+                options=list(CUBE_DIMENSION_LABELS),
+                default=['mes', 'adiflow'],
+                format_func=CUBE_DIMENSION_LABELS.get,
+                key="kpi_cube_dims",
+            )
+        with col2:
+            meses = st.multiselect(
+                "Filtrar meses",
+                options=sorted(cube.members('mes'), reverse=True),
+                key="kpi_cube_meses",
+            )
+        
+        if meses:
+            cube = cube.filter(mes=meses)
+        table = cube.rollup(*dims)
+        st.dataframe(
+            table[['sackoff', 'diferencia_toneladas', 'toneladas_producidas', 'ordenes_despachadas',
+                   'pdi_mean_agroindustrial', 'dureza_mean_agroindustrial', 'fino_mean_agroindustrial']],
+            use_container_width=True,
+        )
+    except Exception as e:
+        render_error_message(f"Error al explorar KPIs: {str(e)}")
+
+
 def render_kpis_only(df):
     """Renderiza solo los KPIs principales sin análisis adicional."""
     if df is not None and len(df) > 0:
         try:
-            kpi_service = KPIService(df)
-            kpis = kpi_service.calculate_kpis()
-            render_main_kpis_section(kpis)
+            kpis = get_dashboard_kpis(df)['kpis']
+            render_main_kpis_section(kpis, get_kpi_history(df, freq='M', periods=12), get_kpi_forecasts(df))
         except Exception as e:
             render_error_message(f"Error al calcular KPIs: {str(e)}")
 
@@ -77,8 +251,7 @@ def render_period_analysis_only(df):
     """Renderiza solo el análisis de periodos."""
     if df is not None and len(df) > 0:
         try:
-            kpi_service = KPIService(df)
-            period_info = kpi_service.get_period_info()
+            period_info = get_dashboard_kpis(df)['period_info']
             render_period_info(period_info)
         except Exception as e:
             render_error_message(f"Error al calcular análisis de periodos: {str(e)}")
@@ -88,8 +261,7 @@ def render_product_analysis_only(df):
     """Renderiza solo el análisis de productos."""
     if df is not None and len(df) > 0:
         try:
-            kpi_service = KPIService(df)
-            product_kpis = kpi_service.calculate_product_kpis()
+            product_kpis = get_dashboard_kpis(df)['product_kpis']
             render_product_analysis_section(product_kpis)
         except Exception as e:
             render_error_message(f"Error al calcular análisis de productos: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+Datos sintéticos de producción compartidos por las pruebas.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.period_engine import plant_now  # noqa: E402
+
+
+def make_production_df(n: int = 4000, seed: int = 0, days: int = 120, tz: str = None) -> pd.DataFrame:
+    """
+    Órdenes de producción sintéticas que terminan hoy (hora de la planta).
+
+    Incluye órdenes no despachadas, valores de calidad nulos, productos nulos
+    y órdenes sin fecha; con `tz` las fechas se devuelven con zona horaria.
+    """
+    rng = np.random.default_rng(seed)
+    end = plant_now().tz_localize(None).normalize() + pd.Timedelta(days=1)
+    fechas = pd.Series(end - pd.to_timedelta(rng.uniform(0, days, n), unit='D'))
+    a_producir = rng.uniform(5, 40, n).round(2)
+    producidas = (a_producir * rng.uniform(0.97, 1.01, n)).round(2)
+    anuladas = np.where(rng.random(n) < 0.1, rng.uniform(0, 1, n), 0).round(2)
+
+    def quality(mean: float, sd: float) -> np.ndarray:
+        return np.where(rng.random(n) < 0.1, np.nan, rng.normal(mean, sd, n))
+
+    df = pd.DataFrame({
+        'orden_produccion': np.arange(n).astype(str),
+        'fecha_produccion': fechas,
+        'planta': rng.choice(['P1', 'P2'], n),
+        'nombre_producto': rng.choice([f'PROD_{i}' for i in range(12)], n).astype(object),
+        'toneladas_a_producir': a_producir,
+        'toneladas_producidas': producidas,
+        'toneladas_anuladas': anuladas,
+        'tiene_adiflow': rng.choice(['Con Adiflow', 'Sin Adiflow'], n),
+        'order_produccion_despachada': rng.choice(['Si', 'No'], n, p=[0.85, 0.15]),
+        'durabilidad_pct_qa_agroindustrial': quality(92, 2),
+        'dureza_qa_agroindustrial': quality(10, 1),
+        'finos_pct_qa_agroindustrial': quality(5, 1),
+        'peso_agua_kg': rng.uniform(100, 1200, n),
+    })
+    df.loc[rng.random(n) < 0.01, 'nombre_producto'] = np.nan
+    df.loc[rng.random(n) < 0.05, 'toneladas_anuladas'] = np.nan
+    df.loc[rng.random(n) < 0.005, 'fecha_produccion'] = pd.NaT
+    df['sackoff_por_orden_produccion'] = (a_producir - producidas - anuladas) / producidas * 100
+    if tz:
+        df['fecha_produccion'] = df['fecha_produccion'].dt.tz_localize('America/Bogota').dt.tz_convert(tz)
+    return df
+
+
+@pytest.fixture
+def production_df() -> pd.DataFrame:
+    return make_production_df()
+
+
+@pytest.fixture
+def production_df_tz() -> pd.DataFrame:
+    return make_production_df(seed=1, tz='UTC')
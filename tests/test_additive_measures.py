@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.kpi_service import KPIService
+from utils.period_engine import REPORTING_MONTH, get_period_engine
+from utils.production_metrics import (
+    compute_additive_measures,
+    compute_metric_diferencia_toneladas,
+    compute_metric_dureza_mean_agroindustrial,
+    compute_metric_sackoff,
+    filter_con_adiflow,
+    filter_sin_adiflow,
+)
+
+
+def test_grouped_sums_match_per_group_filters(production_df):
+    measures = compute_additive_measures(production_df, ['planta', 'nombre_producto'])
+    despachadas = production_df[production_df['order_produccion_despachada'] == 'Si']
+    for (planta, producto), row in measures.iterrows():
+        in_group = (production_df['planta'] == planta) & (
+            production_df['nombre_producto'].isna() if pd.isna(producto)
+            else production_df['nombre_producto'] == producto)
+        group = despachadas[in_group.loc[despachadas.index]]
+        assert row['toneladas_producidas'] == pytest.approx(group['toneladas_producidas'].sum(), rel=1e-9)
+        assert row['ordenes_despachadas'] == len(group)
+        dureza = production_df.loc[in_group, 'dureza_qa_agroindustrial']
+        assert row['dureza_qa_agroindustrial_sum'] == pytest.approx(dureza.sum(), rel=1e-9)
+        assert row['dureza_qa_agroindustrial_count'] == dureza.count()
+
+
+def test_mask_and_empty_selection(production_df):
+    mask = (production_df['planta'] == 'P1').to_numpy()
+    masked = compute_additive_measures(production_df, ['tiene_adiflow'], mask=mask)
+    direct = compute_additive_measures(production_df[mask], ['tiene_adiflow'])
+    pd.testing.assert_frame_equal(masked.sort_index(), direct.sort_index(), check_exact=False, rtol=1e-9)
+    assert compute_additive_measures(production_df, ['tiene_adiflow'], mask=np.zeros(len(mask), bool)).empty
+
+
+def test_dashboard_kpis_match_per_metric_functions(production_df):
+    kpis = KPIService(production_df).calculate_kpis()
+    engine = get_period_engine(production_df)
+    for field, offset in (('current', 0), ('previous', -1)):
+        data = engine.slice(engine.period(REPORTING_MONTH, offset))
+        expected = {
+            'sackoff_con_adiflow': round(compute_metric_sackoff(filter_con_adiflow(data)), 1),
+            'sackoff_sin_adiflow': round(compute_metric_sackoff(filter_sin_adiflow(data)), 1),
+            'dureza_mean_agroindustrial': round(compute_metric_dureza_mean_agroindustrial(data), 1),
+            'diferencia_toneladas': round(compute_metric_diferencia_toneladas(data), 1),
+        }
+        for key, value in expected.items():
+            assert kpis[key][field] == pytest.approx(value, abs=1e-9)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.adiflow_simulator import SIMULATION_COLUMNS, get_adiflow_simulation, simulate_adiflow_adoption
+from utils.production_metrics import compute_metric_sackoff
+
+LEVELS = (10, 30, 50)
+
+
+@pytest.mark.parametrize('missing', ['Con Adiflow', 'Sin Adiflow'])
+def test_missing_adiflow_group_returns_the_empty_result(production_df, missing):
+    df = production_df[production_df['tiene_adiflow'] != missing]
+    result = simulate_adiflow_adoption(df, levels=LEVELS, n_scenarios=100)
+    assert result['n_escenarios'] == 0
+    assert result['resumen'].empty and list(result['resumen'].columns) == SIMULATION_COLUMNS
+    assert result['distribuciones'].shape == (len(LEVELS), 0)
+    assert result['sackoff_actual'] == pytest.approx(compute_metric_sackoff(df), abs=1e-3)
+    assert result['adopcion_actual'] == (100.0 if missing == 'Sin Adiflow' else 0.0)
+
+
+def test_no_dispatched_orders_returns_the_empty_result(production_df):
+    df = production_df.assign(order_produccion_despachada='No')
+    result = simulate_adiflow_adoption(df, levels=LEVELS, n_scenarios=100)
+    assert result['n_escenarios'] == 0 and result['sackoff_actual'] == 0.0
+
+
+def test_summary_of_the_scenarios(production_df):
+    result = simulate_adiflow_adoption(production_df, levels=LEVELS, n_scenarios=2000)
+    summary = result['resumen']
+    assert result['distribuciones'].shape == (len(LEVELS), 2000)
+    assert summary['adopcion_adicional'].tolist() == list(LEVELS)
+    assert result['sackoff_actual'] == pytest.approx(compute_metric_sackoff(production_df), abs=1e-3)
+    assert (summary['sackoff_p5'] <= summary['sackoff_p50']).all()
+    assert (summary['sackoff_p50'] <= summary['sackoff_p95']).all()
+    assert summary['prob_mejora'].between(0, 1).all()
+    np.testing.assert_allclose(summary['cambio_medio'], summary['sackoff_medio'] - result['sackoff_actual'], atol=2e-3)
+
+
+def test_a_clear_adiflow_effect_grows_with_adoption(production_df):
+    # Con Adiflow se pierde 2 puntos menos: más adopción baja el sackoff
+    df = production_df.copy()
+    con = (df['tiene_adiflow'] == 'Con Adiflow').to_numpy()
+    df.loc[con, 'toneladas_a_producir'] = df.loc[con, 'toneladas_producidas'] * 0.98
+    df.loc[con, 'toneladas_anuladas'] = 0.0
+    summary = simulate_adiflow_adoption(df, levels=LEVELS, n_scenarios=2000)['resumen']
+    assert (summary['cambio_medio'] < 0).all()
+    assert summary['cambio_medio'].is_monotonic_decreasing
+    assert (summary['prob_mejora'] > 0.95).all()
+
+
+def test_seed_reproduces_the_scenarios(production_df):
+    first = simulate_adiflow_adoption(production_df, levels=LEVELS, n_scenarios=500, seed=3)
+    again = simulate_adiflow_adoption(production_df, levels=LEVELS, n_scenarios=500, seed=3)
+    np.testing.assert_array_equal(first['distribuciones'], again['distribuciones'])
+    pd.testing.assert_frame_equal(first['resumen'], again['resumen'])
+    other = simulate_adiflow_adoption(production_df, levels=LEVELS, n_scenarios=500, seed=4)
+    assert not np.array_equal(first['distribuciones'], other['distribuciones'])
+
+
+def test_memoized_simulation_returns_copies(production_df):
+    first = get_adiflow_simulation(production_df, levels=LEVELS, n_scenarios=200)
+    first['resumen'].loc[0, 'sackoff_medio'] = np.nan
+    first['distribuciones'][:] = 0
+    again = get_adiflow_simulation(production_df, levels=LEVELS, n_scenarios=200)
+    assert again['resumen']['sackoff_medio'].notna().all()
+    assert again['distribuciones'].any()
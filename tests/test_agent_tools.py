@@ -0,0 +1,14 @@
+import pytest
+
+from utils.production_metrics import calculate_kpis
+
+tools = pytest.importorskip('core.graph.tools')
+
+
+def test_calculate_kpis_sees_in_place_edits(production_df):
+    env = tools.create_safe_execution_environment()
+    before = env['calculate_kpis'](production_df)
+    production_df['toneladas_producidas'] *= 2
+    after = env['calculate_kpis'](production_df)
+    assert after != before
+    assert after == calculate_kpis(production_df)
@@ -0,0 +1,129 @@
+import pandas as pd
+import pytest
+
+from services.alert_service import DEFAULT_ALERT_RULES, AlertEngine
+from tests.conftest import make_production_df
+
+RULES = DEFAULT_ALERT_RULES + [
+    {'id': 'sube_sackoff_total', 'kpi': 'sackoff', 'operador': 'sube', 'umbral': 0.05},
+    {'id': 'cae_dureza_adiflow', 'kpi': 'dureza_mean_agroindustrial', 'operador': 'cae', 'umbral': 0.1,
+     'por': ['tiene_adiflow'], 'filtros': {'tiene_adiflow': 'Con Adiflow'}},
+    {'id': 'finos_altos', 'kpi': 'fino_mean_agroindustrial', 'operador': '>=', 'umbral': 5.3,
+     'por': ['nombre_producto', 'tiene_adiflow'], 'min_ordenes': 3},
+]
+
+
+def alert_values(engine):
+    """Alertas como {(regla, semana, grupo): (valor, referencia)} para compararlas con tolerancia."""
+    return {
+        (row.regla, pd.Timestamp(row.semana), tuple(sorted(row.grupo.items()))): (row.valor, row.referencia)
+        for row in engine.alerts().itertuples(index=False)
+    }
+
+
+def assert_same_alerts(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, (valor, referencia) in expected.items():
+        assert actual[key] == pytest.approx((valor, referencia), rel=1e-9, abs=1e-9), key
+
+
+def test_every_rule_fires_on_the_test_data(production_df):
+    fired = {key[0] for key in alert_values(AlertEngine(RULES, production_df))}
+    assert fired == {rule['id'] for rule in RULES}
+
+
+@pytest.mark.parametrize('frame', ['production_df', 'production_df_tz'])
+def test_incremental_batches_match_a_rebuild(request, frame):
+    production_df = request.getfixturevalue(frame)
+    expected = alert_values(AlertEngine(RULES, production_df))
+
+    engine = AlertEngine(RULES)
+    shuffled = production_df.sample(frac=1, random_state=0)
+    for start in range(0, len(shuffled), 700):
+        engine.add(shuffled.iloc[start:start + 700])
+    assert_same_alerts(alert_values(engine), expected)
+
+
+def test_remove_matches_a_rebuild_without_the_rows(production_df):
+    engine = AlertEngine(RULES, production_df)
+    # Retirar semanas completas de un producto cambia la referencia de la semana siguiente
+    semana = production_df['fecha_produccion'].dt.to_period('W').dt.start_time
+    weeks = semana.dropna().sort_values().unique()
+    removed = production_df[semana.isin(weeks[[3, 4, 9]]) | (production_df.index % 7 == 0)]
+    engine.remove(removed)
+    assert_same_alerts(alert_values(engine), alert_values(AlertEngine(RULES, production_df.drop(removed.index))))
+
+    engine.remove(production_df.drop(removed.index))
+    assert len(engine) == 0
+
+
+def _two_weeks(pdi_first, pdi_second):
+    """Órdenes de un producto en dos semanas consecutivas con el PDI indicado."""
+    df = make_production_df(n=40, seed=4).iloc[:0]
+    lunes = pd.Timestamp('2025-03-03 10:00')
+    rows = []
+    for week, pdi in ((0, pdi_first), (1, pdi_second)):
+        for day in range(3):
+            rows.append({
+                'orden_produccion': f'{week}-{day}',
+                'fecha_produccion': lunes + pd.Timedelta(weeks=week, days=day),
+                'nombre_producto': 'PROD_X',
+                'toneladas_a_producir': 10.0,
+                'toneladas_producidas': 10.0,
+                'toneladas_anuladas': 0.0,
+                'tiene_adiflow': 'Con Adiflow',
+                'order_produccion_despachada': 'Si',
+                'durabilidad_pct_qa_agroindustrial': pdi,
+            })
+    df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+    week = df['fecha_produccion'] < lunes + pd.Timedelta(weeks=1)
+    return df[week], df[~week]
+
+
+def test_change_rules_react_to_the_previous_week():
+    first, second = _two_weeks(pdi_first=95.0, pdi_second=92.0)
+    rules = [rule for rule in DEFAULT_ALERT_RULES if rule['id'] == 'caida_pdi_producto']
+
+    # La semana siguiente sola no tiene referencia
+    engine = AlertEngine(rules, second)
+    assert len(engine) == 0
+
+    # Agregar la semana anterior re-evalúa la siguiente
+    engine.add(first)
+    alerts = engine.alerts()
+    assert len(alerts) == 1
+    alert = alerts.iloc[0]
+    assert pd.Timestamp(alert['semana']) == pd.Timestamp('2025-03-10')
+    assert alert['grupo'] == {'nombre_producto': 'PROD_X'}
+    assert (alert['valor'], alert['referencia']) == pytest.approx((92.0, 95.0))
+    assert alert_values(engine) == alert_values(AlertEngine(rules, pd.concat([first, second])))
+
+    # Retirarla vuelve a dejar la semana siguiente sin referencia
+    engine.remove(first)
+    assert len(engine) == 0
+
+    # Una caída menor que el umbral no dispara
+    small_first, small_second = _two_weeks(pdi_first=95.0, pdi_second=94.5)
+    assert len(AlertEngine(rules, pd.concat([small_first, small_second]))) == 0
+
+
+def test_last_weeks_uses_the_reference_date():
+    first, second = _two_weeks(pdi_first=95.0, pdi_second=92.0)
+    engine = AlertEngine(df=pd.concat([first, second]))
+    semanas = pd.to_datetime(engine.alerts()['semana'])
+    assert set(semanas) == {pd.Timestamp('2025-03-03'), pd.Timestamp('2025-03-10')}
+
+    current = engine.alerts(last_weeks=1, now='2025-03-12')
+    assert set(pd.to_datetime(current['semana'])) == {pd.Timestamp('2025-03-10')}
+    assert len(engine.alerts(last_weeks=2, now='2025-03-12')) == len(semanas)
+    assert engine.alerts(last_weeks=1, now='2025-03-20').empty
+    assert len(engine.alerts(last_weeks=2, now='2025-03-20')) == len(current)
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError, match='missing'):
+        AlertEngine([{'id': 'x', 'kpi': 'sackoff', 'operador': '>'}])
+    with pytest.raises(ValueError, match='Unknown operator'):
+        AlertEngine([{'id': 'x', 'kpi': 'sackoff', 'operador': '!=', 'umbral': 0}])
+    with pytest.raises(ValueError, match='Unknown group levels'):
+        AlertEngine([{'id': 'x', 'kpi': 'sackoff', 'operador': '>', 'umbral': 0, 'por': ['planta']}])
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.anomaly_detection import MAD_SCALE, MEAN_AD_SCALE, _rolling_robust_stats, detect_anomalies_robust
+
+
+def _frame(values, groups=None, start='2025-01-01'):
+    values = np.asarray(values, dtype=float)
+    return pd.DataFrame({
+        'fecha_produccion': pd.date_range(start, periods=len(values), freq='h'),
+        'nombre_producto': ['A'] * len(values) if groups is None else groups,
+        'dureza_qa_agroindustrial': values,
+    })
+
+
+def test_full_history_scores_by_group(production_df):
+    production_df.loc[[5, 50, 500], 'dureza_qa_agroindustrial'] = [25.0, -3.0, 18.0]
+    table = detect_anomalies_robust(production_df, columns=['dureza_qa_agroindustrial'])
+    assert {5, 50, 500} <= set(table['fila'])
+    row = table.iloc[0]
+    grupo = production_df['nombre_producto'].fillna('(sin dato)') == row['grupo']
+    values = production_df.loc[grupo, 'dureza_qa_agroindustrial'].dropna()
+    median = values.median()
+    mad = (values - median).abs().median()
+    assert row['mediana'] == pytest.approx(median)
+    assert row['mad'] == pytest.approx(mad)
+    assert row['score'] == pytest.approx((row['valor'] - median) / (MAD_SCALE * mad), abs=1e-3)
+    assert (table['score'].abs() > 3.5).all()
+    assert table['score'].abs().is_monotonic_decreasing
+
+
+def test_zero_mad_falls_back_to_mean_absolute_deviation():
+    # Más de la mitad de los valores iguales: MAD = 0 y la escala es la desviación absoluta media
+    values = [10.0] * 30 + [11.0] * 5 + [30.0]
+    table = detect_anomalies_robust(_frame(values), columns=['dureza_qa_agroindustrial'])
+    assert table['valor'].tolist() == [30.0]
+    mean_ad = np.mean(np.abs(np.asarray(values) - 10.0))
+    assert table.loc[0, 'mad'] == 0
+    assert table.loc[0, 'score'] == pytest.approx(20.0 / (MEAN_AD_SCALE * mean_ad), abs=1e-3)
+
+    constant = detect_anomalies_robust(_frame([5.0] * 20), columns=['dureza_qa_agroindustrial'])
+    assert constant.empty
+
+
+def test_window_stats_match_a_direct_recomputation():
+    rng = np.random.default_rng(0)
+    n, window = 250, 15
+    values = rng.normal(size=(n, 2))
+    values[rng.random((n, 2)) < 0.1] = np.nan
+    codes = np.sort(rng.integers(0, 4, n))
+    group_start = np.searchsorted(codes, codes)
+
+    median, mad, mean_ad, counts = _rolling_robust_stats(values, group_start, window)
+    for i in range(n):
+        for col in range(2):
+            win = values[max(group_start[i], i - window + 1):i + 1, col]
+            win = win[~np.isnan(win)]
+            assert counts[i, col] == len(win)
+            if len(win) == 0:
+                assert np.isnan(median[i, col])
+                continue
+            center = np.median(win)
+            assert median[i, col] == pytest.approx(center)
+            assert mad[i, col] == pytest.approx(np.median(np.abs(win - center)))
+            assert mean_ad[i, col] == pytest.approx(np.mean(np.abs(win - center)))
+
+
+def test_windowed_scores_use_each_window_and_group():
+    # El nivel sube de 0 a 100: con ventanas el nuevo nivel deja de ser anómalo, con el histórico no
+    rng = np.random.default_rng(1)
+    values = np.r_[rng.normal(0, 1, 60), rng.normal(100, 1, 60)]
+    values[-1] = 120.0
+    shuffled = np.random.default_rng(2).permutation(len(values))
+    df = _frame(values).iloc[shuffled]
+
+    windowed = detect_anomalies_robust(df, columns=['dureza_qa_agroindustrial'], window=20)
+    assert windowed['valor'].max() == 120.0
+    assert windowed['fila'].isin(range(60, 80)).sum() <= 10  # solo el cambio de nivel
+    last = windowed[windowed['valor'] == 120.0].iloc[0]
+    window_values = values[-20:]
+    center = np.median(window_values)
+    assert last['mediana'] == pytest.approx(center)
+    assert last['mad'] == pytest.approx(np.median(np.abs(window_values - center)))
+
+    full = detect_anomalies_robust(df, columns=['dureza_qa_agroindustrial'])
+    assert full.empty or 120.0 not in full['valor'].tolist()
+
+    # Otro grupo intercalado no entra en las ventanas del primero
+    mixed = pd.concat([df, _frame(np.full(120, 1000.0), groups=['B'] * 120)], ignore_index=True)
+    again = detect_anomalies_robust(mixed, columns=['dureza_qa_agroindustrial'], window=20)
+    assert set(again['grupo']) == {'A'}
+    assert again.loc[again['valor'] == 120.0, 'score'].iloc[0] == pytest.approx(last['score'])
+
+
+def test_min_periods_and_empty_inputs():
+    values = [0.0, 0.1, -0.1, 0.2, 50.0]
+    assert detect_anomalies_robust(_frame(values), columns=['dureza_qa_agroindustrial'], window=5).empty
+    scored = detect_anomalies_robust(_frame(values), columns=['dureza_qa_agroindustrial'], window=5, min_periods=5)
+    assert scored['valor'].tolist() == [50.0]
+    assert detect_anomalies_robust(_frame([]), columns=['dureza_qa_agroindustrial']).empty
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.bootstrap import bootstrap_mean_difference, bootstrap_ratio, bootstrap_ratio_difference, bootstrap_sackoff
+from utils.production_metrics import compute_metric_sackoff
+
+
+def test_interval_covers_the_true_mean_at_the_nominal_rate():
+    # Media de una normal conocida: el IC 90 % debe contener la media real ~90 % de las veces
+    rng = np.random.default_rng(42)
+    hits = 0
+    trials = 200
+    for trial in range(trials):
+        sample = rng.normal(10.0, 2.0, size=80)
+        lower, upper = bootstrap_ratio(sample, n_resamples=400, confidence=0.9, seed=trial)['ic']
+        hits += lower <= 10.0 <= upper
+    assert 0.8 <= hits / trials <= 0.97
+
+
+def test_difference_of_known_distributions():
+    rng = np.random.default_rng(7)
+    a = pd.Series(rng.normal(5.0, 1.0, size=2000))
+    b = pd.Series(rng.normal(3.0, 1.0, size=2000))
+    ic = bootstrap_mean_difference(a, b, n_resamples=500)
+    lower, upper = ic['ic_diferencia']
+    assert lower < 2.0 < upper
+    assert ic['significativo'] and ic['probabilidad_positiva'] == 1.0
+
+
+def test_same_seed_reproduces_and_other_seed_differs():
+    values = np.random.default_rng(0).exponential(size=300)
+    first = bootstrap_ratio(values, n_resamples=200, seed=3)
+    assert bootstrap_ratio(values, n_resamples=200, seed=3) == first
+    assert bootstrap_ratio(values, n_resamples=200, seed=4)['ic'] != first['ic']
+
+
+def test_empty_groups_give_zero_ratios():
+    empty = np.array([], dtype=float)
+    result = bootstrap_ratio(empty, n_resamples=50)
+    assert result['valor'] == 0.0 and result['ic'] == (0.0, 0.0) and result['n'] == 0
+
+    diff = bootstrap_ratio_difference((np.array([1.0, 2.0]), np.ones(2)), (empty, empty), n_resamples=50)
+    assert diff['n_b'] == 0 and diff['valor_b'] == 0.0 and diff['ic_b'] == (0.0, 0.0)
+    assert diff['diferencia'] == diff['valor_a']
+
+    sin_valores = bootstrap_mean_difference(pd.Series([np.nan, np.nan]), pd.Series([1.0, 3.0]), n_resamples=50)
+    assert sin_valores['n_a'] == 0 and sin_valores['valor_a'] == 0.0
+
+
+def test_sackoff_matches_the_point_estimate(production_df):
+    result = bootstrap_sackoff(production_df, n_resamples=100)
+    assert result['valor'] == pytest.approx(compute_metric_sackoff(production_df), abs=1e-3)
+    assert result['ic'][0] <= result['valor'] <= result['ic'][1]
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        bootstrap_ratio(np.ones(3), n_resamples=0)
+    with pytest.raises(ValueError):
+        bootstrap_ratio(np.ones(3), confidence=1.0)
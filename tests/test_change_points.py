@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from utils.change_points import cusum_alarms, default_penalty, detect_change_points_batch, pelt
+
+
+def _optimal_partition(x: np.ndarray, penalty: float, min_size: int) -> list:
+    """Partición óptima por programación dinámica completa (sin poda)."""
+    n = len(x)
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    previous = np.zeros(n + 1, dtype=int)
+    for end in range(min_size, n + 1):
+        for start in range(0, end - min_size + 1):
+            if start and start < min_size:
+                continue
+            segment = x[start:end]
+            total = best[start] + ((segment - segment.mean()) ** 2).sum() + penalty
+            if total < best[end]:
+                best[end], previous[end] = total, start
+    changes, end = [], n
+    while end > 0:
+        end = previous[end]
+        if end > 0:
+            changes.append(end)
+    return sorted(changes)
+
+
+def test_pelt_matches_exhaustive_optimal_partition():
+    rng = np.random.default_rng(0)
+    for _ in range(30):
+        levels = rng.choice([0.0, 1.5, -1.0], size=4)
+        x = np.repeat(levels, rng.integers(4, 12, size=4))
+        x = x + rng.normal(0, 0.5, len(x))
+        penalty = default_penalty(x)
+        assert pelt(x, penalty=penalty, min_size=3) == _optimal_partition(x, penalty, 3)
+
+
+def test_pelt_finds_planted_shift():
+    rng = np.random.default_rng(1)
+    x = np.concatenate([rng.normal(0, 1, 30), rng.normal(4, 1, 30)])
+    assert pelt(x) == [30]
+    assert pelt(rng.normal(0, 1, 60)) == []
+
+
+def test_cusum_alarms_after_shift():
+    rng = np.random.default_rng(2)
+    x = np.concatenate([rng.normal(0, 1, 30), rng.normal(5, 1, 20)])
+    alarms = cusum_alarms(x)
+    assert alarms and alarms[0]['direccion'] == 'sube'
+    assert 30 <= alarms[0]['indice'] < 35
+
+
+def test_batch_runs_every_group_separately():
+    rng = np.random.default_rng(3)
+    semanas = pd.date_range('2025-01-06', periods=40, freq='W-MON')
+    series = pd.concat([
+        pd.DataFrame({'grupo': 'A', 'semana': semanas,
+                      'kpi': np.concatenate([rng.normal(0, 0.3, 20), rng.normal(3, 0.3, 20)])}),
+        pd.DataFrame({'grupo': 'B', 'semana': semanas, 'kpi': rng.normal(0, 0.3, 40)}),
+    ]).sample(frac=1.0, random_state=0)
+    changes = detect_change_points_batch(series, 'kpi', ['grupo'])
+    assert changes['grupo'].tolist() == ['A']
+    assert changes['semana'].iloc[0] == semanas[20]
+    assert changes['cambio'].iloc[0] > 2
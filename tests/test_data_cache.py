@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.kpi_cube import get_kpi_cube
+from utils.data_cache import BoundedCache, bump_data_version, frame_cache, get_data_version, kpi_cache
+from utils.period_engine import get_period_engine, local_dates
+
+
+def test_lru_eviction_and_on_evict():
+    evicted = []
+    cache = BoundedCache(2, on_evict=lambda key, value: evicted.append((key, value)))
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # 'a' pasa a ser la más reciente
+    cache.set('c', 3)
+    assert evicted == [('b', 2)]
+    assert cache.get('b') is None
+    cache.clear()
+    assert sorted(evicted) == [('a', 1), ('b', 2), ('c', 3)]
+    assert len(cache) == 0
+
+
+def test_data_version_follows_object_and_shape(production_df):
+    version = get_data_version(production_df)
+    assert get_data_version(production_df) == version
+    assert get_data_version(production_df.copy()) != version
+    assert bump_data_version(production_df) != version
+
+
+def test_heavy_per_frame_objects_live_in_the_frame_cache(production_df):
+    frame_cache.clear()
+    kpi_entries = len(kpi_cache)
+    engine = get_period_engine(production_df)
+    cube = get_kpi_cube(production_df)
+    assert get_period_engine(production_df) is engine
+    assert get_kpi_cube(production_df) is cube
+    assert len(frame_cache) == 2
+    assert len(kpi_cache) == kpi_entries
+
+    # Muchos DataFrames temporales no retienen más de FRAME_CACHE_MAX_ENTRIES objetos
+    for i in range(frame_cache.max_entries + 3):
+        get_period_engine(production_df.iloc[i:])
+    assert len(frame_cache) == frame_cache.max_entries
+
+
+def test_period_slices_match_boolean_filters(production_df_tz):
+    engine = get_period_engine(production_df_tz)
+    local = local_dates(production_df_tz['fecha_produccion'])
+    for kind in ('day', 'week', 'month'):
+        for offset in (0, -1):
+            period = engine.period(kind, offset)
+            expected = production_df_tz[((local >= period.start) & (local < period.end)).to_numpy()]
+            sliced = engine.slice(period)
+            assert sorted(sliced['orden_produccion']) == sorted(expected['orden_produccion'])
+
+
+def test_get_or_compute_runs_once_per_key_across_threads():
+    cache = BoundedCache(8)
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    def worker(_):
+        barrier.wait()
+        return cache.get_or_compute('k', compute)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        values = list(pool.map(worker, range(8)))
+    assert len(calls) == 1
+    assert all(value is values[0] for value in values)
+    assert cache.misses == 1 and cache.hits == 7
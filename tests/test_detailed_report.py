@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from services.detailed_report_service import DetailedReportService
+from tests.conftest import make_production_df
+from utils.data_cache import kpi_cache
+from utils.period_engine import get_period_engine
+
+
+def _shifted_tz_df():
+    """Datos en hora de Tokio donde las toneladas con Adiflow se duplican desde una semana de la planta."""
+    df = make_production_df(seed=2, tz='Asia/Tokyo')
+    semana = get_period_engine(df).period_start('week').reindex(df.index)
+    shift_week = semana.dropna().sort_values().unique()[8]
+    shifted = ((semana >= shift_week) & (df['tiene_adiflow'] == 'Con Adiflow')).to_numpy()
+    df = df.copy()  # el motor de periodos ya quedó cacheado para el original
+    for col in ('toneladas_a_producir', 'toneladas_producidas'):
+        df.loc[shifted, col] = df.loc[shifted, col] * 2
+    return df, shift_week
+
+
+def test_change_point_markers_align_with_plant_weeks_on_tz_aware_data():
+    df, shift_week = _shifted_tz_df()
+    service = DetailedReportService(df)
+    fig = service._generate_toneladas_adiflow_chart()
+    weekly = service._weekly_adiflow()
+    con_adiflow = weekly[weekly['adiflow'] == 'Con Adiflow']
+
+    markers = [trace for trace in fig.data if trace.name == 'Cambio de régimen (Con Adiflow)']
+    assert len(markers) == 1
+    expected = con_adiflow.loc[con_adiflow['semana'] == shift_week, 'rango_fechas'].tolist()
+    assert list(markers[0].x) == expected
+    np.testing.assert_allclose(
+        markers[0].y, con_adiflow.loc[con_adiflow['semana'] == shift_week, 'toneladas_producidas'])
+    assert not any(trace.name == 'Cambio de régimen (Sin Adiflow)' for trace in fig.data)
+
+    # Cada cambio cae en una semana de la misma tabla que se grafica
+    changes = service._weekly_change_points('toneladas_producidas')
+    assert changes['semana'].isin(weekly['semana']).all()
+
+
+def test_service_reuses_the_engine_frame_without_copies(production_df):
+    service = DetailedReportService(production_df)
+    assert service.df is get_period_engine(production_df).df
+    before = production_df.copy()
+    service.generate_detailed_report()
+    pd.testing.assert_frame_equal(production_df, before)
+
+
+def test_bootstraps_are_memoized_per_data_version(production_df, monkeypatch):
+    import services.detailed_report_service as module
+
+    calls = []
+
+    def counting(original):
+        def wrapper(*args, **kwargs):
+            calls.append(original.__name__)
+            return original(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(module, 'bootstrap_sackoff_difference', counting(module.bootstrap_sackoff_difference))
+    monkeypatch.setattr(module, 'bootstrap_mean_difference', counting(module.bootstrap_mean_difference))
+    kpi_cache.clear()
+    first = DetailedReportService(production_df)
+    correlations = first._analyze_correlations()
+    agua = first._analyze_sackoff_agua_relationship()
+    assert sorted(calls) == ['bootstrap_mean_difference', 'bootstrap_sackoff_difference']
+
+    second = DetailedReportService(production_df)
+    assert second._analyze_correlations() == correlations
+    assert second._analyze_sackoff_agua_relationship()['ic_diferencia'] == agua.get('ic_diferencia')
+    assert len(calls) == 2
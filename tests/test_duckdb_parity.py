@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip('duckdb')
+
+from config import config  # noqa: E402
+from services.kpi_service import KPIService  # noqa: E402
+from utils import duckdb_backend  # noqa: E402
+from utils.duckdb_backend import DuckDBMetrics, compare_backends, get_metrics_backend  # noqa: E402
+
+GROUPINGS = [
+    ('nombre_producto',),
+    ('planta', 'tiene_adiflow'),
+    ('nombre_producto', 'tiene_adiflow'),
+    ('order_produccion_despachada', 'planta'),
+]
+
+
+@pytest.fixture
+def pandas_backend(monkeypatch):
+    monkeypatch.setattr(config, 'METRICS_BACKEND', 'pandas')
+
+
+@pytest.mark.parametrize('by', GROUPINGS)
+def test_additive_measures_match_pandas(production_df, production_df_tz, by):
+    assert compare_backends(production_df, by) == {}
+    assert compare_backends(production_df_tz, by) == {}
+
+
+@pytest.mark.parametrize('frame', ['production_df', 'production_df_tz'])
+def test_calculate_kpis_match_pandas(request, pandas_backend, frame):
+    df = request.getfixturevalue(frame)
+    expected = KPIService(df).calculate_kpis()
+    backend = DuckDBMetrics(df)
+    try:
+        assert backend.calculate_kpis() == expected
+    finally:
+        backend.close()
+
+
+def test_backend_is_shared_per_data_version_and_closed_on_eviction(production_df, monkeypatch):
+    monkeypatch.setattr(config, 'METRICS_BACKEND', 'duckdb')
+    duckdb_backend._backends.clear()
+    first = get_metrics_backend(production_df)
+    assert get_metrics_backend(production_df) is first
+
+    closed = []
+    monkeypatch.setattr(first, 'close', lambda: closed.append(True))
+    others = [production_df.copy() for _ in range(duckdb_backend._backends.max_entries)]
+    for other in others:
+        get_metrics_backend(other)
+    assert closed == [True]
+    duckdb_backend._backends.clear()
+
+
+def test_pandas_backend_creates_no_connection(production_df, pandas_backend):
+    assert get_metrics_backend(production_df) is None
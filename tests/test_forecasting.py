@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import forecasting
+from utils.forecasting import HoltForecaster, fit_weekly_forecaster, get_kpi_forecasts, holt_filter
+from utils.period_engine import get_period_engine
+
+
+def _matrix(weeks: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    index = pd.MultiIndex.from_product([['A', 'B', 'C'], ['sackoff']], names=['grupo', 'kpi'])
+    trend = np.arange(weeks) * rng.normal(0, 0.05, (3, 1))
+    values = 1 + trend + rng.normal(0, 0.2, (3, weeks))
+    values[0, ::5] = np.nan
+    return pd.DataFrame(values, index=index, columns=pd.date_range('2025-01-06', periods=weeks, freq='7D'))
+
+
+def test_update_produces_the_same_state_as_a_full_pass():
+    full = _matrix(40)
+    updated = HoltForecaster().fit(full.iloc[:, :30]).update(full)
+
+    # Mismos parámetros elegidos, recorrido completo de la historia de una vez
+    level, trend, sse, count = holt_filter(full.to_numpy(dtype=float), updated.alpha, updated.beta)
+    np.testing.assert_allclose(updated.level, level)
+    np.testing.assert_allclose(updated.trend, trend)
+    np.testing.assert_allclose(updated.sse, sse)
+    np.testing.assert_array_equal(updated.count, count)
+    assert updated.weeks.equals(pd.DatetimeIndex(full.columns))
+
+
+def test_update_rejects_changed_history():
+    full = _matrix(40)
+    forecaster = HoltForecaster().fit(full.iloc[:, :30])
+    changed = full.copy()
+    changed.iloc[1, 3] += 1
+    assert not forecaster.extends(changed)
+    with pytest.raises(ValueError):
+        forecaster.update(changed)
+
+
+def test_incremental_fit_does_not_touch_the_previous_state():
+    forecasting._fits.clear()
+    full = _matrix(40)
+    first = fit_weekly_forecaster(full.iloc[:, :30])
+    level = first.level.copy()
+    second = fit_weekly_forecaster(full)
+    assert second is not first
+    np.testing.assert_array_equal(first.level, level)
+    assert len(first.weeks) == 30 and len(second.weeks) == 40
+
+    # Otra serie (p. ej. datos filtrados) no descarta el ajuste anterior
+    fit_weekly_forecaster(_matrix(20, seed=1))
+    third = fit_weekly_forecaster(pd.concat([full, _matrix(45).iloc[:, 40:]], axis=1))
+    np.testing.assert_allclose(third.alpha, second.alpha)
+
+
+def test_concurrent_fits_are_consistent():
+    forecasting._fits.clear()
+    matrices = [_matrix(30 + i) for i in range(8)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        fits = list(pool.map(fit_weekly_forecaster, matrices))
+    for matrix, fit in zip(matrices, fits):
+        level, _, _, _ = holt_filter(matrix.to_numpy(dtype=float), fit.alpha, fit.beta)
+        np.testing.assert_allclose(fit.level, level)
+
+
+def test_forecasts_are_keyed_by_the_current_week(production_df, monkeypatch):
+    calls = []
+    original = forecasting.forecast_next_month
+    monkeypatch.setattr(forecasting, 'forecast_next_month', lambda df, kind: calls.append(kind) or original(df, kind))
+    result = get_kpi_forecasts(production_df)
+    get_kpi_forecasts(production_df)
+    assert len(calls) == 1
+    assert set(result['tarjetas']) <= set(forecasting.CARD_SERIES)
+
+    # Una semana después (mismo mes pronosticado o no) se recalcula
+    calendar = get_period_engine(production_df).calendar
+    next_week = calendar.now() + pd.Timedelta(days=7)
+    monkeypatch.setattr(calendar, 'now', lambda: next_week)
+    get_kpi_forecasts(production_df)
+    assert len(calls) == 2
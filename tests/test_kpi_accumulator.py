@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import config
+from services.kpi_service import KPIService
+from utils.kpi_accumulator import KPIAccumulator
+
+
+@pytest.fixture(autouse=True)
+def pandas_backend(monkeypatch):
+    monkeypatch.setattr(config, 'METRICS_BACKEND', 'pandas')
+
+
+def assert_kpis_close(actual, expected, path='kpis'):
+    """Compara los diccionarios de KPIs con tolerancia (las sumas combinadas difieren en el último bit)."""
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict) and actual.keys() == expected.keys(), path
+        for key in expected:
+            assert_kpis_close(actual[key], expected[key], f'{path}.{key}')
+    elif isinstance(expected, (int, float, np.number)) and not isinstance(expected, bool):
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-9, nan_ok=True), path
+    else:
+        assert actual == expected, path
+
+
+def expected_kpis(df):
+    return KPIService(df.copy()).calculate_kpis()
+
+
+def test_batches_match_the_full_calculation(production_df):
+    # Los datos incluyen productos nulos, órdenes no despachadas y fechas nulas
+    assert production_df['nombre_producto'].isna().any()
+    assert (production_df['order_produccion_despachada'] == 'No').any()
+
+    whole = KPIAccumulator(production_df)
+    assert_kpis_close(whole.to_kpis(), expected_kpis(production_df))
+
+    batches = KPIAccumulator()
+    shuffled = production_df.sample(frac=1, random_state=0)
+    for start in range(0, len(shuffled), 900):
+        batches.add(shuffled.iloc[start:start + 900])
+    assert_kpis_close(batches.to_kpis(), whole.to_kpis())
+
+
+def test_correct_matches_the_corrected_frame(production_df):
+    accumulator = KPIAccumulator(production_df)
+    rng = np.random.default_rng(3)
+    index = production_df.index[rng.random(len(production_df)) < 0.1]
+    old_rows = production_df.loc[index]
+    new_rows = old_rows.copy()
+    new_rows['toneladas_producidas'] *= 0.9
+    new_rows.loc[new_rows.index[::3], 'nombre_producto'] = np.nan
+    new_rows.loc[new_rows.index[1::3], 'order_produccion_despachada'] = 'No'
+    new_rows.loc[new_rows.index[2::3], 'order_produccion_despachada'] = 'Si'
+    new_rows['durabilidad_pct_qa_agroindustrial'] = np.nan
+
+    corrected = production_df.copy()
+    corrected.loc[index] = new_rows
+    accumulator.correct(old_rows, new_rows)
+    assert_kpis_close(accumulator.to_kpis(), expected_kpis(corrected))
+    # Los KPIs se redondean a 1 decimal: el estado aditivo se compara sin redondeo
+    pd.testing.assert_frame_equal(accumulator.measures.sort_index(),
+                                  KPIAccumulator(corrected).measures.sort_index(), rtol=1e-9)
+
+
+def test_remove_matches_the_remaining_frame(production_df):
+    accumulator = KPIAccumulator(production_df)
+    removed = production_df[(production_df['order_produccion_despachada'] == 'No')
+                            | production_df['nombre_producto'].isna()
+                            | (production_df.index % 4 == 0)]
+    accumulator.remove(removed)
+    remaining = production_df.drop(removed.index)
+    assert_kpis_close(accumulator.to_kpis(), expected_kpis(remaining))
+    pd.testing.assert_frame_equal(accumulator.measures.sort_index(),
+                                  KPIAccumulator(remaining).measures.sort_index(), rtol=1e-9)
+
+
+def test_removing_everything_drops_the_groups(production_df):
+    accumulator = KPIAccumulator(production_df)
+    assert len(accumulator) > 0
+    accumulator.remove(production_df)
+    assert len(accumulator) == 0
+    assert_kpis_close(accumulator.to_kpis(), expected_kpis(production_df.iloc[:0]))
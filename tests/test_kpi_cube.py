@@ -0,0 +1,41 @@
+import pytest
+
+from services.kpi_cube import KPICube
+from utils.production_metrics import compute_metric_pdi_mean_agroindustrial, compute_metric_sackoff
+
+
+def test_rollup_matches_filtered_metrics(production_df):
+    cube = KPICube(production_df)
+    dated = production_df[production_df['fecha_produccion'].notna()]
+    rollup = cube.rollup('planta', 'adiflow')
+    for (planta, adiflow), row in rollup.iterrows():
+        group = dated[(dated['planta'] == planta) & (dated['tiene_adiflow'] == adiflow)]
+        assert row['sackoff'] == pytest.approx(compute_metric_sackoff(group), abs=1e-9)
+        assert row['pdi_mean_agroindustrial'] == pytest.approx(compute_metric_pdi_mean_agroindustrial(group))
+
+
+def test_rollup_totals_are_consistent_across_dimensions(production_df):
+    cube = KPICube(production_df)
+    total = cube.rollup()['toneladas_producidas'].iloc[0]
+    for dim in ('producto', 'semana', 'mes'):
+        assert cube.rollup(dim)['toneladas_producidas'].sum() == pytest.approx(total)
+    assert cube.kpi('toneladas_producidas', planta='P1') == pytest.approx(
+        cube.rollup('planta').loc['P1', 'toneladas_producidas'])
+
+
+@pytest.mark.parametrize('query', [
+    lambda cube: cube.rollup('plantaa'),
+    lambda cube: cube.measures('plantaa'),
+    lambda cube: cube.percentiles('pdi_mean_agroindustrial', 'plantaa'),
+    lambda cube: cube.filter(plantaa='P1'),
+])
+def test_unknown_dimension_raises_value_error(production_df, query):
+    with pytest.raises(ValueError, match='Unknown cube dimension'):
+        query(KPICube(production_df))
+
+
+def test_empty_slice_rolls_up_to_nothing(production_df):
+    cube = KPICube(production_df).filter(planta='no existe')
+    assert len(cube) == 0
+    assert cube.rollup('producto').empty
+    assert cube.percentiles('pdi_mean_agroindustrial', 'producto').empty
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from utils import metric_kernels as kernels
+
+
+def _direct(values, group_ids, n_groups, reduce):
+    return np.array([reduce(values[group_ids == g]) for g in range(n_groups)])
+
+
+@pytest.mark.parametrize('group_ids, n_groups', [
+    (np.array([0, 0, 0, 0, 0]), 2),          # último grupo vacío
+    (np.array([1, 1, 1, 1, 1]), 3),          # primer y último grupo vacíos
+    (np.array([0, 2, 2, 4, 0]), 6),          # vacíos intercalados y al final
+    (np.array([], dtype=np.int64), 3),       # sin filas
+])
+def test_grouped_reductions_with_empty_groups(group_ids, n_groups):
+    values = np.array([1.0, 2.0, np.nan, 4.0, 5.0])[:len(group_ids)]
+    sums = kernels.grouped_nansum(values, group_ids, n_groups)
+    np.testing.assert_allclose(sums, _direct(values, group_ids, n_groups, np.nansum))
+    np.testing.assert_array_equal(kernels.grouped_count(values, group_ids, n_groups),
+                                  _direct(values, group_ids, n_groups, lambda v: np.count_nonzero(~np.isnan(v))))
+    means = kernels.grouped_nanmean(values, group_ids, n_groups)
+    counts = kernels.grouped_count(values, group_ids, n_groups)
+    assert np.isnan(means[counts == 0]).all()
+    np.testing.assert_allclose(means[counts > 0], (sums / np.maximum(counts, 1))[counts > 0])
+
+
+def test_trailing_empty_group_keeps_its_neighbours_sum():
+    sums = kernels.grouped_nansum(np.array([1.0, 2.0, 3.0, 4.0, 5.0]), np.zeros(5, dtype=np.int64), 2)
+    np.testing.assert_array_equal(sums, [15.0, 0.0])
+
+
+def test_block_sums_match_row_by_row():
+    rng = np.random.default_rng(0)
+    block = rng.normal(size=(3, 200))
+    block[rng.random(block.shape) < 0.1] = np.nan
+    group_ids = rng.integers(0, 7, 200)
+    sums = kernels.grouped_nansum(block, group_ids, 9)
+    assert sums.shape == (9, 3)
+    for i, row in enumerate(block):
+        np.testing.assert_allclose(sums[:, i], kernels.grouped_nansum(row, group_ids, 9))
+    np.testing.assert_array_equal(sums[7:], 0.0)
+
+
+def test_grouped_sackoff_and_diferencia_match_scalar_kernels():
+    rng = np.random.default_rng(1)
+    a_producir = rng.uniform(5, 40, 300)
+    producidas = a_producir * rng.uniform(0.97, 1.01, 300)
+    anuladas = np.where(rng.random(300) < 0.2, np.nan, rng.uniform(0, 1, 300))
+    group_ids = rng.integers(0, 4, 300)
+    sackoff = kernels.grouped_sackoff(a_producir, producidas, anuladas, group_ids, 5)
+    diferencia = kernels.grouped_diferencia_toneladas(a_producir, producidas, anuladas, group_ids, 5)
+    for g in range(4):
+        rows = group_ids == g
+        assert sackoff[g] == pytest.approx(kernels.sackoff(a_producir[rows], producidas[rows], anuladas[rows]))
+        assert diferencia[g] == pytest.approx(
+            kernels.diferencia_toneladas(a_producir[rows], producidas[rows], anuladas[rows]))
+    assert sackoff[4] == 0 and diferencia[4] == 0
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from services.alert_service import AlertEngine
+from services.kpi_cube import KPICube
+from utils.period_engine import REPORTING_MONTH, PeriodCalendar, get_period_engine
+from utils.production_metrics import period_start
+from utils.time_index import TimeIndex
+
+
+@pytest.fixture
+def calendar():
+    return PeriodCalendar(fiscal_month_start_day=1, timezone='America/Bogota')
+
+
+def test_tz_aware_dates_are_bucketed_in_plant_time(calendar):
+    # 02:00 UTC del 1 de octubre es todavía 30 de septiembre en Bogotá
+    fechas = pd.Series(pd.to_datetime(['2026-10-01 02:00', '2026-10-01 06:00']).tz_localize('UTC'))
+    for kind in ('month', 'fiscal_month'):
+        starts = calendar.period_start(fechas, kind)
+        assert starts.tolist() == [pd.Timestamp('2026-09-01'), pd.Timestamp('2026-10-01')]
+    assert calendar.period_at('month', fechas.iloc[0]).key == (2026, 9)
+    assert calendar.month_key(fechas, 'month').tolist() == [202609, 202610]
+    assert period_start(fechas, 'M').iloc[0] == pd.Timestamp('2026-09-01')
+
+
+def test_fiscal_months_follow_the_start_day():
+    calendar = PeriodCalendar(fiscal_month_start_day=26, timezone='America/Bogota')
+    fechas = pd.Series(pd.to_datetime(['2026-09-25 12:00', '2026-09-26 12:00']))
+    assert calendar.period_start(fechas, 'fiscal_month').tolist() == [
+        pd.Timestamp('2026-08-26'), pd.Timestamp('2026-09-26')]
+    assert calendar.month_key(fechas, 'fiscal_month').tolist() == [202609, 202610]
+
+
+def test_cube_weeks_and_months_match_the_period_engine(production_df_tz):
+    engine = get_period_engine(production_df_tz)
+    cube = KPICube(production_df_tz)
+    semanas = engine.period_start('week').dropna()
+    assert sorted(cube.members('semana')) == sorted(semanas.unique())
+    months = engine.calendar.month_key(engine.df['fecha_produccion'].dropna(), REPORTING_MONTH)
+    assert sorted(cube.members('mes')) == sorted({f'{k // 100}-{k % 100:02d}' for k in months})
+
+    # Las órdenes de una semana del cubo son las del corte de esa semana en el motor
+    week = engine.period('week', -1)
+    expected = engine.slice(week)
+    rolled = cube.filter(semana=week.start).rollup()
+    assert rolled['ordenes_despachadas'].iloc[0] == (expected['order_produccion_despachada'] == 'Si').sum()
+
+
+def test_alert_weeks_use_plant_time(production_df_tz):
+    engine = AlertEngine(df=production_df_tz)
+    semanas = engine._state.index.get_level_values('semana')
+    assert semanas.tz is None
+    assert set(semanas) <= set(get_period_engine(production_df_tz).period_start('week').dropna())
+
+
+def test_last_n_days_defaults_to_the_current_instant(production_df_tz):
+    index = TimeIndex(production_df_tz)
+    now = pd.Timestamp.now(tz='UTC')
+    recent = index.last_n_days(7)
+    fechas = recent['fecha_produccion']
+    assert len(recent) > 0
+    assert (fechas >= now - pd.Timedelta(days=7, minutes=1)).all()
@@ -0,0 +1,63 @@
+import numpy as np
+
+from services.kpi_cube import KPICube
+from utils.quantile_sketch import TDigestSet
+
+
+def _groups(seed: int = 0, n: int = 20000, n_groups: int = 6):
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, n_groups, n)
+    values = rng.normal(codes * 2.0, 1.0 + codes * 0.5)
+    values[rng.random(n) < 0.05] = np.nan
+    return codes, values, n_groups
+
+
+def test_counts_extremes_and_accuracy():
+    codes, values, n_groups = _groups()
+    sketch = TDigestSet.from_values(codes, values, n_groups)
+    valid = ~np.isnan(values)
+    np.testing.assert_array_equal(sketch.count(), np.bincount(codes[valid], minlength=n_groups))
+
+    q = np.array([0.0, 0.1, 0.5, 0.9, 1.0])
+    result = sketch.quantiles(q)
+    for g in range(n_groups):
+        group = values[valid & (codes == g)]
+        expected = np.quantile(group, q)
+        iqr = np.subtract(*np.quantile(group, [0.75, 0.25]))
+        assert result[g, 0] == group.min() and result[g, -1] == group.max()
+        assert np.all(np.abs(result[g] - expected) <= 0.02 * iqr)
+
+
+def test_small_groups_are_exact_and_empty_groups_are_nan():
+    sketch = TDigestSet.from_values(np.array([0, 0, 0, 0, 0, 2]), np.array([5.0, 1.0, 3.0, 2.0, 4.0, 7.0]), 3)
+    result = sketch.quantiles([0.5])
+    assert result[0, 0] == 3.0
+    assert np.isnan(result[1, 0])
+    assert result[2, 0] == 7.0
+
+
+def test_merge_and_concat_match_a_direct_build():
+    codes, values, n_groups = _groups(seed=1)
+    mapping = np.array([0, 0, 1, 1, 2, -1])
+    merged = TDigestSet.from_values(codes, values, n_groups).merge(mapping, 3)
+    direct = TDigestSet.from_values(mapping[codes], values, 3)
+    np.testing.assert_array_equal(merged.count(), direct.count())
+    q = [0.1, 0.5, 0.9]
+    np.testing.assert_allclose(merged.quantiles(q), direct.quantiles(q), rtol=0, atol=0.05)
+
+    halves = np.array_split(np.arange(len(codes)), 2)
+    combined = TDigestSet.concat([TDigestSet.from_values(codes[h], values[h], n_groups) for h in halves])
+    whole = TDigestSet.from_values(codes, values, n_groups)
+    np.testing.assert_array_equal(combined.minimum, whole.minimum)
+    np.testing.assert_array_equal(combined.maximum, whole.maximum)
+    np.testing.assert_allclose(combined.quantiles(q), whole.quantiles(q), rtol=0, atol=0.05)
+
+
+def test_cube_percentiles_roll_up_from_cells(production_df):
+    cube = KPICube(production_df)
+    by_plant = cube.percentiles('pdi_mean_agroindustrial', 'planta', q=(0.5,))
+    dated = production_df[production_df['fecha_produccion'].notna()]
+    for planta, row in by_plant.iterrows():
+        values = dated.loc[dated['planta'] == planta, 'durabilidad_pct_qa_agroindustrial'].dropna()
+        assert row['n'] == len(values)
+        assert abs(row['p50'] - values.median()) < 0.05
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.production_metrics import QUALITY_METRICS, compute_metric_sackoff, compute_rolling_kpis
+
+
+def _direct_window(df, day, w):
+    """KPIs de la ventana [day - w + 1, day] recalculados filtrando el DataFrame."""
+    dia = df['fecha_produccion'].dt.normalize()
+    rows = df[(dia > day - pd.Timedelta(days=w)) & (dia <= day)]
+    despachadas = rows[rows['order_produccion_despachada'] == 'Si']
+    kpis = {
+        'sackoff': compute_metric_sackoff(rows),
+        'toneladas_producidas': despachadas['toneladas_producidas'].sum(),
+    }
+    for metric, col in QUALITY_METRICS.items():
+        kpis[metric] = rows[col].mean()
+    return kpis
+
+
+@pytest.mark.parametrize('windows', [(7, 30, 90), (1, 45)])
+def test_prefix_sum_windows_match_direct_recomputation(production_df, windows):
+    # Días sin producción dentro del rango: las ventanas deben contarlos como vacíos
+    dia = production_df['fecha_produccion'].dt.normalize()
+    gap = dia.dropna().sort_values().unique()[[10, 11, 12, 40]]
+    df = production_df[~dia.isin(gap)]
+
+    rolling = compute_rolling_kpis(df, windows=windows)
+    days = rolling.index
+    assert days.equals(pd.date_range(df['fecha_produccion'].min().normalize(),
+                                     df['fecha_produccion'].max().normalize(), freq='D', name='fecha_produccion'))
+    assert set(gap) <= set(days)
+
+    for day in list(days[[0, 5, 11, 12, 60]]) + [days[-1]]:
+        for w in windows:
+            expected = _direct_window(df, day, w)
+            for metric, value in expected.items():
+                actual = rolling.loc[day, f'{metric}_{w}d']
+                if np.isnan(value):
+                    assert np.isnan(actual), (day, w, metric)
+                else:
+                    assert actual == pytest.approx(value, abs=1.1e-3), (day, w, metric)
+
+
+def test_days_without_dispatched_orders_have_zero_tonnage(production_df):
+    df = production_df.copy()
+    df['order_produccion_despachada'] = 'No'
+    rolling = compute_rolling_kpis(df, windows=(7,))
+    assert (rolling['toneladas_producidas_7d'] == 0).all()
+    assert (rolling['sackoff_7d'] == 0).all()
+
+
+def test_no_dates_gives_an_empty_frame(production_df):
+    df = production_df.assign(fecha_produccion=pd.NaT)
+    rolling = compute_rolling_kpis(df, windows=(7, 30))
+    assert rolling.empty
+    assert list(rolling.columns) == [f'{metric}_{w}d' for w in (7, 30)
+                                     for metric in ['sackoff', *QUALITY_METRICS, 'toneladas_producidas']]
@@ -0,0 +1,102 @@
+import pandas as pd
+import pytest
+
+from utils.period_engine import REPORTING_MONTH, get_period_engine
+from utils.production_metrics import QUALITY_METRICS, compute_metric_sackoff
+from utils.sackoff_decomposition import EFFECTS, decompose_sackoff_change
+
+# Cada efecto total se redondea a 3 decimales
+ROUNDING = 2.5e-3
+
+
+def _orders(month, cells):
+    """Órdenes despachadas de un mes: cells = [(producto, adiflow, toneladas producidas, sackoff %)]."""
+    rows = []
+    for i, (producto, adiflow, producidas, sackoff) in enumerate(cells):
+        rows.append({
+            'fecha_produccion': pd.Timestamp(f'2025-{month:02d}-10') + pd.Timedelta(hours=i),
+            'nombre_producto': producto,
+            'tiene_adiflow': adiflow,
+            'order_produccion_despachada': 'Si',
+            'toneladas_a_producir': producidas * (1 + sackoff / 100),
+            'toneladas_producidas': producidas,
+            'toneladas_anuladas': 0.0,
+            **{col: float('nan') for col in QUALITY_METRICS.values()},
+        })
+    return rows
+
+
+def _decompose(rows):
+    df = pd.DataFrame(rows)
+    return decompose_sackoff_change(df, kind='month', current=(2025, 4), previous=(2025, 3))
+
+
+def assert_effects_add_up(result):
+    total = sum(result[effect] for effect in EFFECTS) + result['residuo']
+    assert total == pytest.approx(result['cambio'], abs=ROUNDING)
+    products = result['productos']
+    for effect in EFFECTS:
+        assert products[effect].sum() == pytest.approx(result[effect], abs=ROUNDING)
+
+
+def test_effects_add_up_to_the_change(production_df):
+    result = decompose_sackoff_change(production_df)
+    assert_effects_add_up(result)
+
+    engine = get_period_engine(production_df)
+    current = engine.period(REPORTING_MONTH)
+    previous = engine.calendar.offset(current, -1)
+    assert result['sackoff_actual'] == pytest.approx(compute_metric_sackoff(engine.slice(current)), abs=1e-3)
+    assert result['sackoff_anterior'] == pytest.approx(compute_metric_sackoff(engine.slice(previous)), abs=1e-3)
+    assert result['cambio'] == pytest.approx(result['sackoff_actual'] - result['sackoff_anterior'], abs=ROUNDING)
+
+
+def test_cells_without_produced_tons_go_to_the_residual(production_df):
+    df = production_df.copy()
+    engine = get_period_engine(production_df)
+    current = engine.period(REPORTING_MONTH)
+    mes = engine.period_start(REPORTING_MONTH).reindex(df.index)
+    cell = ((mes == current.start) & (df['nombre_producto'] == 'PROD_1')
+            & (df['tiene_adiflow'] == 'Con Adiflow')).to_numpy()
+    df.loc[cell, 'toneladas_producidas'] = 0.0
+
+    result = decompose_sackoff_change(df)
+    assert result['residuo'] != 0
+    assert_effects_add_up(result)
+
+
+def test_pure_mix_change():
+    # Mismas tasas por celda y misma adopción por producto; solo cambia el peso de cada producto
+    march = _orders(3, [('A', 'Con Adiflow', 50, 1.0), ('A', 'Sin Adiflow', 50, 3.0),
+                        ('B', 'Con Adiflow', 10, -1.0), ('B', 'Sin Adiflow', 10, 0.0)])
+    april = _orders(4, [('A', 'Con Adiflow', 10, 1.0), ('A', 'Sin Adiflow', 10, 3.0),
+                        ('B', 'Con Adiflow', 50, -1.0), ('B', 'Sin Adiflow', 50, 0.0)])
+    result = _decompose(march + april)
+    assert result['cambio'] < 0
+    assert result['efecto_mix'] == pytest.approx(result['cambio'], abs=ROUNDING)
+    assert result['efecto_adopcion'] == 0 and result['efecto_tasa'] == 0 and result['residuo'] == 0
+
+
+def test_adoption_and_rate_changes():
+    march = _orders(3, [('A', 'Con Adiflow', 20, 0.0), ('A', 'Sin Adiflow', 80, 2.0)])
+    # Más adopción dentro del producto, mismas tasas
+    adoption = _decompose(march + _orders(4, [('A', 'Con Adiflow', 80, 0.0), ('A', 'Sin Adiflow', 20, 2.0)]))
+    assert adoption['efecto_adopcion'] == pytest.approx(adoption['cambio'], abs=ROUNDING)
+    assert adoption['efecto_mix'] == 0 and adoption['efecto_tasa'] == 0
+
+    # Misma adopción, peor tasa sin Adiflow
+    rate = _decompose(march + _orders(4, [('A', 'Con Adiflow', 20, 0.0), ('A', 'Sin Adiflow', 80, 3.0)]))
+    assert rate['efecto_tasa'] == pytest.approx(0.8, abs=ROUNDING)
+    assert rate['efecto_mix'] == 0 and rate['efecto_adopcion'] == 0
+    assert_effects_add_up(rate)
+
+
+def test_new_product_counts_only_as_mix():
+    march = _orders(3, [('A', 'Con Adiflow', 50, 1.0), ('A', 'Sin Adiflow', 50, 1.0)])
+    april = _orders(4, [('A', 'Con Adiflow', 50, 1.0), ('A', 'Sin Adiflow', 50, 1.0),
+                        ('B', 'Sin Adiflow', 100, 5.0)])
+    result = _decompose(march + april)
+    assert result['cambio'] == pytest.approx(2.0, abs=ROUNDING)
+    assert result['efecto_mix'] == pytest.approx(2.0, abs=ROUNDING)
+    nuevo = result['productos'].set_index('nombre_producto').loc['B']
+    assert nuevo['toneladas_anterior'] == 0 and pd.isna(nuevo['sackoff_anterior'])
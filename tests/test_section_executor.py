@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from utils.section_executor import Section, critical_path, run_sections
+
+
+def _sections(log=None):
+    def step(value):
+        def func(*deps):
+            if log is not None:
+                log.append(value)
+            return value + sum(deps)
+        return func
+
+    return {
+        'a': Section(step(1)),
+        'b': Section(step(10), ('a',)),
+        'c': Section(step(100), ('a',)),
+        'd': Section(step(1000), ('b', 'c')),
+    }
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_sections_receive_their_dependencies(workers):
+    log = []
+    run = run_sections(_sections(log), max_workers=workers)
+    assert run.results == {'a': 1, 'b': 11, 'c': 101, 'd': 1112}
+    assert log[0] == 1 and log[-1] == 1000
+    assert set(run.timings) == {'a', 'b', 'c', 'd'}
+    assert run.critical_path <= run.total + 1e-6
+
+
+def test_sequential_runs_in_the_calling_thread():
+    threads = set()
+    run_sections({'a': Section(lambda: threads.add(threading.get_ident()))}, max_workers=1)
+    assert threads == {threading.get_ident()}
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match='inexistentes'):
+        run_sections({'a': Section(lambda x: x, ('z',))})
+    with pytest.raises(ValueError, match='circulares'):
+        run_sections({'a': Section(lambda x: x, ('b',)), 'b': Section(lambda x: x, ('a',))})
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_errors_propagate_and_stop_dependents(workers):
+    ran = []
+
+    def fail():
+        raise RuntimeError('boom')
+
+    sections = {
+        'fail': Section(fail),
+        'after': Section(lambda _: ran.append('after'), ('fail',)),
+    }
+    with pytest.raises(RuntimeError, match='boom'):
+        run_sections(sections, max_workers=workers)
+    assert ran == []
+
+
+def test_critical_path_follows_the_slowest_chain():
+    timings = {'a': 1.0, 'b': 2.0, 'c': 5.0, 'd': 1.0}
+    assert critical_path(_sections(), timings) == 7.0
+
+
+def test_waiting_sections_overlap():
+    # sleep libera el GIL: el tiempo total es la cadena más lenta, no la suma
+    sections = {name: Section(lambda: time.sleep(0.2)) for name in 'abcd'}
+    sections['e'] = Section(lambda *_: time.sleep(0.2), ('a', 'b'))
+    run = run_sections(sections, max_workers=4)
+    assert sum(run.timings.values()) > 0.95
+    assert run.total < 0.6
+
+
+@pytest.mark.skipif((os.cpu_count() or 1) < 2, reason='requiere al menos 2 núcleos')
+def test_cpu_bound_sections_use_several_cores():
+    # Ordenar en NumPy libera el GIL y, a diferencia de BLAS, usa un solo núcleo por llamada
+    values = np.random.default_rng(0).random(2_000_000)
+
+    def work():
+        for _ in range(5):
+            np.sort(values)
+
+    sections = {name: Section(work) for name in 'abcd'}
+    sequential = run_sections(sections, max_workers=1)
+    parallel = run_sections(sections, max_workers=min(4, os.cpu_count()))
+    assert parallel.total < 0.8 * sequential.total
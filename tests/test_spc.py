@@ -0,0 +1,66 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import spc
+from utils.period_engine import get_period_engine
+from utils.spc import D2, SPCState, build_spc_state, get_spc_summary
+
+
+def _ordered(df: pd.DataFrame) -> pd.DataFrame:
+    return get_period_engine(df).slice_range()
+
+
+def test_appending_orders_gives_the_same_limits(production_df):
+    data = _ordered(production_df)
+    expected = SPCState(data).limits()
+    for cut in (1, len(data) // 3, len(data) - 1):
+        incremental = SPCState(data.iloc[:cut]).add(data.iloc[cut:]).limits()
+        pd.testing.assert_frame_equal(incremental, expected, check_exact=False, rtol=1e-9)
+
+
+def test_limits_match_direct_computation(production_df):
+    data = _ordered(production_df)
+    limits = SPCState(data).limits().set_index(['metrica', 'producto'])
+    col = 'dureza_qa_agroindustrial'
+    for producto in ['PROD_0', 'PROD_5']:
+        values = data.loc[data['nombre_producto'] == producto, col].dropna().to_numpy()
+        row = limits.loc[(col, producto)]
+        sigma = np.abs(np.diff(values)).mean() / D2
+        assert row['centro'] == pytest.approx(values.mean(), abs=1e-3)
+        assert row['sigma'] == pytest.approx(sigma, abs=1e-3)
+        assert row['lcs'] == pytest.approx(values.mean() + 3 * sigma, abs=1e-3)
+
+
+def test_add_leaves_a_copied_state_untouched(production_df):
+    data = _ordered(production_df)
+    base = SPCState(data.iloc[:1000])
+    before = base.limits()
+    copy.copy(base).add(data.iloc[1000:])
+    pd.testing.assert_frame_equal(base.limits(), before)
+
+
+def test_build_state_reuses_a_state_only_when_data_extends_it(production_df):
+    spc._states.clear()
+    data = _ordered(production_df)
+    first = build_spc_state(data.iloc[:2000].copy())
+    extended = build_spc_state(data.copy())
+    assert extended.rows == len(data.dropna(subset=['fecha_produccion']))
+    pd.testing.assert_frame_equal(extended.limits(), SPCState(data).limits(), check_exact=False, rtol=1e-9)
+
+    changed = data.copy()
+    changed.iloc[5, changed.columns.get_loc('dureza_qa_agroindustrial')] = 99.0
+    assert not first.extends(changed)
+    pd.testing.assert_frame_equal(build_spc_state(changed).limits(), SPCState(changed).limits())
+
+
+def test_summary_is_keyed_by_plant_day(production_df, monkeypatch):
+    summary = get_spc_summary(production_df, days=7)
+    calendar = get_period_engine(production_df).calendar
+    later = calendar.now() + pd.Timedelta(days=30)
+    monkeypatch.setattr(calendar, 'now', lambda: later)
+    later_summary = get_spc_summary(production_df, days=7)
+    assert summary['evaluadas'].sum() > 0
+    assert later_summary['evaluadas'].sum() < summary['evaluadas'].sum()
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.production_metrics import analyze_trends, compute_metric_sackoff, period_start, summarize_trends
+
+
+def test_group_col_is_the_second_positional_argument(production_df):
+    positional = analyze_trends(production_df, 'nombre_producto')
+    keyword = analyze_trends(production_df, group_col='nombre_producto', freq='M')
+    pd.testing.assert_frame_equal(positional, keyword)
+    with pytest.raises(TypeError):
+        analyze_trends(production_df, 'nombre_producto', 'W')
+
+
+def test_weekly_values_deltas_and_slopes(production_df):
+    trends = analyze_trends(production_df, 'tiene_adiflow', freq='W')
+    semana = period_start(production_df['fecha_produccion'], 'W')
+    for adiflow, group in trends.groupby('tiene_adiflow'):
+        group = group.sort_values('periodo')
+        last = group.iloc[-1]
+        rows = production_df[(production_df['tiene_adiflow'] == adiflow) & (semana == last['periodo'])]
+        assert last['sackoff'] == pytest.approx(compute_metric_sackoff(rows))
+
+        # Semanas consecutivas: delta = diferencia con la fila anterior
+        consecutive = group['periodo'].diff() == pd.Timedelta(weeks=1)
+        expected_delta = group['sackoff'].diff()[consecutive]
+        np.testing.assert_allclose(group['sackoff_delta'][consecutive], expected_delta, atol=1e-6)
+
+        position = ((group['periodo'] - group['periodo'].min()) / pd.Timedelta(weeks=1)).to_numpy()
+        slope = np.polyfit(position, group['sackoff'].to_numpy(), 1)[0]
+        assert group['sackoff_pendiente'].iloc[0] == pytest.approx(slope, abs=1e-5)
+
+
+def test_summary_has_one_row_per_group(production_df):
+    trends = analyze_trends(production_df, 'planta')
+    summary = summarize_trends(trends, 'planta')
+    assert sorted(summary['planta']) == ['P1', 'P2']
+    sizes = trends.groupby('planta').size()
+    assert summary.set_index('planta')['periodos'].sort_index().tolist() == sizes.sort_index().tolist()
+
+
+def test_unsupported_frequency(production_df):
+    with pytest.raises(ValueError):
+        analyze_trends(production_df, freq='D')
@@ -0,0 +1,174 @@
+"""
+Simulador Monte Carlo de adopción de Adiflow.
+Responde "¿cuál sería el sackoff del mes si X% más de las órdenes usaran
+Adiflow?" con distribuciones de escenarios evaluadas en un solo cálculo
+matricial (niveles × escenarios × productos).
+"""
+
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import memoize_kpis
+from utils.production_metrics import filter_con_adiflow, filter_sin_adiflow
+
+
+DEFAULT_LEVELS = (10, 20, 30, 50)
+DEFAULT_SCENARIOS = 20000
+# Celdas máximas de cada bloque (niveles × escenarios × productos) de sorteos
+MAX_BLOCK_ELEMENTS = 4_000_000
+MISSING_GROUP = '(sin dato)'
+
+SIMULATION_COLUMNS = [
+    'adopcion_adicional', 'adopcion_simulada', 'sackoff_medio', 'cambio_medio',
+    'sackoff_p5', 'sackoff_p50', 'sackoff_p95', 'prob_mejora',
+]
+
+
+def _ratio_stats(df: pd.DataFrame, group_col: str) -> pd.DataFrame:
+    """
+    Sumas por producto de las que salen la razón de sackoff y su error estándar.
+
+    Con d = a - p - anuladas por orden y r = Σd / Σp, el error estándar de la
+    razón (método delta) es sqrt(Σ(d - r·p)²) / Σp, y Σ(d - r·p)² se obtiene
+    de Σd², Σd·p y Σp² sin volver a recorrer las órdenes.
+    """
+    def column(col: str) -> np.ndarray:
+        return np.nan_to_num(df[col].to_numpy(dtype=float, na_value=np.nan))
+
+    p = column('toneladas_producidas')
+    d = column('toneladas_a_producir') - p - column('toneladas_anuladas')
+    frame = pd.DataFrame({'n': 1, 'p': p, 'd': d, 'dd': d * d, 'dp': d * p, 'pp': p * p},
+                         index=df[group_col].fillna(MISSING_GROUP).to_numpy())
+    return frame.groupby(level=0).sum()
+
+
+def _rate_and_se(stats: pd.DataFrame) -> pd.DataFrame:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(stats['p'] > 0, stats['d'] / stats['p'], 0.0)
+        residual = np.clip(stats['dd'] - 2 * rate * stats['dp'] + rate ** 2 * stats['pp'], 0.0, None)
+        se = np.where(stats['p'] > 0, np.sqrt(residual) / stats['p'], 0.0)
+    return pd.DataFrame({'rate': rate, 'se': se}, index=stats.index)
+
+
+def simulate_adiflow_adoption(df: pd.DataFrame, levels: Sequence[float] = DEFAULT_LEVELS,
+                              n_scenarios: int = DEFAULT_SCENARIOS, min_orders: int = 5,
+                              group_col: str = 'nombre_producto', seed: int = 0) -> Dict:
+    """
+    Simula el sackoff si una fracción adicional de las órdenes usara Adiflow.
+
+    Para cada nivel X, X puntos porcentuales de las órdenes despachadas pasan
+    de Sin a Con Adiflow. En cada escenario se sortea cuántas órdenes de
+    cada producto cambian (binomial) y el efecto de Adiflow en ese producto
+    (normal con la razón de sackoff y su error estándar). El efecto es la
+    diferencia de sackoff Con - Sin del producto si ambos grupos tienen al
+    menos `min_orders` órdenes; si no, el efecto global, sorteado una vez por
+    escenario para todos esos productos. Los escenarios comparten los
+    sorteos entre niveles, por lo que los niveles son comparables entre sí.
+
+    Args:
+        df: Órdenes del periodo base (p. ej. un mes completo)
+        levels: Puntos porcentuales adicionales de adopción a simular
+        n_scenarios: Escenarios por nivel
+        min_orders: Órdenes mínimas por grupo para usar el efecto del producto
+        group_col: Columna de producto
+        seed: Semilla de los sorteos
+
+    Returns:
+        Diccionario con sackoff_actual, adopcion_actual (% de órdenes con
+        Adiflow), n_escenarios, 'resumen' (DataFrame por nivel con adopción
+        simulada, sackoff medio, cambio medio, percentiles 5/50/95 y
+        probabilidad de mejora, es decir, de sackoff menor al actual) y
+        'distribuciones' (matriz niveles × escenarios con el sackoff
+        simulado en %)
+    """
+    levels = np.asarray(levels, dtype=float)
+    con = _ratio_stats(filter_con_adiflow(df), group_col)
+    sin = _ratio_stats(filter_sin_adiflow(df), group_col)
+    n_con, n_sin = con['n'].sum(), sin['n'].sum()
+    total_p = con['p'].sum() + sin['p'].sum()
+    total_d = con['d'].sum() + sin['d'].sum()
+    sackoff_actual = 100 * total_d / total_p if total_p > 0 else 0.0
+    adopcion_actual = 100 * n_con / (n_con + n_sin) if n_con + n_sin > 0 else 0.0
+
+    if n_con == 0 or n_sin == 0 or total_p <= 0:
+        # Sin ambos grupos no hay efecto de Adiflow que simular
+        return {
+            'sackoff_actual': round(float(sackoff_actual), 3),
+            'adopcion_actual': round(float(adopcion_actual), 1),
+            'n_escenarios': 0,
+            'resumen': pd.DataFrame(columns=SIMULATION_COLUMNS),
+            'distribuciones': np.empty((len(levels), 0)),
+        }
+
+    # Efecto de Adiflow por producto (razones Con - Sin) y efecto global de respaldo
+    pooled = _rate_and_se(pd.DataFrame([con.sum(), sin.sum()], index=['con', 'sin']))
+    pooled_effect = pooled.loc['con', 'rate'] - pooled.loc['sin', 'rate']
+    pooled_se = np.hypot(pooled.loc['con', 'se'], pooled.loc['sin', 'se'])
+    products = sin.index
+    con = con.reindex(products, fill_value=0)
+    con_rates, sin_rates = _rate_and_se(con), _rate_and_se(sin)
+    own = ((con['n'] >= min_orders) & (sin['n'] >= min_orders)).to_numpy()
+    effect = (con_rates['rate'] - sin_rates['rate']).to_numpy()
+    effect_se = np.hypot(con_rates['se'], sin_rates['se']).to_numpy()
+
+    rng = np.random.default_rng(seed)
+    # Fracción de órdenes Sin Adiflow que cambian en cada nivel (niveles × 1 × 1)
+    switch = np.clip(levels / 100 * (n_con + n_sin) / n_sin, 0.0, 1.0)[:, None, None]
+    n_orders = sin['n'].to_numpy(dtype=np.int64)
+    mean_tons = (sin['p'] / sin['n']).to_numpy()
+
+    # Bloques de escenarios para acotar la matriz (niveles × escenarios × productos)
+    delta = np.empty((len(levels), n_scenarios))
+    block = max(1, MAX_BLOCK_ELEMENTS // (len(levels) * len(products)))
+    for start in range(0, n_scenarios, block):
+        rows = min(block, n_scenarios - start)
+        # Efecto sorteado por escenario y producto: (escenarios × productos)
+        effects = np.where(
+            own,
+            rng.normal(effect, effect_se, size=(rows, len(products))),
+            rng.normal(pooled_effect, pooled_se, size=(rows, 1)),
+        )
+        switched = rng.binomial(n_orders, np.broadcast_to(switch, (len(levels), rows, len(products))))
+        # La pérdida de las toneladas que cambian pasa a la tasa con Adiflow
+        delta[:, start:start + rows] = (switched * mean_tons * effects).sum(axis=2)
+    distributions = 100 * (total_d + delta) / total_p
+
+    summary = pd.DataFrame({
+        'adopcion_adicional': levels,
+        'adopcion_simulada': np.minimum(adopcion_actual + levels, 100.0),
+        'sackoff_medio': distributions.mean(axis=1),
+        'cambio_medio': distributions.mean(axis=1) - sackoff_actual,
+        'sackoff_p5': np.percentile(distributions, 5, axis=1),
+        'sackoff_p50': np.percentile(distributions, 50, axis=1),
+        'sackoff_p95': np.percentile(distributions, 95, axis=1),
+        'prob_mejora': (distributions < sackoff_actual).mean(axis=1),
+    }).round(3)
+    return {
+        'sackoff_actual': round(float(sackoff_actual), 3),
+        'adopcion_actual': round(float(adopcion_actual), 1),
+        'n_escenarios': n_scenarios,
+        'resumen': summary,
+        'distribuciones': distributions,
+    }
+
+
+def get_adiflow_simulation(df: pd.DataFrame, levels: Sequence[float] = DEFAULT_LEVELS,
+                           n_scenarios: int = DEFAULT_SCENARIOS, min_orders: int = 5,
+                           group_col: str = 'nombre_producto', seed: int = 0) -> Dict:
+    """
+    Simulación de adopción de Adiflow memorizada por versión de datos y parámetros.
+
+    Args:
+        df: Órdenes del periodo base
+        levels, n_scenarios, min_orders, group_col, seed: Ver simulate_adiflow_adoption
+
+    Returns:
+        Copia del resultado de simulate_adiflow_adoption
+    """
+    params = {'levels': tuple(levels), 'n_scenarios': n_scenarios, 'min_orders': min_orders,
+              'group_col': group_col, 'seed': seed}
+    result = memoize_kpis(df, 'adiflow_simulation', lambda: simulate_adiflow_adoption(df, **params),
+                          params=params)
+    return {**result, 'resumen': result['resumen'].copy(), 'distribuciones': result['distribuciones'].copy()}
@@ -0,0 +1,187 @@
+"""
+Detección robusta de anomalías en datos de producción.
+Puntúa todas las columnas numéricas a la vez, por producto y opcionalmente en
+ventanas móviles, con mediana y MAD calculadas con operaciones agrupadas.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.data_cache import memoize_kpis
+from utils.production_metrics import TONELADAS_COLUMNS
+
+
+# Constante que hace la MAD consistente con la desviación estándar en datos normales
+MAD_SCALE = 1.4826
+# Respaldo cuando la MAD es 0 (más de la mitad de los valores iguales): desviación absoluta media
+MEAN_AD_SCALE = 1.2533
+MISSING_GROUP = '(sin dato)'
+# Elementos máximos de cada bloque de ventanas móviles (filas × columnas × window): ~32 MB en float64
+MAX_WINDOW_ELEMENTS = 4_000_000
+EXCLUDED_COLUMNS = ['id_registro'] + TONELADAS_COLUMNS
+
+ANOMALY_TABLE_COLUMNS = ['fila', 'grupo', 'fecha', 'columna', 'valor', 'mediana', 'mad', 'score']
+
+
+def default_anomaly_columns(df: pd.DataFrame) -> List[str]:
+    """Columnas numéricas de calidad y proceso (excluye identificadores y toneladas)."""
+    return [col for col in df.select_dtypes(include='number').columns if col not in EXCLUDED_COLUMNS]
+
+
+def _window_median(ordered: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Mediana de los `counts` valores no nulos al inicio de cada ventana ordenada (los NaN van al final)."""
+    last = ordered.shape[-1] - 1
+    low = np.take_along_axis(ordered, np.maximum(counts - 1, 0)[..., None] // 2, axis=-1)[..., 0]
+    high = np.take_along_axis(ordered, np.minimum(counts // 2, last)[..., None], axis=-1)[..., 0]
+    return np.where(counts > 0, (low + high) / 2, np.nan)
+
+
+def _rolling_robust_stats(values: np.ndarray, group_start: np.ndarray, window: int) -> Tuple[np.ndarray, ...]:
+    """
+    Mediana, MAD, desviación absoluta media y conteo de las últimas `window` filas de cada grupo.
+
+    La MAD de cada fila se calcula dentro de su propia ventana: desviaciones de
+    los valores de la ventana respecto a la mediana de esa misma ventana.
+
+    Args:
+        values: Matriz (n × k) ordenada por grupo y, dentro del grupo, cronológicamente
+        group_start: Posición de la primera fila del grupo de cada fila
+        window: Tamaño de la ventana en filas
+
+    Returns:
+        Matrices (n × k) de mediana, MAD, desviación absoluta media y conteo de valores no nulos
+    """
+    n, k = values.shape
+    median, mad, mean_ad = (np.full((n, k), np.nan) for _ in range(3))
+    counts = np.zeros((n, k), dtype=np.int64)
+    padded = np.vstack([np.full((window - 1, k), np.nan), values])
+    offsets = np.arange(window) - (window - 1)
+    block = max(1, MAX_WINDOW_ELEMENTS // (window * max(k, 1)))
+    for start in range(0, n, block):
+        stop = min(n, start + block)
+        # (filas, k, window): la ventana de la fila i son las posiciones i-window+1..i de su grupo
+        windows = sliding_window_view(padded[start:stop + window - 1], window, axis=0)
+        inside = (np.arange(start, stop)[:, None] + offsets) >= group_start[start:stop, None]
+        windows = np.where(inside[:, None, :], windows, np.nan)
+
+        count = np.count_nonzero(~np.isnan(windows), axis=-1)
+        center = _window_median(np.sort(windows, axis=-1), count)
+        deviation = np.abs(windows - center[..., None])
+        counts[start:stop] = count
+        median[start:stop] = center
+        mad[start:stop] = _window_median(np.sort(deviation, axis=-1), count)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_ad[start:stop] = np.nansum(deviation, axis=-1) / count
+    return median, mad, mean_ad, counts
+
+
+def detect_anomalies_robust(df: pd.DataFrame, columns: Optional[List[str]] = None,
+                            group_col: Optional[str] = 'nombre_producto', threshold: float = 3.5,
+                            window: Optional[int] = None, min_periods: int = 10,
+                            date_column: str = 'fecha_produccion') -> pd.DataFrame:
+    """
+    Detecta anomalías con z-score robusto (mediana/MAD) en varias columnas a la vez.
+
+    score = (valor - mediana) / (1.4826 * MAD), con mediana y MAD por grupo
+    (producto) sobre todo el histórico o, si se indica `window`, sobre las
+    últimas `window` órdenes del grupo en orden cronológico (mediana y MAD
+    exactas de cada ventana). Si la MAD es 0 se usa 1.2533 × la desviación
+    absoluta media como escala.
+
+    Args:
+        df: DataFrame con datos de producción
+        columns: Columnas a analizar (por defecto, todas las numéricas de calidad/proceso)
+        group_col: Columna de agrupación (None para un solo grupo)
+        threshold: |score| mínimo para considerar anomalía (3.5 es el umbral usual)
+        window: Tamaño de la ventana móvil en órdenes (None = histórico completo)
+        min_periods: Mínimo de valores del grupo/ventana para puntuar
+        date_column: Columna de fecha para ordenar las ventanas y reportar
+
+    Returns:
+        DataFrame ordenado por |score| descendente con columnas fila (índice
+        original), grupo, fecha, columna, valor, mediana, mad y score
+    """
+    columns = default_anomaly_columns(df) if columns is None else list(columns)
+    if len(df) == 0 or not columns:
+        return pd.DataFrame(columns=ANOMALY_TABLE_COLUMNS)
+
+    data = df[columns].apply(pd.to_numeric, errors='coerce').reset_index(drop=True)
+    if group_col is not None and group_col in df.columns:
+        groups = df[group_col].fillna(MISSING_GROUP).reset_index(drop=True)
+    else:
+        groups = pd.Series(MISSING_GROUP, index=data.index)
+
+    if window is None:
+        grouped = data.groupby(groups, sort=False)
+        median = grouped.transform('median')
+        counts = grouped.transform('count')
+        deviation = (data - median).abs()
+        deviation_grouped = deviation.groupby(groups, sort=False)
+        median_values = median.to_numpy(dtype=float)
+        mad_values = deviation_grouped.transform('median').to_numpy(dtype=float)
+        mean_ad_values = deviation_grouped.transform('mean').to_numpy(dtype=float)
+        count_values = counts.to_numpy()
+    else:
+        # Ventanas por grupo en orden cronológico (las filas sin fecha van al final)
+        if date_column in df.columns:
+            order = np.argsort(pd.to_datetime(df[date_column]).to_numpy(), kind='stable')
+        else:
+            order = np.arange(len(df))
+        codes = pd.factorize(groups)[0]
+        order = order[np.argsort(codes[order], kind='stable')]
+        codes_sorted = codes[order]
+        new_group = np.r_[True, codes_sorted[1:] != codes_sorted[:-1]]
+        group_start = np.maximum.accumulate(np.where(new_group, np.arange(len(order)), 0))
+
+        stats = _rolling_robust_stats(data.to_numpy(dtype=float)[order], group_start, window)
+        median_values, mad_values, mean_ad_values, count_values = (np.empty_like(stat) for stat in stats)
+        for target, stat in zip((median_values, mad_values, mean_ad_values, count_values), stats):
+            target[order] = stat
+
+    values = data.to_numpy(dtype=float)
+    scale = np.where(mad_values > 0, MAD_SCALE * mad_values, MEAN_AD_SCALE * mean_ad_values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where((scale > 0) & (count_values >= min_periods),
+                          (values - median_values) / scale, np.nan)
+
+    rows, cols = np.nonzero(np.abs(np.nan_to_num(scores)) > threshold)
+    if len(rows) == 0:
+        return pd.DataFrame(columns=ANOMALY_TABLE_COLUMNS)
+
+    fechas = df[date_column].to_numpy()[rows] if date_column in df.columns else np.full(len(rows), pd.NaT)
+    table = pd.DataFrame({
+        'fila': df.index.to_numpy()[rows],
+        'grupo': groups.to_numpy()[rows],
+        'fecha': fechas,
+        'columna': np.asarray(columns, dtype=object)[cols],
+        'valor': values[rows, cols],
+        'mediana': median_values[rows, cols],
+        'mad': mad_values[rows, cols],
+        'score': np.round(scores[rows, cols], 3),
+    })
+    ranking = np.argsort(-np.abs(table['score'].to_numpy()), kind='stable')
+    return table.iloc[ranking].reset_index(drop=True)
+
+
+def get_anomaly_table(df: pd.DataFrame, columns: Optional[List[str]] = None,
+                      group_col: Optional[str] = 'nombre_producto', threshold: float = 3.5,
+                      window: Optional[int] = None, min_periods: int = 10) -> pd.DataFrame:
+    """
+    Tabla de anomalías memorizada por versión de datos y parámetros.
+
+    Args:
+        df: DataFrame con datos de producción
+        columns, group_col, threshold, window, min_periods: Ver detect_anomalies_robust
+
+    Returns:
+        Copia de la tabla de anomalías ordenada por |score|
+    """
+    params = {
+        'columns': columns, 'group_col': group_col, 'threshold': threshold,
+        'window': window, 'min_periods': min_periods,
+    }
+    table = memoize_kpis(df, 'anomalies', lambda: detect_anomalies_robust(df, **params), params=params)
+    return table.copy()
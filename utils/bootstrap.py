@@ -0,0 +1,206 @@
+"""
+Intervalos de confianza bootstrap para KPIs de producción.
+Remuestrea los índices de las órdenes como una matriz (B × n) y evalúa las
+métricas de razón (como el sackoff) con reducciones matriciales, por bloques
+de remuestras para acotar la memoria.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import config
+from utils.production_metrics import ProductionFilter
+
+
+# Elementos máximos de cada bloque de índices (B_bloque × n): ~16 MB en int32
+MAX_BLOCK_ELEMENTS = 4_000_000
+DEFAULT_SEED = 0
+
+RatioArrays = Tuple[np.ndarray, np.ndarray]
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, scale: float) -> np.ndarray:
+    """Razón escalada; 0 donde el denominador es 0 (misma convención que el sackoff)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, scale * numerator / denominator, 0.0)
+
+
+def resampled_sums(columns: np.ndarray, n_resamples: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Sumas de cada columna en n_resamples remuestras con reemplazo de las filas.
+
+    Args:
+        columns: Matriz (k × n) con k columnas de n órdenes
+        n_resamples: Número de remuestras B
+        rng: Generador de números aleatorios
+
+    Returns:
+        Matriz (B × k) con la suma de cada columna en cada remuestra
+    """
+    columns = np.atleast_2d(np.asarray(columns, dtype=float))
+    n = columns.shape[1]
+    sums = np.zeros((n_resamples, columns.shape[0]))
+    if n == 0:
+        return sums
+    block = max(1, MAX_BLOCK_ELEMENTS // n)
+    for start in range(0, n_resamples, block):
+        rows = min(block, n_resamples - start)
+        index = rng.integers(0, n, size=(rows, n), dtype=np.int32)
+        for k, values in enumerate(columns):
+            sums[start:start + rows, k] = np.take(values, index).sum(axis=1)
+    return sums
+
+
+def _interval(distribution: np.ndarray, confidence: float) -> Tuple[float, float]:
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(distribution, [alpha, 1 - alpha])
+    return round(float(lower), 3), round(float(upper), 3)
+
+
+def _settings(n_resamples: Optional[int], confidence: Optional[float]) -> Tuple[int, float]:
+    n_resamples = config.BOOTSTRAP_RESAMPLES if n_resamples is None else int(n_resamples)
+    confidence = config.BOOTSTRAP_CONFIDENCE if confidence is None else float(confidence)
+    if n_resamples < 1:
+        raise ValueError("Se necesita al menos una remuestra")
+    if not 0 < confidence < 1:
+        raise ValueError("La confianza debe estar entre 0 y 1")
+    return n_resamples, confidence
+
+
+def _ratio_distribution(arrays: RatioArrays, n_resamples: int, scale: float,
+                        rng: np.random.Generator) -> np.ndarray:
+    sums = resampled_sums(np.vstack(arrays), n_resamples, rng)
+    return _ratio(sums[:, 0], sums[:, 1], scale)
+
+
+def bootstrap_ratio(numerator: np.ndarray, denominator: Optional[np.ndarray] = None,
+                    n_resamples: Optional[int] = None, confidence: Optional[float] = None,
+                    scale: float = 1.0, seed: Optional[int] = DEFAULT_SEED) -> Dict:
+    """
+    Intervalo de confianza bootstrap (percentil) de scale · Σ numerador / Σ denominador.
+
+    Args:
+        numerator: Valor del numerador por orden
+        denominator: Valor del denominador por orden (None = 1 por orden, es decir, la media)
+        n_resamples: Remuestras (por defecto, config.BOOTSTRAP_RESAMPLES)
+        confidence: Nivel de confianza (por defecto, config.BOOTSTRAP_CONFIDENCE)
+        scale: Factor de escala (100 para porcentajes)
+        seed: Semilla (fija por defecto para que el informe sea reproducible)
+
+    Returns:
+        Diccionario con valor, ic (inferior, superior), confianza, n y remuestras
+    """
+    n_resamples, confidence = _settings(n_resamples, confidence)
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.ones_like(numerator) if denominator is None else np.asarray(denominator, dtype=float)
+    distribution = _ratio_distribution((numerator, denominator), n_resamples, scale, np.random.default_rng(seed))
+    return {
+        'valor': round(float(_ratio(numerator.sum(), denominator.sum(), scale)), 3),
+        'ic': _interval(distribution, confidence),
+        'confianza': confidence,
+        'n': len(numerator),
+        'remuestras': n_resamples,
+    }
+
+
+def bootstrap_ratio_difference(a: RatioArrays, b: RatioArrays, n_resamples: Optional[int] = None,
+                               confidence: Optional[float] = None, scale: float = 1.0,
+                               seed: Optional[int] = DEFAULT_SEED) -> Dict:
+    """
+    Intervalo de confianza bootstrap de la diferencia de una razón entre dos grupos (a - b).
+
+    Cada grupo se remuestrea por separado con su propio número de órdenes.
+
+    Args:
+        a: (numerador, denominador) por orden del grupo a
+        b: (numerador, denominador) por orden del grupo b
+        n_resamples, confidence, scale, seed: Ver bootstrap_ratio
+
+    Returns:
+        Diccionario con valor_a, ic_a, valor_b, ic_b, diferencia, ic_diferencia,
+        probabilidad_positiva (fracción de remuestras con a > b), significativo
+        (el intervalo de la diferencia excluye el 0), confianza, n_a, n_b y remuestras
+    """
+    n_resamples, confidence = _settings(n_resamples, confidence)
+    rng = np.random.default_rng(seed)
+    a = tuple(np.asarray(values, dtype=float) for values in a)
+    b = tuple(np.asarray(values, dtype=float) for values in b)
+    dist_a = _ratio_distribution(a, n_resamples, scale, rng)
+    dist_b = _ratio_distribution(b, n_resamples, scale, rng)
+    diferencias = dist_a - dist_b
+
+    valor_a = float(_ratio(a[0].sum(), a[1].sum(), scale))
+    valor_b = float(_ratio(b[0].sum(), b[1].sum(), scale))
+    ic_diferencia = _interval(diferencias, confidence)
+    return {
+        'valor_a': round(valor_a, 3),
+        'ic_a': _interval(dist_a, confidence),
+        'valor_b': round(valor_b, 3),
+        'ic_b': _interval(dist_b, confidence),
+        'diferencia': round(valor_a - valor_b, 3),
+        'ic_diferencia': ic_diferencia,
+        'probabilidad_positiva': round(float((diferencias > 0).mean()), 3),
+        'significativo': ic_diferencia[0] > 0 or ic_diferencia[1] < 0,
+        'confianza': confidence,
+        'n_a': len(a[0]),
+        'n_b': len(b[0]),
+        'remuestras': n_resamples,
+    }
+
+
+def sackoff_arrays(df: pd.DataFrame) -> RatioArrays:
+    """
+    Numerador (a - p - anuladas) y denominador (producidas) del sackoff por orden despachada.
+
+    Los nulos de cada columna cuentan como 0, igual que en las sumas de compute_metric_sackoff.
+    """
+    despachadas = ProductionFilter(df).despachada().to_frame()
+
+    def column(col: str) -> np.ndarray:
+        return np.nan_to_num(despachadas[col].to_numpy(dtype=float, na_value=np.nan))
+
+    producidas = column('toneladas_producidas')
+    return column('toneladas_a_producir') - producidas - column('toneladas_anuladas'), producidas
+
+
+def mean_arrays(values: pd.Series) -> RatioArrays:
+    """Numerador y denominador de la media de los valores no nulos."""
+    values = pd.to_numeric(values, errors='coerce').dropna().to_numpy(dtype=float)
+    return values, np.ones_like(values)
+
+
+def bootstrap_sackoff(df: pd.DataFrame, **kwargs) -> Dict:
+    """
+    Sackoff (%) de las órdenes despachadas con su intervalo de confianza bootstrap.
+
+    Args:
+        df: DataFrame con datos de producción
+        **kwargs: n_resamples, confidence, seed (ver bootstrap_ratio)
+    """
+    return bootstrap_ratio(*sackoff_arrays(df), scale=100.0, **kwargs)
+
+
+def bootstrap_sackoff_difference(df_a: pd.DataFrame, df_b: pd.DataFrame, **kwargs) -> Dict:
+    """
+    Diferencia de sackoff (puntos porcentuales, a - b) con su intervalo de confianza bootstrap.
+
+    Args:
+        df_a: Órdenes del grupo a (p. ej. filter_con_adiflow(df))
+        df_b: Órdenes del grupo b (p. ej. filter_sin_adiflow(df))
+        **kwargs: n_resamples, confidence, seed (ver bootstrap_ratio)
+    """
+    return bootstrap_ratio_difference(sackoff_arrays(df_a), sackoff_arrays(df_b), scale=100.0, **kwargs)
+
+
+def bootstrap_mean_difference(values_a: pd.Series, values_b: pd.Series, **kwargs) -> Dict:
+    """
+    Diferencia de medias (a - b) con su intervalo de confianza bootstrap.
+
+    Args:
+        values_a: Valores del grupo a (los nulos se descartan)
+        values_b: Valores del grupo b
+        **kwargs: n_resamples, confidence, seed (ver bootstrap_ratio)
+    """
+    return bootstrap_ratio_difference(mean_arrays(values_a), mean_arrays(values_b), **kwargs)
@@ -0,0 +1,260 @@
+"""
+Detección de cambios de régimen en series semanales de KPIs.
+PELT (búsqueda exacta con poda, costo de cambio de media con sumas
+acumuladas) para el histórico y CUSUM tabular para el modo en línea, sobre
+todas las series producto × Adiflow a la vez.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import memoize_kpis
+
+
+METHODS = ('pelt', 'cusum')
+
+CHANGE_POINT_COLUMNS = ['semana', 'indice', 'media_anterior', 'media_posterior', 'cambio']
+
+
+def noise_sigma(values: np.ndarray) -> float:
+    """
+    Desviación estándar del ruido estimada con las diferencias consecutivas.
+
+    Las diferencias no dependen del nivel de cada régimen: un cambio de
+    media solo aporta una diferencia grande y apenas infla la estimación.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) < 3:
+        return float(np.std(values))
+    return float(np.std(np.diff(values)) / np.sqrt(2))
+
+
+def default_penalty(values: np.ndarray) -> float:
+    """Penalización por cambio 3·σ²·ln(n), cercana al criterio MBIC para cambios de media."""
+    return 3 * noise_sigma(values) ** 2 * np.log(max(len(values), 2))
+
+
+def pelt(values: Sequence[float], penalty: Optional[float] = None, min_size: int = 3) -> List[int]:
+    """
+    Cambios de media óptimos con PELT (Killick et al., 2012).
+
+    Minimiza Σ costo(segmento) + penalty · cambios con costo cuadrático
+    (suma de cuadrados alrededor de la media del segmento), evaluado en O(1)
+    por segmento con sumas acumuladas. La poda descarta los inicios que ya
+    no pueden ser óptimos, con costo casi lineal en series con cambios.
+
+    Args:
+        values: Serie ordenada en el tiempo (sin nulos)
+        penalty: Penalización por cambio (por defecto, default_penalty)
+        min_size: Largo mínimo de cada segmento
+
+    Returns:
+        Posiciones donde empieza cada nuevo segmento (vacío si no hay cambios)
+    """
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    if n < 2 * min_size:
+        return []
+    if penalty is None:
+        penalty = default_penalty(x)
+    if penalty <= 0:
+        return []
+
+    s1 = np.concatenate([[0.0], np.cumsum(x)])
+    s2 = np.concatenate([[0.0], np.cumsum(x * x)])
+
+    def cost(starts: np.ndarray, end: int) -> np.ndarray:
+        length = end - starts
+        return s2[end] - s2[starts] - (s1[end] - s1[starts]) ** 2 / length
+
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    previous = np.zeros(n + 1, dtype=np.int64)
+    candidates = np.array([0], dtype=np.int64)
+    for end in range(min_size, n + 1):
+        new = end - min_size
+        if new >= min_size:
+            candidates = np.append(candidates, new)
+        totals = best[candidates] + cost(candidates, end)
+        k = int(np.argmin(totals))
+        best[end] = totals[k] + penalty
+        previous[end] = candidates[k]
+        # Poda: un inicio cuyo costo ya supera el óptimo nunca volverá a serlo
+        candidates = candidates[totals <= best[end]]
+
+    changes, end = [], n
+    while end > 0:
+        end = int(previous[end])
+        if end > 0:
+            changes.append(end)
+    return sorted(changes)
+
+
+class CusumMonitor:
+    """
+    CUSUM tabular de dos lados para vigilar una serie en línea.
+
+    Las primeras `warmup` observaciones fijan el nivel de referencia (su
+    media). Después se acumulan los desvíos mayores que k·σ; cuando una suma
+    supera h·σ salta una alarma y las siguientes `warmup` observaciones fijan
+    el nuevo nivel.
+    """
+
+    def __init__(self, sigma: float, k: float = 0.5, h: float = 5.0, warmup: int = 8):
+        """
+        Args:
+            sigma: Desviación estándar del ruido
+            k: Holgura en unidades de σ (0.5 detecta cambios de ~1σ)
+            h: Umbral de alarma en unidades de σ
+            warmup: Observaciones que fijan cada nivel de referencia
+        """
+        self.sigma = float(sigma)
+        self.k = k
+        self.h = h
+        self.warmup = warmup
+        self.target: Optional[float] = None
+        self.upper = 0.0
+        self.lower = 0.0
+        self._level: List[float] = []
+
+    def update(self, value: float) -> Optional[str]:
+        """Agrega una observación; devuelve 'sube' o 'baja' si hay alarma, si no None."""
+        if self.sigma <= 0 or np.isnan(value):
+            return None
+        if self.target is None:
+            self._level.append(value)
+            if len(self._level) >= self.warmup:
+                self.target = float(np.mean(self._level))
+                self._level = []
+            return None
+        self.upper = max(0.0, self.upper + value - self.target - self.k * self.sigma)
+        self.lower = max(0.0, self.lower + self.target - value - self.k * self.sigma)
+        if self.upper <= self.h * self.sigma and self.lower <= self.h * self.sigma:
+            return None
+        direction = 'sube' if self.upper > self.h * self.sigma else 'baja'
+        self.target = None
+        self.upper = self.lower = 0.0
+        return direction
+
+
+def cusum_alarms(values: Sequence[float], warmup: int = 8, k: float = 0.5, h: float = 5.0) -> List[Dict]:
+    """
+    Alarmas CUSUM de una serie procesada punto por punto.
+
+    Args:
+        values: Serie ordenada en el tiempo
+        warmup, k, h: Ver CusumMonitor
+
+    Returns:
+        Lista de {'indice', 'direccion', 'referencia'} con la posición de cada alarma
+    """
+    x = np.asarray(values, dtype=float)
+    monitor = CusumMonitor(noise_sigma(x), k, h, warmup)
+    alarms = []
+    for i, value in enumerate(x):
+        reference = monitor.target
+        direction = monitor.update(value)
+        if direction is not None:
+            alarms.append({'indice': i, 'direccion': direction, 'referencia': reference})
+    return alarms
+
+
+def detect_change_points_batch(series: pd.DataFrame, value_col: str, group_cols: Sequence[str] = (),
+                               time_col: str = 'semana', method: str = 'pelt',
+                               penalty_scale: float = 1.0, min_size: int = 3) -> pd.DataFrame:
+    """
+    Cambios de régimen en todas las series de un DataFrame largo.
+
+    Cada grupo se ordena por `time_col` y se analiza como serie de puntos
+    consecutivos (los periodos sin dato no interrumpen la serie). Las sumas
+    acumuladas de PELT se calculan por serie; el recorrido por grupos usa
+    los cortes de un solo ordenamiento del DataFrame.
+
+    Args:
+        series: DataFrame con una fila por (grupo, periodo)
+        value_col: Columna del KPI
+        group_cols: Columnas que identifican cada serie (vacío = una sola serie)
+        time_col: Columna de tiempo
+        method: 'pelt' (cambios de media en el histórico) o 'cusum' (alarmas en línea)
+        penalty_scale: Factor sobre la penalización por defecto de PELT
+        min_size: Largo mínimo de segmento de PELT
+
+    Returns:
+        DataFrame con group_cols, semana (inicio del nuevo régimen o semana
+        de la alarma), indice, media_anterior y media_posterior (medias de
+        los segmentos entre cambios) y cambio
+    """
+    if method not in METHODS:
+        raise ValueError(f"Método no soportado: {method}. Usa {METHODS}")
+    group_cols = list(group_cols)
+    columns = group_cols + CHANGE_POINT_COLUMNS
+    data = series[group_cols + [time_col, value_col]].dropna(subset=[value_col])
+    if data.empty:
+        return pd.DataFrame(columns=columns)
+
+    data = data.sort_values(group_cols + [time_col], kind='stable')
+    if group_cols:
+        codes = data.groupby(group_cols, sort=False, observed=True).ngroup().to_numpy()
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+    else:
+        boundaries = np.array([], dtype=np.int64)
+    starts = np.concatenate([[0], boundaries])
+    ends = np.concatenate([boundaries, [len(data)]])
+    values = data[value_col].to_numpy(dtype=float)
+    times = data[time_col].to_numpy()
+    keys = data[group_cols].to_numpy() if group_cols else None
+
+    rows = []
+    for start, end in zip(starts, ends):
+        x = values[start:end]
+        if method == 'pelt':
+            changes = pelt(x, penalty=penalty_scale * default_penalty(x), min_size=min_size)
+        else:
+            changes = [alarm['indice'] for alarm in cusum_alarms(x)]
+        bounds = [0] + changes + [len(x)]
+        for j, change in enumerate(changes):
+            before = x[bounds[j]:change].mean()
+            after = x[change:bounds[j + 2]].mean()
+            row = dict(zip(group_cols, keys[start])) if group_cols else {}
+            row.update({
+                'semana': times[start + change],
+                'indice': change,
+                'media_anterior': before,
+                'media_posterior': after,
+                'cambio': after - before,
+            })
+            rows.append(row)
+    table = pd.DataFrame(rows, columns=columns)
+    return table.round({'media_anterior': 3, 'media_posterior': 3, 'cambio': 3})
+
+
+def get_weekly_change_points(df: pd.DataFrame, kpi: str = 'sackoff',
+                             by: Sequence[str] = ('producto', 'adiflow'), method: str = 'pelt',
+                             penalty_scale: float = 1.0, min_size: int = 3) -> pd.DataFrame:
+    """
+    Cambios de régimen de un KPI semanal del cubo de KPIs, memorizados por versión de datos.
+
+    Args:
+        df: DataFrame con datos de producción
+        kpi: Columna de KPI del cubo ('sackoff', 'toneladas_producidas', ...)
+        by: Dimensiones del cubo que definen cada serie (p. ej. ('producto', 'adiflow'))
+        method, penalty_scale, min_size: Ver detect_change_points_batch
+
+    Returns:
+        Copia de la tabla de cambios; solo cuenta las semanas con órdenes despachadas
+    """
+    # Importación diferida: services depende de utils, no al revés
+    from services.kpi_cube import get_kpi_cube
+
+    by = list(by)
+
+    def compute() -> pd.DataFrame:
+        weekly = get_kpi_cube(df).rollup(*by, 'semana')
+        weekly = weekly[weekly['ordenes_despachadas'] > 0].reset_index()
+        return detect_change_points_batch(weekly, kpi, by, 'semana', method, penalty_scale, min_size)
+
+    params = {'kpi': kpi, 'by': tuple(by), 'method': method,
+              'penalty_scale': penalty_scale, 'min_size': min_size}
+    return memoize_kpis(df, 'weekly_change_points', compute, params=params).copy()
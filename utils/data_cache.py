@@ -0,0 +1,268 @@
+"""
+Caché de resultados derivados de los datos de producción.
+Identifica cada DataFrame con una versión y memoriza resultados con desalojo LRU acotado.
+"""
+
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import pandas as pd
+
+from config import config
+
+
+_version_counter = itertools.count(1)
+_versions: Dict[int, Tuple[weakref.ref, Tuple, int]] = {}
+_versions_lock = threading.RLock()
+
+
+def get_data_version(df: pd.DataFrame) -> int:
+    """
+    Devuelve la versión de datos de un DataFrame.
+
+    La versión se mantiene mientras se use el mismo objeto con la misma forma
+    y columnas (p. ej. entre reruns de Streamlit) y cambia al recargar los
+    datos o al agregar/eliminar columnas. Las modificaciones de valores en
+    sitio no se detectan: llama a bump_data_version después de hacerlas.
+
+    Args:
+        df: DataFrame con datos de producción
+
+    Returns:
+        Entero que identifica la versión actual de los datos
+    """
+    signature = (df.shape, tuple(df.columns))
+    key = id(df)
+    with _versions_lock:
+        entry = _versions.get(key)
+        if entry is not None and entry[0]() is df and entry[1] == signature:
+            return entry[2]
+        version = next(_version_counter)
+        _versions[key] = (weakref.ref(df, lambda _ref, key=key: _forget_version(key, _ref)), signature, version)
+        return version
+
+
+def bump_data_version(df: pd.DataFrame) -> int:
+    """Fuerza una nueva versión para un DataFrame modificado en sitio."""
+    with _versions_lock:
+        _versions.pop(id(df), None)
+    return get_data_version(df)
+
+
+def _forget_version(key: int, ref: weakref.ref) -> None:
+    with _versions_lock:
+        entry = _versions.get(key)
+        if entry is not None and entry[0] is ref:
+            del _versions[key]
+
+
+def freeze(value: Any) -> Hashable:
+    """Convierte dicts, listas y sets (anidados) en una llave hashable y estable."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(freeze(v) for v in value))
+    return value
+
+
+class BoundedCache:
+    """Caché LRU con número máximo de entradas, seguro entre hilos."""
+
+    def __init__(self, max_entries: int = 128, on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        """
+        Args:
+            max_entries: Máximo de entradas antes de desalojar la menos usada
+            on_evict: Función (llave, valor) llamada con cada entrada desalojada o
+                eliminada por clear(), p. ej. para cerrar conexiones
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.on_evict = on_evict
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+        # Candado por llave en cálculo: hilos que piden la misma llave esperan un solo cálculo
+        self._computing: Dict[Hashable, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        evicted = []
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False))
+        self._evict(evicted)
+
+    def _evict(self, entries: list) -> None:
+        # Fuera del candado: la limpieza puede ser lenta o volver a usar la caché
+        if self.on_evict is not None:
+            for key, value in entries:
+                self.on_evict(key, value)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Devuelve el valor cacheado o lo calcula y lo guarda.
+
+        Args:
+            key: Llave hashable del resultado
+            compute: Función sin argumentos que calcula el resultado
+
+        Returns:
+            Resultado cacheado o recién calculado
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            key_lock = self._computing.setdefault(key, threading.Lock())
+        # El cálculo se hace fuera del candado global para no bloquear otras llaves
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+                self.misses += 1
+            try:
+                value = compute()
+                self.set(key, value)
+            finally:
+                with self._lock:
+                    self._computing.pop(key, None)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            evicted = list(self._entries.items())
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        self._evict(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class IncrementalStates:
+    """
+    Últimos estados de un cálculo incremental (ajustes, límites), seguros entre hilos.
+
+    Guarda los estados más recientes de cada llave. Un cálculo nuevo parte
+    del más reciente que los datos extiendan; si ninguno lo hace, empieza de
+    cero. Como se conservan varios, un DataFrame distinto (p. ej. filtrado
+    por el agente) no descarta el estado de los datos completos. Extender un
+    estado no debe modificarlo: puede estar en uso en otro hilo o en caché.
+    """
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max(1, int(max_entries))
+        self._states: Dict[Hashable, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def build(self, key: Hashable, extends: Callable[[Any], bool], extend: Callable[[Any], Any],
+              create: Callable[[], Any]) -> Any:
+        """
+        Extiende el estado más reciente compatible o crea uno nuevo.
+
+        Args:
+            key: Llave de los estados (p. ej. parámetros del cálculo)
+            extends: True si los datos actuales extienden un estado
+            extend: Devuelve un estado nuevo a partir de uno compatible
+            create: Construye el estado desde cero
+
+        Returns:
+            Estado de los datos actuales
+        """
+        with self._lock:
+            candidates = list(self._states.get(key, ()))
+        # El cálculo corre fuera del candado; los estados guardados nunca se modifican
+        base = next((state for state in reversed(candidates) if extends(state)), None)
+        state = create() if base is None else extend(base)
+        with self._lock:
+            states = [kept for kept in self._states.get(key, ()) if kept is not base]
+            self._states[key] = (states + [state])[-self.max_entries:]
+        return state
+
+    def clear(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+
+# Instancia global compartida por dashboard, informe y agente
+kpi_cache = BoundedCache(config.KPI_CACHE_MAX_ENTRIES)
+
+# Objetos por DataFrame que guardan una copia ordenada de las filas o resúmenes por
+# celda (motor de periodos, cubo de KPIs): el desalojo cuenta entradas, no memoria,
+# así que viven aparte con un límite pequeño. Cada DataFrame filtrado o recortado
+# tiene su propia versión y no debe retener una copia de los datos por mucho tiempo.
+frame_cache = BoundedCache(config.FRAME_CACHE_MAX_ENTRIES)
+
+
+def kpi_cache_key(version: int, name: str, period: Any = None, filters: Optional[Dict] = None,
+                  params: Optional[Dict] = None) -> Tuple:
+    """Llave (versión de datos, resultado, periodo, filtros, parámetros) para kpi_cache."""
+    return (version, name, freeze(period), freeze(filters or {}), freeze(params or {}))
+
+
+def memoize_kpis(df: pd.DataFrame, name: str, compute: Callable[[], Any],
+                 period: Any = None, filters: Optional[Dict] = None,
+                 params: Optional[Dict] = None) -> Any:
+    """
+    Memoriza un resultado de KPIs por (versión de datos, periodo, filtros).
+
+    Args:
+        df: DataFrame del que se derivan los KPIs
+        name: Nombre del resultado (distingue cálculos distintos sobre los mismos datos)
+        compute: Función sin argumentos que calcula el resultado
+        period: Identificador del periodo (p. ej. (año, mes))
+        filters: Filtros aplicados a los datos antes del cálculo
+        params: Otros parámetros del cálculo
+
+    Returns:
+        Resultado cacheado o recién calculado
+    """
+    key = kpi_cache_key(get_data_version(df), name, period, filters, params)
+    return kpi_cache.get_or_compute(key, compute)
+
+
+def memoize_frame(df: pd.DataFrame, name: str, compute: Callable[[], Any],
+                  params: Optional[Dict] = None) -> Any:
+    """
+    Memoriza por versión de datos un objeto pesado derivado de todo el DataFrame.
+
+    Igual que memoize_kpis, pero en frame_cache (FRAME_CACHE_MAX_ENTRIES).
+
+    Args:
+        df: DataFrame del que se deriva el objeto
+        name: Nombre del objeto
+        compute: Función sin argumentos que lo construye
+        params: Otros parámetros de construcción
+
+    Returns:
+        Objeto cacheado o recién construido
+    """
+    key = kpi_cache_key(get_data_version(df), name, params=params)
+    return frame_cache.get_or_compute(key, compute)
@@ -0,0 +1,247 @@
+"""
+Backend DuckDB (opcional) para la capa de métricas de producción.
+Copia el DataFrame (o lee un snapshot Parquet) a una base DuckDB en memoria y
+evalúa las mismas medidas aditivas de compute_additive_measures como SQL con
+ejecución paralela.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from config import config
+from utils.logger import logger
+from utils.data_cache import BoundedCache, get_data_version
+from utils.production_metrics import (
+    QUALITY_METRICS,
+    TONELADAS_COLUMNS,
+    compute_additive_measures,
+    derive_kpi_columns,
+)
+from utils.period_engine import REPORTING_MONTH, PeriodCalendar, plant_timezone
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    duckdb = None
+    DUCKDB_AVAILABLE = False
+
+
+TABLE_NAME = 'produccion'
+DESPACHADA = "\"order_produccion_despachada\" = 'Si'"
+
+# Una llave de agrupación es una columna o un par (alias, expresión SQL)
+GroupKey = Union[str, Tuple[str, str]]
+
+# Backends abiertos por versión de datos; pocos, porque cada uno guarda una copia
+# de los datos. Al desalojarlos se cierra su conexión.
+_backends = BoundedCache(2, on_evict=lambda _version, backend: backend.close())
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _timestamp_literal(ts: pd.Timestamp) -> str:
+    """Literal SQL de una fecha (TIMESTAMPTZ si tiene zona horaria)."""
+    if ts.tz is not None:
+        return f"TIMESTAMPTZ '{ts.isoformat()}'"
+    return f"TIMESTAMP '{ts.isoformat(sep=' ')}'"
+
+
+def _measure_expressions() -> List[str]:
+    """Expresiones SQL con las mismas medidas y reglas de compute_additive_measures."""
+    expressions = []
+    for col in TONELADAS_COLUMNS:
+        value = f'CAST({_quote(col)} AS DOUBLE)'
+        expressions.append(
+            f'COALESCE(SUM({value}) FILTER (WHERE {DESPACHADA} AND NOT isnan({value})), 0) AS {_quote(col)}')
+    expressions.append(f'COUNT(*) FILTER (WHERE {DESPACHADA}) AS ordenes_despachadas')
+    for col in QUALITY_METRICS.values():
+        value = f'CAST({_quote(col)} AS DOUBLE)'
+        expressions.append(f'COALESCE(SUM({value}) FILTER (WHERE NOT isnan({value})), 0) AS {_quote(col + "_sum")}')
+        expressions.append(f'COUNT({value}) FILTER (WHERE NOT isnan({value})) AS {_quote(col + "_count")}')
+    return expressions
+
+
+class DuckDBMetrics:
+    """
+    Medidas aditivas y KPIs de producción evaluados en DuckDB.
+
+    El DataFrame se copia una vez al almacenamiento columnar de DuckDB: si
+    viene ordenado por fecha (como en KPIService), los filtros de periodo
+    descartan bloques completos en lugar de escanear todas las filas. Un
+    snapshot Parquet se lee directamente del archivo. Escanear el DataFrame
+    como vista evitaba la copia pero era ~10x más lento que pandas en cada
+    consulta, así que la copia se hace siempre y el backend se reutiliza por
+    versión de datos (get_metrics_backend). Las sumas en paralelo pueden
+    diferir del motor pandas en el último bit de precisión; los KPIs
+    derivados usan derive_kpi_columns con el mismo redondeo.
+
+    Cada consulta usa su propio cursor, así que una instancia puede
+    compartirse entre hilos.
+    """
+
+    def __init__(self, df: Optional[pd.DataFrame] = None, parquet_path: Optional[str] = None,
+                 threads: Optional[int] = None, date_column: str = 'fecha_produccion'):
+        """
+        Args:
+            df: DataFrame con datos de producción
+            parquet_path: Snapshot Parquet con los mismos datos (alternativa a df)
+            threads: Hilos de DuckDB (None usa config.DUCKDB_THREADS; 0 = todos los núcleos)
+            date_column: Columna de fecha para los periodos
+        """
+        if not DUCKDB_AVAILABLE:
+            raise ImportError("duckdb no está instalado. Instálalo con `pip install duckdb`.")
+        if (df is None) == (parquet_path is None):
+            raise ValueError("Indica df o parquet_path (solo uno)")
+
+        self.date_column = date_column
+        self.con = duckdb.connect(database=':memory:')
+        threads = config.DUCKDB_THREADS if threads is None else threads
+        if threads:
+            self.con.execute(f'SET threads = {int(threads)}')
+
+        if df is not None:
+            self.con.register('_source', df)
+            self.con.execute(f'CREATE TABLE {TABLE_NAME} AS SELECT * FROM _source')
+            self.con.unregister('_source')
+            dtype = df[date_column].dtype if date_column in df.columns else None
+            self.tz = getattr(dtype, 'tz', None)
+        else:
+            path = str(parquet_path).replace("'", "''")
+            self.con.execute(f"CREATE VIEW {TABLE_NAME} AS SELECT * FROM read_parquet('{path}')")
+            self.tz = None
+
+    @classmethod
+    def from_parquet(cls, path: str, **kwargs) -> 'DuckDBMetrics':
+        """Backend sobre un snapshot Parquet."""
+        return cls(parquet_path=path, **kwargs)
+
+    def close(self) -> None:
+        self.con.close()
+
+    def _literal(self, ts: pd.Timestamp) -> str:
+        """Literal SQL de una fecha en hora de la planta, en la zona horaria de los datos."""
+        if self.tz is not None:
+            local = plant_timezone() or self.tz
+            ts = ts.tz_localize(local, ambiguous=False, nonexistent='shift_forward').tz_convert(self.tz)
+        return _timestamp_literal(ts)
+
+    def additive_measures(self, by: Sequence[GroupKey] = (), where: Optional[str] = None) -> pd.DataFrame:
+        """
+        Medidas aditivas agrupadas, equivalentes a compute_additive_measures.
+
+        Args:
+            by: Columnas o pares (alias, expresión SQL) por los que agrupar
+            where: Condición SQL opcional sobre las filas (p. ej. "planta = 'Planta 1'")
+
+        Returns:
+            DataFrame indexado por las llaves de agrupación (ordenadas) con las
+            mismas columnas que compute_additive_measures
+        """
+        keys = [(key, _quote(key)) if isinstance(key, str) else key for key in by]
+        select = [f'{expression} AS {_quote(alias)}' for alias, expression in keys] + _measure_expressions()
+        sql = f'SELECT {", ".join(select)} FROM {TABLE_NAME}'
+        if where:
+            sql += f' WHERE {where}'
+        if keys:
+            positions = ', '.join(str(i + 1) for i in range(len(keys)))
+            sql += f' GROUP BY {positions} ORDER BY {positions}'
+
+        with self.con.cursor() as cursor:
+            measures = cursor.execute(sql).df()
+        for col in ['ordenes_despachadas'] + [f'{col}_count' for col in QUALITY_METRICS.values()]:
+            measures[col] = measures[col].astype(np.int64)
+        if keys:
+            measures = measures.set_index([alias for alias, _ in keys])
+        return measures
+
+    def kpis(self, by: Sequence[GroupKey] = (), where: Optional[str] = None) -> pd.DataFrame:
+        """KPIs derivados (sackoff, diferencia de toneladas, promedios) por grupo."""
+        return derive_kpi_columns(self.additive_measures(by, where))
+
+    def sackoff(self, where: Optional[str] = None) -> float:
+        """Sackoff (%) de las filas que cumplen la condición."""
+        return self.kpis(where=where)['sackoff'].iloc[0]
+
+    def calculate_kpis(self, now: Optional[datetime] = None) -> Dict:
+        """
+        KPIs del mes actual contra el mes anterior, como KPIService.calculate_kpis.
+
+        Args:
+            now: Fecha de referencia en hora de la planta (por defecto, la hora actual de la planta)
+
+        Returns:
+            Diccionario con la estructura de KPIService.calculate_kpis
+        """
+        # Importación diferida: services depende de utils, no al revés
+        from services.kpi_service import build_kpis_from_measures
+
+        calendar = PeriodCalendar()
+        current = calendar.period(REPORTING_MONTH, 0, now)
+        previous = calendar.offset(current, -1)
+        fecha = _quote(self.date_column)
+        where = f'{fecha} >= {self._literal(previous.start)} AND {fecha} < {self._literal(current.end)}'
+        periodo = ('periodo', f"CASE WHEN {fecha} >= {self._literal(current.start)} THEN 'current' ELSE 'previous' END")
+
+        totals = self.additive_measures([periodo], where)
+        by_adiflow = self.additive_measures([periodo, 'tiene_adiflow'], where)
+        return build_kpis_from_measures(totals, by_adiflow)
+
+
+def get_metrics_backend(df: pd.DataFrame) -> Optional[DuckDBMetrics]:
+    """
+    Backend configurado en config.METRICS_BACKEND para un DataFrame.
+
+    La copia a DuckDB se hace una vez por versión de datos, en la primera
+    consulta; las siguientes reutilizan el mismo backend.
+
+    Args:
+        df: DataFrame con datos de producción
+
+    Returns:
+        DuckDBMetrics si METRICS_BACKEND es 'duckdb' y duckdb está instalado;
+        None para usar el motor pandas
+    """
+    if config.METRICS_BACKEND != 'duckdb':
+        return None
+    if not DUCKDB_AVAILABLE:
+        logger.warning("METRICS_BACKEND=duckdb but duckdb is not installed; using pandas backend")
+        return None
+    return _backends.get_or_compute(get_data_version(df), lambda: DuckDBMetrics(df))
+
+
+def compare_backends(df: pd.DataFrame, by: Sequence[str] = ('nombre_producto', 'tiene_adiflow'),
+                     rtol: float = 1e-9) -> Dict[str, float]:
+    """
+    Compara las medidas aditivas de DuckDB con las del motor pandas.
+
+    Args:
+        df: DataFrame con datos de producción
+        by: Columnas de agrupación
+        rtol: Tolerancia relativa de las sumas
+
+    Returns:
+        Diferencia absoluta máxima por columna que excede la tolerancia
+        (vacío si ambos backends coinciden)
+    """
+    by = list(by)
+    expected = compute_additive_measures(df, by).sort_index()
+    backend = DuckDBMetrics(df)
+    try:
+        actual = backend.additive_measures(by)
+    finally:
+        backend.close()
+    same_groups = len(actual) == len(expected)
+    actual = actual.reindex(expected.index)
+    mismatches = {}
+    for col in expected.columns:
+        left = expected[col].to_numpy(dtype=float)
+        right = actual[col].to_numpy(dtype=float)
+        if not same_groups or not np.allclose(left, right, rtol=rtol, atol=1e-9, equal_nan=True):
+            mismatches[col] = float(np.nanmax(np.abs(left - right))) if len(left) else float('nan')
+    return mismatches
@@ -0,0 +1,308 @@
+"""
+Pronóstico del próximo mes de sackoff, PDI y toneladas por producto.
+Suavizamiento exponencial de Holt (nivel + tendencia) ajustado a la vez
+sobre una matriz series × semanas: cada paso de tiempo es una operación
+vectorial sobre todas las series y todas las combinaciones de parámetros.
+"""
+
+import copy
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import IncrementalStates, memoize_kpis
+from utils.period_engine import REPORTING_MONTH, get_period_engine
+
+
+# KPI -> cómo se agregan las semanas pronosticadas en el mes ('media' o 'suma')
+PRODUCT_KPIS = {
+    'sackoff': 'media',
+    'pdi_mean_agroindustrial': 'media',
+    'toneladas_producidas': 'suma',
+}
+# Tarjetas de KPIs (llaves de KPI_DEFINITIONS) -> (filtro de Adiflow, KPI del cubo, agregación)
+CARD_SERIES = {
+    'pdi_mean_agroindustrial': (None, 'pdi_mean_agroindustrial', 'media'),
+    'dureza_mean_agroindustrial': (None, 'dureza_mean_agroindustrial', 'media'),
+    'fino_mean_agroindustrial': (None, 'fino_mean_agroindustrial', 'media'),
+    'sackoff_con_adiflow': ('Con Adiflow', 'sackoff', 'media'),
+    'sackoff_sin_adiflow': ('Sin Adiflow', 'sackoff', 'media'),
+    'diferencia_toneladas': (None, 'diferencia_toneladas', 'suma'),
+}
+CARD_GROUP = '(tarjetas)'
+NON_NEGATIVE_KPIS = ('toneladas_producidas',)
+
+# Grilla de parámetros de Holt evaluada en paralelo para cada serie
+ALPHAS = (0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+BETAS = (0.0, 0.05, 0.1, 0.2)
+# Observaciones mínimas para pronosticar una serie
+MIN_OBSERVATIONS = 4
+
+WEEK = np.timedelta64(7, 'D')
+
+
+def holt_filter(values: np.ndarray, alpha: np.ndarray, beta: np.ndarray,
+                level: Optional[np.ndarray] = None, trend: Optional[np.ndarray] = None,
+                sse: Optional[np.ndarray] = None, count: Optional[np.ndarray] = None):
+    """
+    Recorre Holt sobre todas las series a la vez.
+
+    Las series se alinean en filas; alpha y beta se combinan por
+    difusión (p. ej. (G × 1) contra (R,) evalúa G parámetros en R series).
+    Una semana sin dato avanza el nivel con la tendencia sin corregirlo;
+    una serie empieza en su primera observación (nivel = valor, tendencia 0).
+
+    Args:
+        values: Matriz (R × T) de observaciones (NaN = sin dato)
+        alpha, beta: Parámetros de suavizamiento del nivel y la tendencia
+        level, trend: Estado inicial (NaN o None = serie sin empezar)
+        sse, count: Suma de errores al cuadrado de un paso y número de errores acumulados
+
+    Returns:
+        Tupla (level, trend, sse, count) con el estado al final de la matriz
+    """
+    values = np.asarray(values, dtype=float)
+    shape = np.broadcast_shapes(np.shape(alpha), np.shape(beta), values.shape[:1])
+    level = np.full(shape, np.nan) if level is None else np.broadcast_to(level, shape).copy()
+    trend = np.zeros(shape) if trend is None else np.broadcast_to(trend, shape).copy()
+    sse = np.zeros(shape) if sse is None else np.broadcast_to(sse, shape).copy()
+    count = np.zeros(shape) if count is None else np.broadcast_to(count, shape).copy()
+
+    for t in range(values.shape[1]):
+        obs = values[:, t]
+        observed = ~np.isnan(obs)
+        started = ~np.isnan(level)
+        forecast = level + trend
+        error = np.where(observed & started, obs - forecast, 0.0)
+        sse += error ** 2
+        count += observed & started
+        smoothed = np.where(started, forecast + alpha * error, obs)
+        new_level = np.where(observed, smoothed, forecast)
+        trend = np.where(observed & started, trend + beta * (new_level - forecast), trend)
+        level = new_level
+    return level, trend, sse, count
+
+
+class HoltForecaster:
+    """
+    Holt por lotes con parámetros elegidos por serie y actualización incremental.
+
+    fit evalúa toda la grilla ALPHAS × BETAS en una sola pasada y elige, por
+    serie, la combinación con menor error de un paso. update continúa el
+    estado solo sobre las semanas nuevas, con los parámetros ya elegidos,
+    y produce el mismo estado que volver a recorrer toda la historia.
+    """
+
+    def __init__(self):
+        self.index: Optional[pd.Index] = None
+        self.weeks = pd.DatetimeIndex([])
+        self.values = np.zeros((0, 0))
+        self.alpha = self.beta = self.level = self.trend = self.sse = self.count = np.zeros(0)
+
+    def fit(self, matrix: pd.DataFrame) -> 'HoltForecaster':
+        """
+        Ajusta todas las series de la matriz.
+
+        Args:
+            matrix: DataFrame (series × semanas consecutivas) con NaN donde no hay dato
+        """
+        grid_alpha, grid_beta = (g.ravel()[:, None] for g in np.meshgrid(ALPHAS, BETAS, indexing='ij'))
+        level, trend, sse, count = holt_filter(matrix.to_numpy(dtype=float), grid_alpha, grid_beta)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mse = np.where(count > 0, sse / count, np.inf)
+        best = np.argmin(mse, axis=0)
+        rows = np.arange(len(matrix))
+
+        self.index = matrix.index
+        self.weeks = pd.DatetimeIndex(matrix.columns)
+        self.values = matrix.to_numpy(dtype=float)
+        self.alpha = grid_alpha[best, 0]
+        self.beta = grid_beta[best, 0]
+        self.level, self.trend = level[best, rows], trend[best, rows]
+        self.sse, self.count = sse[best, rows], count[best, rows]
+        return self
+
+    def extends(self, matrix: pd.DataFrame) -> bool:
+        """True si la matriz agrega semanas al final sin cambiar las ya ajustadas."""
+        if self.index is None or not matrix.index.equals(self.index) or len(matrix.columns) < len(self.weeks):
+            return False
+        known = pd.DatetimeIndex(matrix.columns[:len(self.weeks)])
+        return known.equals(self.weeks) and np.allclose(
+            matrix.iloc[:, :len(self.weeks)].to_numpy(dtype=float), self.values, equal_nan=True)
+
+    def update(self, matrix: pd.DataFrame) -> 'HoltForecaster':
+        """
+        Incorpora las semanas nuevas de una matriz que extiende la ajustada.
+
+        Args:
+            matrix: Matriz con las mismas series y semanas ya ajustadas al inicio
+        """
+        if not self.extends(matrix):
+            raise ValueError("La matriz no extiende las semanas ajustadas; usa fit")
+        new = matrix.iloc[:, len(self.weeks):].to_numpy(dtype=float)
+        self.level, self.trend, self.sse, self.count = holt_filter(
+            new, self.alpha, self.beta, self.level, self.trend, self.sse, self.count)
+        self.weeks = pd.DatetimeIndex(matrix.columns)
+        self.values = matrix.to_numpy(dtype=float)
+        return self
+
+    def forecast(self, horizons: np.ndarray) -> np.ndarray:
+        """Pronóstico (R × H) a los horizontes dados, en semanas después de la última ajustada."""
+        return self.level[:, None] + self.trend[:, None] * np.asarray(horizons, dtype=float)[None, :]
+
+    def rmse(self) -> np.ndarray:
+        """Raíz del error cuadrático medio de un paso de cada serie."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.count > 0, np.sqrt(self.sse / self.count), np.nan)
+
+
+def weekly_matrix(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Matriz (serie × semana) de las semanas completas del cubo de KPIs.
+
+    Las filas son (grupo, kpi): un producto con cada KPI de PRODUCT_KPIS y
+    las series de planta de CARD_SERIES (grupo CARD_GROUP). Las semanas sin
+    órdenes despachadas quedan en NaN; la semana en curso no se incluye.
+
+    Args:
+        df: DataFrame con datos de producción
+
+    Returns:
+        DataFrame con índice (grupo, kpi) y una columna por semana consecutiva
+    """
+    # Importación diferida: services depende de utils, no al revés
+    from services.kpi_cube import get_kpi_cube
+
+    cube = get_kpi_cube(df)
+    current_week = get_period_engine(df).calendar.period('week').start
+
+    def complete_weeks(table: pd.DataFrame) -> pd.DataFrame:
+        table = table[table['ordenes_despachadas'] > 0].reset_index()
+        semana = pd.to_datetime(table['semana'])
+        if semana.dt.tz is not None:
+            semana = semana.dt.tz_localize(None)
+        return table.assign(semana=semana)[semana < current_week]
+
+    products = complete_weeks(cube.rollup('producto', 'semana'))
+    products = products.melt(id_vars=['producto', 'semana'], value_vars=list(PRODUCT_KPIS),
+                             var_name='kpi', value_name='valor').rename(columns={'producto': 'grupo'})
+    totals = complete_weeks(cube.rollup('semana'))
+    by_adiflow = complete_weeks(cube.rollup('adiflow', 'semana'))
+    cards = []
+    for card, (adiflow, kpi, _) in CARD_SERIES.items():
+        source = totals if adiflow is None else by_adiflow[by_adiflow['adiflow'] == adiflow]
+        cards.append(pd.DataFrame({'grupo': CARD_GROUP, 'semana': source['semana'],
+                                   'kpi': card, 'valor': source[kpi]}))
+
+    long = pd.concat([products] + cards, ignore_index=True)
+    if long.empty:
+        return pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=['grupo', 'kpi']))
+    columns = pd.date_range(long['semana'].min(), long['semana'].max(), freq='7D')
+    matrix = long.pivot_table(index=['grupo', 'kpi'], columns='semana', values='valor', aggfunc='first')
+    return matrix.reindex(columns=columns).dropna(how='all')
+
+
+def _aggregation(index: pd.Index) -> np.ndarray:
+    """True para las series que se suman en el mes (toneladas), False para las que se promedian."""
+    rules = {**PRODUCT_KPIS, **{card: rule for card, (_, _, rule) in CARD_SERIES.items()}}
+    return np.array([rules[kpi] == 'suma' for kpi in index.get_level_values('kpi')])
+
+
+# Ajustes recientes: si los datos nuevos solo agregan semanas, se actualiza en lugar de reajustar
+_fits = IncrementalStates()
+
+
+def fit_weekly_forecaster(matrix: pd.DataFrame) -> HoltForecaster:
+    """
+    Ajuste de Holt de la matriz semanal, incremental respecto del último ajuste.
+
+    Args:
+        matrix: Resultado de weekly_matrix
+
+    Returns:
+        HoltForecaster ajustado a todas las semanas de la matriz
+    """
+    # La copia deja intacto el ajuste que otra versión de datos pueda tener en caché
+    return _fits.build('forecaster', lambda previous: previous.extends(matrix),
+                       lambda previous: copy.copy(previous).update(matrix),
+                       lambda: HoltForecaster().fit(matrix))
+
+
+def forecast_next_month(df: pd.DataFrame, kind: str = REPORTING_MONTH) -> Dict:
+    """
+    Pronóstico del próximo mes de cada producto y de las tarjetas de KPIs.
+
+    Cada día del mes toma el pronóstico semanal de su semana (horizonte en
+    semanas después de la última semana completa). Los KPIs de razón y
+    promedio son la media de los días; las toneladas, la suma de los días
+    (pronóstico semanal / 7).
+
+    Args:
+        df: DataFrame con datos de producción
+        kind: Tipo de mes del calendario ('fiscal_month' o 'month')
+
+    Returns:
+        Diccionario con periodo (etiqueta del mes pronosticado), ultima_semana,
+        'productos' (DataFrame por producto con sackoff, pdi_mean_agroindustrial
+        y toneladas_producidas pronosticados y el rmse semanal de cada uno)
+        y 'tarjetas' ({llave de KPI_DEFINITIONS: pronóstico})
+    """
+    calendar = get_period_engine(df).calendar
+    month = calendar.period(kind, 1)
+    result = {'periodo': month.label, 'ultima_semana': None,
+              'productos': pd.DataFrame(columns=['producto'] + list(PRODUCT_KPIS)), 'tarjetas': {}}
+
+    matrix = weekly_matrix(df)
+    counts = matrix.notna().sum(axis=1)
+    matrix = matrix[counts >= MIN_OBSERVATIONS]
+    if matrix.empty:
+        return result
+
+    forecaster = fit_weekly_forecaster(matrix)
+    last_week = forecaster.weeks[-1]
+    days = pd.Series(pd.date_range(month.start, month.end - pd.Timedelta(days=1), freq='D'))
+    week_of_day = calendar.period_start(days, 'week')
+    horizons = ((week_of_day - last_week) / WEEK).to_numpy(dtype=float)
+    daily = forecaster.forecast(horizons)
+    values = np.where(_aggregation(matrix.index), daily.sum(axis=1) / 7, daily.mean(axis=1))
+    forecasts = pd.DataFrame({'pronostico': values, 'rmse': forecaster.rmse()}, index=matrix.index)
+    kpis = forecasts.index.get_level_values('kpi')
+    forecasts.loc[kpis.isin(NON_NEGATIVE_KPIS), 'pronostico'] = \
+        forecasts.loc[kpis.isin(NON_NEGATIVE_KPIS), 'pronostico'].clip(lower=0)
+    forecasts = forecasts.round(3)
+
+    cards = forecasts.xs(CARD_GROUP, level='grupo') if CARD_GROUP in forecasts.index.get_level_values('grupo') \
+        else forecasts.iloc[:0].droplevel('grupo')
+    products = forecasts.drop(CARD_GROUP, level='grupo', errors='ignore')
+    table = products['pronostico'].unstack('kpi').reindex(columns=list(PRODUCT_KPIS))
+    rmse = products['rmse'].unstack('kpi').reindex(columns=list(PRODUCT_KPIS)).add_prefix('rmse_')
+    table = table.join(rmse).rename_axis(index='producto', columns=None)
+    table = table.sort_values('toneladas_producidas', ascending=False, na_position='last').reset_index()
+
+    result.update({
+        'ultima_semana': last_week.strftime('%Y-%m-%d'),
+        'productos': table,
+        'tarjetas': cards['pronostico'].dropna().to_dict(),
+    })
+    return result
+
+
+def get_kpi_forecasts(df: pd.DataFrame, kind: str = REPORTING_MONTH) -> Dict:
+    """
+    Pronóstico del próximo mes memorizado por versión de datos, mes y semana actual.
+
+    La matriz semanal corta en la semana actual, así que el pronóstico se
+    recalcula al empezar cada semana aunque el mes pronosticado no cambie.
+
+    Args:
+        df: DataFrame con datos de producción
+        kind: Ver forecast_next_month
+
+    Returns:
+        Copia del resultado de forecast_next_month
+    """
+    calendar = get_period_engine(df).calendar
+    result = memoize_kpis(df, 'kpi_forecasts', lambda: forecast_next_month(df, kind),
+                          period=(kind, calendar.period(kind, 1).key, calendar.period('week').key))
+    return {**result, 'productos': result['productos'].copy(), 'tarjetas': dict(result['tarjetas'])}
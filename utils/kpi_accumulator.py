@@ -0,0 +1,139 @@
+"""
+Acumulador incremental de KPIs de producción.
+Mantiene el estado aditivo por (mes, producto, Adiflow) para actualizar los KPIs
+al llegar nuevas órdenes sin recalcular todo el histórico.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.production_metrics import (
+    QUALITY_METRICS,
+    TONELADAS_COLUMNS,
+    compute_additive_measures,
+)
+from utils.period_engine import REPORTING_MONTH, PeriodCalendar, local_dates
+
+
+GROUP_KEYS = ['mes', 'nombre_producto', 'tiene_adiflow']
+MISSING_KEY = '(sin dato)'
+MEASURE_COLUMNS = (
+    TONELADAS_COLUMNS
+    + ['ordenes_despachadas']
+    + [f'{col}_{suffix}' for col in QUALITY_METRICS.values() for suffix in ('sum', 'count')]
+)
+
+
+def month_key(year: int, month: int) -> int:
+    """Llave entera de mes usada por el acumulador (p. ej. 202506)."""
+    return year * 100 + month
+
+
+class KPIAccumulator:
+    """
+    Estado aditivo de KPIs por (mes, producto, Adiflow).
+
+    El mes es el de los tableros (REPORTING_MONTH, fiscal si está configurado)
+    en hora de la planta, igual que en KPIService.calculate_kpis.
+
+    Las filas nuevas se agregan en O(filas nuevas) y se suman al estado, que
+    solo crece con el número de combinaciones (mes, producto, Adiflow). Las
+    correcciones restan la versión anterior de las filas y suman la nueva.
+    Las sumas combinadas pueden diferir del cálculo completo en el último
+    bit de precisión; los KPIs se muestran redondeados a 1 decimal.
+    """
+
+    def __init__(self, df: Optional[pd.DataFrame] = None):
+        """
+        Args:
+            df: Histórico inicial de órdenes de producción (opcional)
+        """
+        self._state = pd.DataFrame(
+            {col: pd.Series(dtype=float) for col in MEASURE_COLUMNS},
+            index=pd.MultiIndex.from_arrays([[], [], []], names=GROUP_KEYS),
+        )
+        if df is not None:
+            self.add(df)
+
+    @staticmethod
+    def _measures(rows: pd.DataFrame) -> pd.DataFrame:
+        """Medidas aditivas de un lote de filas por (mes, producto, Adiflow)."""
+        calendar = PeriodCalendar()
+        fechas = local_dates(rows['fecha_produccion'], calendar.timezone)
+        valid = fechas.notna().to_numpy()
+        mes = calendar.month_key(fechas, REPORTING_MONTH).rename('mes')
+        keys = [
+            mes,
+            rows['nombre_producto'].fillna(MISSING_KEY).rename('nombre_producto'),
+            rows['tiene_adiflow'].fillna(MISSING_KEY).rename('tiene_adiflow'),
+        ]
+        measures = compute_additive_measures(rows, keys, mask=valid)
+        return measures[MEASURE_COLUMNS].astype(float)
+
+    def _apply(self, delta: pd.DataFrame, sign: float) -> None:
+        if delta.empty:
+            return
+        state = self._state.add(delta * sign, fill_value=0.0)
+        # Eliminar grupos que quedaron sin órdenes despachadas ni valores de calidad
+        counts = state[['ordenes_despachadas'] + [f'{col}_count' for col in QUALITY_METRICS.values()]]
+        self._state = state[(counts != 0).any(axis=1)]
+
+    def add(self, rows: pd.DataFrame) -> 'KPIAccumulator':
+        """Agrega nuevas órdenes de producción al estado."""
+        self._apply(self._measures(rows), 1.0)
+        return self
+
+    def remove(self, rows: pd.DataFrame) -> 'KPIAccumulator':
+        """Retira órdenes previamente agregadas (mismos valores con que se agregaron)."""
+        self._apply(self._measures(rows), -1.0)
+        return self
+
+    def correct(self, old_rows: pd.DataFrame, new_rows: pd.DataFrame) -> 'KPIAccumulator':
+        """
+        Aplica una corrección de órdenes ya agregadas.
+
+        Args:
+            old_rows: Filas tal como se agregaron originalmente
+            new_rows: Filas corregidas
+        """
+        return self.remove(old_rows).add(new_rows)
+
+    @property
+    def measures(self) -> pd.DataFrame:
+        """Estado aditivo actual indexado por (mes, producto, Adiflow)."""
+        return self._state.copy()
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def to_kpis(self, now: Optional[datetime] = None) -> Dict:
+        """
+        KPIs del mes actual contra el mes anterior.
+
+        Args:
+            now: Fecha de referencia en hora de la planta (por defecto, la hora actual de la planta)
+
+        Returns:
+            Diccionario con la misma estructura que KPIService.calculate_kpis
+        """
+        # Importación diferida: services depende de utils, no al revés
+        from services.kpi_service import build_kpis_from_measures
+
+        calendar = PeriodCalendar()
+        current_period = calendar.period(REPORTING_MONTH, 0, now)
+        current = month_key(*current_period.key)
+        previous = month_key(*calendar.offset(current_period, -1).key)
+
+        mes = self._state.index.get_level_values('mes').to_numpy()
+        periodo = np.where(mes == current, 'current', np.where(mes == previous, 'previous', ''))
+        selected = periodo != ''
+        state = self._state[selected]
+        periodo = pd.Index(periodo[selected], name='periodo')
+        adiflow = state.index.get_level_values('tiene_adiflow')
+
+        totals = state.groupby(periodo).sum()
+        by_adiflow = state.groupby([periodo, adiflow]).sum()
+        return build_kpis_from_measures(totals, by_adiflow)
@@ -3,16 +3,93 @@ KPI UI Components for OkuoAgent
 Provides reusable components for displaying KPIs in Streamlit
 """
 
+import math
 import streamlit as st
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Sequence
 
 
-def render_kpi_card(kpi_data: Dict[str, Any]) -> None:
+def build_sparkline_svg(values: Sequence[float], color: str = "#6c757d",
+                        width: int = 160, height: int = 36, title: str = "") -> str:
+    """
+    Build an inline SVG sparkline for a KPI series
+    
+    Args:
+        values: Series values, oldest first (NaN/None leave a gap)
+        color: Stroke color
+        width: SVG width in pixels
+        height: SVG height in pixels
+        title: Tooltip text
+        
+    Returns:
+        SVG markup, or an empty string when there are fewer than 2 values
+    """
+    points = [(i, float(v)) for i, v in enumerate(values) if v is not None and not math.isnan(v)]
+    if len(points) < 2:
+        return ""
+    low = min(v for _, v in points)
+    high = max(v for _, v in points)
+    span = (high - low) or 1.0
+    pad = 3
+    step = (width - 2 * pad) / max(len(values) - 1, 1)
+
+    def xy(i, v):
+        return pad + i * step, height - pad - (v - low) / span * (height - 2 * pad)
+
+    # Consecutive points form one polyline; a missing period starts a new one
+    segments, current, last_i = [], [], None
+    for i, v in points:
+        if last_i is not None and i != last_i + 1:
+            segments.append(current)
+            current = []
+        current.append("%.1f,%.1f" % xy(i, v))
+        last_i = i
+    segments.append(current)
+
+    lines = "".join(
+        f'<polyline points="{" ".join(seg)}" fill="none" stroke="{color}" stroke-width="1.8" '
+        f'stroke-linejoin="round" stroke-linecap="round"/>'
+        for seg in segments if len(seg) > 1
+    )
+    end_x, end_y = xy(*points[-1])
+    return (
+        f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg">'
+        f'<title>{title}</title>{lines}'
+        f'<circle cx="{end_x:.1f}" cy="{end_y:.1f}" r="2.5" fill="{color}"/></svg>'
+    )
+
+
+def _sparkline_block(history: Optional[Sequence[float]], color: str) -> str:
+    # Always emit an element: a blank line would end the HTML block in st.markdown
+    sparkline = build_sparkline_svg(history, color=color, title="Últimos periodos") if history is not None else ""
+    return f'<div style="margin-bottom: 0.4rem;">{sparkline}</div>'
+
+
+def _forecast_block(forecast: Optional[float], label: str, unit: str, name: str) -> str:
+    # Mismo formato que el valor actual de la tarjeta; vacío si no hay pronóstico
+    if forecast is None or math.isnan(forecast):
+        return '<div></div>'
+    if unit == '%':
+        display = f"{forecast:.1f}%"
+    elif unit == '' and name == 'Diferencia Toneladas':
+        display = f"{forecast:,.0f}"
+    else:
+        display = f"{forecast:.1f}"
+    return (
+        f'<div style="font-size: 0.75rem; color: #6c757d; font-weight: 500; margin-top: 0.2rem;">'
+        f'🔮 Pronóstico {label}: {display}</div>'
+    )
+
+
+def render_kpi_card(kpi_data: Dict[str, Any], history: Optional[Sequence[float]] = None,
+                    forecast: Optional[float] = None, forecast_label: str = "próximo mes") -> None:
     """
     Render a single KPI card with professional styling (premium version)
     
     Args:
         kpi_data: Dictionary containing KPI information
+        history: Optional KPI series (oldest first) drawn as a sparkline
+        forecast: Optional next-month forecast shown under the previous value
+        forecast_label: Period name of the forecast (e.g., "Noviembre 2026")
     """
     name = kpi_data['name']
     icon = kpi_data['icon']
@@ -67,9 +144,11 @@ def render_kpi_card(kpi_data: Dict[str, Any]) -> None:
             <div style="font-size: 0.85rem; color: {diff_color}; margin-bottom: 0.5rem; padding: 0.3rem 0.8rem; background: {diff_bg}; border-radius: 20px; display: inline-block; font-weight: 600;">
                 {diff_icon} {diff_display}
             </div>
+            {_sparkline_block(history, diff_color)}
             <div style="font-size: 0.75rem; color: #6c757d; font-weight: 500;">
                 Anterior: {previous_display}
             </div>
+            {_forecast_block(forecast, forecast_label, unit, name)}
         </div>
         """, unsafe_allow_html=True)
         return
@@ -97,9 +176,11 @@ def render_kpi_card(kpi_data: Dict[str, Any]) -> None:
         <div style="font-size: 0.85rem; color: {change_color}; margin-bottom: 0.5rem; padding: 0.3rem 0.8rem; background: {change_bg}; border-radius: 20px; display: inline-block; font-weight: 600;">
             {change_icon} {change_pct:+.1f}%
         </div>
+        {_sparkline_block(history, change_color)}
         <div style="font-size: 0.75rem; color: #6c757d; font-weight: 500;">
             Anterior: {previous_display}
         </div>
+        {_forecast_block(forecast, forecast_label, unit, name)}
     </div>
     """, unsafe_allow_html=True)
 
@@ -188,13 +269,25 @@ def render_product_analysis_card(product_data: Dict[str, Any], title: str, perio
         """, unsafe_allow_html=True)
 
 
-def render_main_kpis_section(kpis: Dict[str, Any]) -> None:
+def render_main_kpis_section(kpis: Dict[str, Any], history=None, forecasts: Optional[Dict[str, Any]] = None) -> None:
     """
     Render the main KPIs section with all KPI cards (3 per row) - Professional Design
     
     Args:
         kpis: Dictionary containing all KPI data
+        history: Optional DataFrame from get_kpi_history (one column per KPI)
+            used to draw a sparkline on each card
+        forecasts: Optional result of get_kpi_forecasts; its 'tarjetas' values
+            are shown as the next-month forecast of each card
     """
+    def series(key):
+        return history[key].tolist() if history is not None and key in history else None
+
+    def card(key):
+        forecast = forecasts['tarjetas'].get(key) if forecasts else None
+        label = forecasts['periodo'] if forecasts else "próximo mes"
+        render_kpi_card(kpis[key], series(key), forecast, label)
+
     import calendar
     from datetime import datetime
     meses_es = [
@@ -222,30 +315,30 @@ def render_main_kpis_section(kpis: Dict[str, Any]) -> None:
     
     with col1:
         if 'pdi_mean_agroindustrial' in kpis:
-            render_kpi_card(kpis['pdi_mean_agroindustrial'])
+            card('pdi_mean_agroindustrial')
     
     with col2:
         if 'dureza_mean_agroindustrial' in kpis:
-            render_kpi_card(kpis['dureza_mean_agroindustrial'])
+            card('dureza_mean_agroindustrial')
     
     with col3:
         if 'fino_mean_agroindustrial' in kpis:
-            render_kpi_card(kpis['fino_mean_agroindustrial'])
+            card('fino_mean_agroindustrial')
     
     # Second row: Sackoff con Adiflow, Sackoff sin Adiflow, Diferencia Toneladas
     col1, col2, col3 = st.columns(3)
     
     with col1:
         if 'sackoff_con_adiflow' in kpis:
-            render_kpi_card(kpis['sackoff_con_adiflow'])
+            card('sackoff_con_adiflow')
     
     with col2:
         if 'sackoff_sin_adiflow' in kpis:
-            render_kpi_card(kpis['sackoff_sin_adiflow'])
+            card('sackoff_sin_adiflow')
     
     with col3:
         if 'diferencia_toneladas' in kpis:
-            render_kpi_card(kpis['diferencia_toneladas'])
+            card('diferencia_toneladas')
 
 
 def render_product_analysis_section(product_kpis: Dict[str, Any]) -> None:
@@ -0,0 +1,387 @@
+"""
+Motor de periodos de producción.
+Define días, turnos, semanas ISO, meses calendario y meses fiscales en la hora
+de la planta, y cachea por versión de datos las posiciones de cada periodo en
+el DataFrame ordenado por fecha.
+"""
+
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from config import config
+from utils.data_cache import memoize_frame
+from utils.time_index import TimeIndex
+
+
+PERIOD_KINDS = ('day', 'shift', 'week', 'month', 'fiscal_month')
+
+# Mes de tableros e informes: el fiscal, que con FISCAL_MONTH_START_DAY=1 es el mes calendario
+REPORTING_MONTH = 'fiscal_month'
+
+MESES_ES = [
+    '', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+    'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre',
+]
+
+
+class Period(NamedTuple):
+    """Periodo [start, end) en hora local de la planta (sin zona horaria)."""
+    kind: str
+    key: Tuple
+    start: pd.Timestamp
+    end: pd.Timestamp
+    label: str
+
+
+def plant_timezone(name: Optional[str] = None):
+    """Zona horaria de la planta (config.PLANT_TIMEZONE); None si no está configurada."""
+    name = config.PLANT_TIMEZONE if name is None else name
+    return pytz.timezone(name) if name else None
+
+
+def plant_now(timezone: Optional[str] = None) -> pd.Timestamp:
+    """
+    Momento actual en la hora local de la planta.
+
+    Args:
+        timezone: Zona horaria (por defecto, config.PLANT_TIMEZONE)
+
+    Returns:
+        Timestamp sin zona horaria con la hora de la planta (la hora del
+        servidor si no hay zona configurada)
+    """
+    tz = plant_timezone(timezone)
+    if tz is None:
+        return pd.Timestamp(datetime.now())
+    return pd.Timestamp(datetime.now(tz)).tz_localize(None)
+
+
+def local_dates(fechas: pd.Series, timezone: Optional[str] = None) -> pd.Series:
+    """
+    Fechas en hora local de la planta, sin zona horaria.
+
+    Las fechas sin zona ya se interpretan como hora de la planta; las que
+    tienen zona se convierten a la zona de la planta (o se dejan en su propia
+    zona si no hay una configurada).
+    """
+    fechas = pd.to_datetime(fechas)
+    if fechas.dt.tz is None:
+        return fechas
+    local = plant_timezone(timezone) or fechas.dt.tz
+    return fechas.dt.tz_convert(local).dt.tz_localize(None)
+
+
+def _parse_shift_starts(value) -> List[pd.Timedelta]:
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(',') if item.strip()]
+    starts = sorted(pd.Timedelta(f'{item}:00') if isinstance(item, str) else pd.Timedelta(hours=item)
+                    for item in value)
+    if not starts:
+        raise ValueError("Se necesita al menos un inicio de turno")
+    return starts
+
+
+class PeriodCalendar:
+    """
+    Calendario de periodos de producción.
+
+    - day: día calendario.
+    - shift: turnos que empiezan a las horas de `shift_starts`; un turno que
+      cruza la medianoche pertenece al día en que empieza.
+    - week: semana ISO (lunes a domingo).
+    - month: mes calendario.
+    - fiscal_month: con día de inicio D > 1, el mes fiscal (año, mes) va del
+      día D del mes anterior al día D - 1 del mes; con D = 1 coincide con el
+      mes calendario.
+
+    Todas las fechas están en hora local de la planta, sin zona horaria.
+    """
+
+    def __init__(self, fiscal_month_start_day: Optional[int] = None, shift_starts=None,
+                 timezone: Optional[str] = None):
+        """
+        Args:
+            fiscal_month_start_day: Día de inicio del mes fiscal (por defecto, config.FISCAL_MONTH_START_DAY)
+            shift_starts: Horas de inicio de turno, p. ej. "06:00,14:00,22:00" (por defecto, config.SHIFT_START_TIMES)
+            timezone: Zona horaria de la planta (por defecto, config.PLANT_TIMEZONE)
+        """
+        self.fiscal_month_start_day = int(config.FISCAL_MONTH_START_DAY if fiscal_month_start_day is None
+                                          else fiscal_month_start_day)
+        if not 1 <= self.fiscal_month_start_day <= 28:
+            raise ValueError("El día de inicio del mes fiscal debe estar entre 1 y 28")
+        self.shift_starts = _parse_shift_starts(config.SHIFT_START_TIMES if shift_starts is None else shift_starts)
+        self.timezone = config.PLANT_TIMEZONE if timezone is None else timezone
+
+    def now(self) -> pd.Timestamp:
+        return plant_now(self.timezone)
+
+    # Periodo por llave
+
+    def _month_start(self, year: int, month: int, fiscal: bool) -> pd.Timestamp:
+        start = pd.Timestamp(year=year, month=month, day=1)
+        if fiscal and self.fiscal_month_start_day > 1:
+            start = start - pd.DateOffset(months=1) + pd.Timedelta(days=self.fiscal_month_start_day - 1)
+        return start
+
+    def from_key(self, kind: str, key: Tuple) -> Period:
+        """Periodo a partir de su llave: (año, mes), (año ISO, semana ISO), (fecha,) o (fecha, turno)."""
+        if kind in ('month', 'fiscal_month'):
+            year, month = key
+            fiscal = kind == 'fiscal_month'
+            next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+            label = f"{MESES_ES[month]} {year}" + (" (fiscal)" if fiscal and self.fiscal_month_start_day > 1 else "")
+            return Period(kind, (year, month), self._month_start(year, month, fiscal),
+                          self._month_start(next_year, next_month, fiscal), label)
+        if kind == 'week':
+            iso_year, iso_week = key
+            start = pd.Timestamp(date.fromisocalendar(iso_year, iso_week, 1))
+            end = start + pd.Timedelta(days=7)
+            label = f"Semana {iso_week} {iso_year} ({start:%d/%m} - {end - pd.Timedelta(days=1):%d/%m})"
+            return Period(kind, (iso_year, iso_week), start, end, label)
+        if kind == 'day':
+            day = pd.Timestamp(key[0]).normalize()
+            return Period(kind, (day.date(),), day, day + pd.Timedelta(days=1), f"{day:%d/%m/%Y}")
+        if kind == 'shift':
+            day = pd.Timestamp(key[0]).normalize()
+            number = key[1]
+            start = day + self.shift_starts[number - 1]
+            if number < len(self.shift_starts):
+                end = day + self.shift_starts[number]
+            else:
+                end = day + pd.Timedelta(days=1) + self.shift_starts[0]
+            return Period(kind, (day.date(), number), start, end, f"Turno {number} {day:%d/%m/%Y}")
+        raise ValueError(f"Tipo de periodo no soportado: {kind}. Usa uno de {PERIOD_KINDS}")
+
+    # Periodo que contiene una fecha
+
+    def period_at(self, kind: str, when) -> Period:
+        """Periodo de tipo `kind` que contiene la fecha `when` (con zona: se pasa a hora de la planta)."""
+        when = pd.Timestamp(when)
+        if when.tz is not None:
+            when = when.tz_convert(plant_timezone(self.timezone) or when.tz).tz_localize(None)
+        if kind == 'month':
+            return self.from_key(kind, (when.year, when.month))
+        if kind == 'fiscal_month':
+            year, month = when.year, when.month
+            if self.fiscal_month_start_day > 1 and when.day >= self.fiscal_month_start_day:
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            return self.from_key(kind, (year, month))
+        if kind == 'week':
+            iso = when.isocalendar()
+            return self.from_key(kind, (iso[0], iso[1]))
+        if kind == 'day':
+            return self.from_key(kind, (when.date(),))
+        if kind == 'shift':
+            offset = when - when.normalize()
+            day = when.normalize()
+            number = int(np.searchsorted(self.shift_starts, offset, side='right'))
+            if number == 0:
+                # Antes del primer turno: último turno del día anterior
+                day, number = day - pd.Timedelta(days=1), len(self.shift_starts)
+            return self.from_key(kind, (day.date(), number))
+        raise ValueError(f"Tipo de periodo no soportado: {kind}. Usa uno de {PERIOD_KINDS}")
+
+    def offset(self, period: Period, n: int) -> Period:
+        """Periodo desplazado n posiciones (n = -1 es el anterior)."""
+        if n == 0:
+            return period
+        if period.kind in ('month', 'fiscal_month'):
+            year, month = period.key
+            total = year * 12 + (month - 1) + n
+            return self.from_key(period.kind, (total // 12, total % 12 + 1))
+        if period.kind == 'week':
+            return self.period_at('week', period.start + pd.Timedelta(weeks=n))
+        if period.kind == 'day':
+            return self.from_key('day', ((period.start + pd.Timedelta(days=n)).date(),))
+        day, number = period.key
+        total = number - 1 + n
+        per_day = len(self.shift_starts)
+        day = pd.Timestamp(day) + pd.Timedelta(days=total // per_day)
+        return self.from_key('shift', (day.date(), total % per_day + 1))
+
+    def period(self, kind: str, offset: int = 0, now=None) -> Period:
+        """
+        Periodo actual (offset=0), anterior (offset=-1), etc.
+
+        Args:
+            kind: Tipo de periodo ('day', 'shift', 'week', 'month', 'fiscal_month')
+            offset: Desplazamiento respecto al periodo actual
+            now: Fecha de referencia (por defecto, la hora actual de la planta)
+
+        Returns:
+            Period con llave, inicio, fin y etiqueta
+        """
+        return self.offset(self.period_at(kind, self.now() if now is None else now), offset)
+
+    def period_start(self, fechas: pd.Series, kind: str) -> pd.Series:
+        """
+        Inicio del periodo de cada fecha, vectorizado (NaT donde no hay fecha).
+
+        Args:
+            fechas: Serie de fechas; las que tienen zona horaria se pasan antes
+                a hora local de la planta (como local_dates)
+            kind: Tipo de periodo
+
+        Returns:
+            Serie con el inicio del periodo de cada fila, en hora de la planta sin zona
+        """
+        fechas = local_dates(fechas, self.timezone)
+        dia = fechas.dt.normalize()
+        if kind == 'day':
+            return dia
+        if kind == 'week':
+            return dia - pd.to_timedelta(fechas.dt.weekday, unit='D')
+        if kind == 'month' or (kind == 'fiscal_month' and self.fiscal_month_start_day == 1):
+            return dia - pd.to_timedelta(fechas.dt.day - 1, unit='D')
+        if kind == 'fiscal_month':
+            start_day = self.fiscal_month_start_day
+            month_start = dia - pd.to_timedelta(fechas.dt.day - 1, unit='D')
+            previous = fechas.dt.day < start_day
+            start = month_start.where(~previous, month_start - pd.offsets.MonthBegin(1))
+            return start + pd.Timedelta(days=start_day - 1)
+        if kind == 'shift':
+            offsets = (fechas - dia).to_numpy()
+            starts = np.array([s.to_timedelta64() for s in self.shift_starts])
+            number = np.searchsorted(starts, offsets, side='right')
+            before_first = number == 0
+            shift_offset = np.where(before_first, starts[-1] - np.timedelta64(1, 'D'),
+                                    starts[np.maximum(number - 1, 0)])
+            return dia + pd.to_timedelta(shift_offset)
+        raise ValueError(f"Tipo de periodo no soportado: {kind}. Usa uno de {PERIOD_KINDS}")
+
+    def month_key(self, fechas: pd.Series, kind: str = 'month') -> pd.Series:
+        """
+        Llave entera AAAAMM del mes (calendario o fiscal) de cada fecha.
+
+        Args:
+            fechas: Serie de fechas (con zona: se pasan a hora de la planta)
+            kind: 'month' o 'fiscal_month'
+
+        Returns:
+            Serie de enteros (0 donde no hay fecha)
+        """
+        start = self.period_start(fechas, kind)
+        if kind == 'fiscal_month' and self.fiscal_month_start_day > 1:
+            # El mes fiscal toma el nombre del mes en que termina
+            start = start + pd.offsets.MonthBegin(1)
+        return (start.dt.year.fillna(0) * 100 + start.dt.month.fillna(0)).astype(np.int64)
+
+
+class PeriodEngine:
+    """
+    Calendario de periodos ligado a un DataFrame ordenado por fecha.
+
+    Las posiciones [i, j) de todos los periodos de un tipo que cubren los
+    datos se calculan de una vez con una sola búsqueda binaria vectorizada
+    y se cachean; los servicios cortan los periodos con `slice`, que no
+    copia los datos. Las fechas con zona horaria se comparan convirtiendo
+    la hora de la planta a la zona de los datos.
+    """
+
+    def __init__(self, df: pd.DataFrame, date_column: str = 'fecha_produccion',
+                 calendar: Optional[PeriodCalendar] = None):
+        """
+        Args:
+            df: DataFrame con datos de producción
+            date_column: Columna de fecha
+            calendar: Calendario de periodos (por defecto, el configurado)
+        """
+        self.time_index = TimeIndex(df, date_column)
+        self.df = self.time_index.df
+        self.calendar = calendar or PeriodCalendar()
+        self._starts: Dict[str, pd.DatetimeIndex] = {}
+        self._positions: Dict[str, np.ndarray] = {}
+
+    def _index_time(self, ts: pd.Timestamp) -> pd.Timestamp:
+        """Hora local de la planta expresada en la zona horaria de los datos."""
+        data_tz = self.time_index.tz
+        if data_tz is None:
+            return ts
+        local = plant_timezone(self.calendar.timezone) or data_tz
+        return pd.Timestamp(ts).tz_localize(local, ambiguous=False, nonexistent='shift_forward').tz_convert(data_tz)
+
+    def _precompute(self, kind: str) -> None:
+        """Inicios de todos los periodos del rango de los datos y sus posiciones."""
+        index = self.time_index._index
+        if len(index) == 0:
+            self._positions[kind] = np.zeros(0, dtype=np.int64)
+            self._starts[kind] = pd.DatetimeIndex([])
+            return
+        first, last = local_dates(pd.Series(index[[0, -1]]), self.calendar.timezone)
+        period = self.calendar.period_at(kind, first)
+        end = self.calendar.period_at(kind, last).end
+        starts = [period.start]
+        while period.end <= end:
+            period = self.calendar.offset(period, 1)
+            starts.append(period.start)
+        starts = pd.DatetimeIndex(starts)
+        boundaries = starts if index.tz is None else pd.DatetimeIndex([self._index_time(s) for s in starts])
+        # Posiciones antes que inicios: otro hilo que ya ve el tipo en _starts encuentra sus posiciones
+        self._positions[kind] = index.searchsorted(boundaries, side='left')
+        self._starts[kind] = starts
+
+    def bounds(self, period: Period) -> Tuple[int, int]:
+        """Posiciones [i, j) de un periodo en el DataFrame ordenado (cacheadas por tipo)."""
+        if period.kind not in self._starts:
+            self._precompute(period.kind)
+        starts = self._starts[period.kind]
+        k = starts.get_indexer([period.start])[0]
+        if k >= 0 and k + 1 < len(starts) and starts[k + 1] == period.end:
+            positions = self._positions[period.kind]
+            return int(positions[k]), int(positions[k + 1])
+        # Fuera del rango de los datos (o periodo no alineado): búsqueda directa
+        return self.time_index.bounds(self._index_time(period.start), self._index_time(period.end))
+
+    def slice(self, period: Period) -> pd.DataFrame:
+        """Filas de un periodo (rebanada posicional, sin copia)."""
+        i, j = self.bounds(period)
+        return self.df.iloc[i:j]
+
+    def range_bounds(self, start=None, end=None) -> Tuple[int, int]:
+        """Posiciones [i, j) de start <= fecha < end, con start/end en hora de la planta."""
+        return self.time_index.bounds(None if start is None else self._index_time(pd.Timestamp(start)),
+                                      None if end is None else self._index_time(pd.Timestamp(end)))
+
+    def slice_range(self, start=None, end=None) -> pd.DataFrame:
+        """Filas con start <= fecha < end (hora de la planta; extremos opcionales)."""
+        i, j = self.range_bounds(start, end)
+        return self.df.iloc[i:j]
+
+    def last_n_days(self, n: int, now=None) -> pd.DataFrame:
+        """Filas de los últimos n días respecto a la hora actual de la planta."""
+        now = self.calendar.now() if now is None else pd.Timestamp(now)
+        return self.slice_range(now - pd.Timedelta(days=n), None)
+
+    def period(self, kind: str, offset: int = 0, now=None) -> Period:
+        """Periodo actual/anterior según el calendario (ver PeriodCalendar.period)."""
+        return self.calendar.period(kind, offset, now)
+
+    def current_and_previous(self, kind: str = 'month', now=None) -> Tuple[Period, Period]:
+        """(periodo actual, periodo anterior) de un tipo."""
+        current = self.calendar.period(kind, 0, now)
+        return current, self.calendar.offset(current, -1)
+
+    def period_start(self, kind: str) -> pd.Series:
+        """Inicio del periodo de cada fila de `df` (alineado con df)."""
+        fechas = local_dates(self.df[self.time_index.date_column], self.calendar.timezone)
+        return self.calendar.period_start(fechas, kind)
+
+
+def get_period_engine(df: pd.DataFrame, date_column: str = 'fecha_produccion') -> PeriodEngine:
+    """
+    Motor de periodos construido una vez por versión de datos.
+
+    Args:
+        df: DataFrame con datos de producción
+        date_column: Columna de fecha
+
+    Returns:
+        PeriodEngine compartido; su `df` es el DataFrame ordenado por fecha
+        (puede ser el mismo objeto si ya venía ordenado: no lo modifiques)
+    """
+    return memoize_frame(df, 'period_engine', lambda: PeriodEngine(df, date_column),
+                         params={'date_column': date_column})
@@ -5,50 +5,404 @@ Este módulo contiene funciones especializadas para análisis de datos de produc
 
 import pandas as pd
 import numpy as np
-from typing import Union, List
+from typing import Union, List, Optional, Tuple
+from utils import metric_kernels as kernels
+
+
+# Medidas aditivas: todo KPI de producción se deriva de sumas y conteos sobre estas columnas
+TONELADAS_COLUMNS = ['toneladas_a_producir', 'toneladas_producidas', 'toneladas_anuladas']
+
+QUALITY_METRICS = {
+    'pdi_mean_agroindustrial': 'durabilidad_pct_qa_agroindustrial',
+    'dureza_mean_agroindustrial': 'dureza_qa_agroindustrial',
+    'fino_mean_agroindustrial': 'finos_pct_qa_agroindustrial',
+}
+
+
+# Filtro perezoso: compone máscaras y agrega sobre arreglos NumPy sin copiar el DataFrame
+
+class ProductionFilter:
+    """
+    Filtro perezoso sobre un DataFrame de producción.
+
+    Cada condición (despachada, Adiflow, periodo, producto) se combina como
+    máscara booleana; las agregaciones leen solo las columnas necesarias y
+    las reducen sobre los valores enmascarados, sin materializar DataFrames
+    intermedios. `to_frame()` materializa el resultado solo si se pide.
+    """
+
+    def __init__(self, df: pd.DataFrame, mask: Optional[np.ndarray] = None):
+        """
+        Args:
+            df: DataFrame con datos de producción
+            mask: Máscara booleana inicial (None = todas las filas)
+        """
+        self.df = df
+        self._mask = mask
+
+    def where(self, cond: Union[pd.Series, np.ndarray]) -> 'ProductionFilter':
+        """Agrega una condición booleana alineada por posición con el DataFrame."""
+        cond = cond.to_numpy(dtype=bool, na_value=False) if isinstance(cond, pd.Series) else np.asarray(cond, dtype=bool)
+        return ProductionFilter(self.df, cond if self._mask is None else self._mask & cond)
+
+    def equals(self, column: str, value) -> 'ProductionFilter':
+        return self.where(self.df[column].to_numpy() == value)
+
+    def isin(self, column: str, values) -> 'ProductionFilter':
+        return self.where(self.df[column].isin(list(values)))
+
+    def despachada(self) -> 'ProductionFilter':
+        return self.equals('order_produccion_despachada', 'Si')
+
+    def con_adiflow(self) -> 'ProductionFilter':
+        return self.equals('tiene_adiflow', 'Con Adiflow')
+
+    def sin_adiflow(self) -> 'ProductionFilter':
+        return self.equals('tiene_adiflow', 'Sin Adiflow')
+
+    def producto(self, nombres: Union[str, List[str]]) -> 'ProductionFilter':
+        if isinstance(nombres, str):
+            return self.equals('nombre_producto', nombres)
+        return self.isin('nombre_producto', nombres)
+
+    def periodo(self, start=None, end=None, date_column: str = 'fecha_produccion') -> 'ProductionFilter':
+        """Filas con start <= fecha < end (cualquiera de los extremos puede omitirse)."""
+        fechas = self.df[date_column]
+        cond = np.ones(len(self.df), dtype=bool)
+        if start is not None:
+            cond &= (fechas >= start).to_numpy()
+        if end is not None:
+            cond &= (fechas < end).to_numpy()
+        return self.where(cond)
+
+    @property
+    def mask(self) -> np.ndarray:
+        return np.ones(len(self.df), dtype=bool) if self._mask is None else self._mask
+
+    def __len__(self) -> int:
+        return len(self.df) if self._mask is None else int(self._mask.sum())
+
+    def values(self, column: str) -> np.ndarray:
+        """Valores de una columna en las filas seleccionadas."""
+        values = self.df[column].to_numpy()
+        return values if self._mask is None else values[self._mask]
+
+    def _float_values(self, column: str) -> np.ndarray:
+        values = self.df[column].to_numpy(dtype=float, na_value=np.nan)
+        return values if self._mask is None else values[self._mask]
+
+    def sum(self, column: str) -> float:
+        """Suma ignorando nulos (igual que pandas `.sum()`)."""
+        return kernels.nansum(self._float_values(column))
+
+    def count(self, column: str) -> int:
+        """Número de valores no nulos."""
+        return int(np.count_nonzero(~np.isnan(self._float_values(column))))
+
+    def mean(self, column: str) -> float:
+        """Promedio ignorando nulos (igual que pandas `.mean()`)."""
+        return kernels.nanmean(self._float_values(column))
+
+    def nunique(self, column: str) -> int:
+        """Número de valores distintos no nulos."""
+        values = self.values(column)
+        return len(pd.unique(values[pd.notna(values)]))
+
+    def diferencia_toneladas(self) -> float:
+        """toneladas a producir - producidas - anuladas en las filas seleccionadas."""
+        return kernels.diferencia_toneladas(*(self._float_values(col) for col in TONELADAS_COLUMNS))
+
+    def sackoff(self) -> float:
+        """Sackoff (%) de las filas seleccionadas; 0 si no hay toneladas producidas."""
+        return kernels.sackoff(*(self._float_values(col) for col in TONELADAS_COLUMNS))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materializa las filas seleccionadas."""
+        return self.df if self._mask is None else self.df[self._mask]
 
 
 def compute_metric_sackoff(df: pd.DataFrame) -> float:
-    cond = df["order_produccion_despachada"] == 'Si'
-    df = df[cond].copy()
-    total_toneladas_a_producir = df["toneladas_a_producir"].sum()
-    total_toneladas_producidas = df["toneladas_producidas"].sum()
-    total_toneladas_anuladas = df["toneladas_anuladas"].sum()
-    diferencia_toneladas = total_toneladas_a_producir - total_toneladas_producidas - total_toneladas_anuladas
-    if total_toneladas_producidas == 0:
-        return 0
-    sackoff = round(diferencia_toneladas / total_toneladas_producidas * 100, 3)
-    return sackoff
+    return ProductionFilter(df).despachada().sackoff()
 
 def compute_metric_pdi_mean_agroindustrial(df: pd.DataFrame) -> float:
-    return round(df["durabilidad_pct_qa_agroindustrial"].mean(), 3)
+    return round(kernels.nanmean(df["durabilidad_pct_qa_agroindustrial"].to_numpy(dtype=float, na_value=np.nan)), 3)
 
 def compute_metric_dureza_mean_agroindustrial(df: pd.DataFrame) -> float:
-    return round(df["dureza_qa_agroindustrial"].mean(), 3)
+    return round(kernels.nanmean(df["dureza_qa_agroindustrial"].to_numpy(dtype=float, na_value=np.nan)), 3)
 
 def compute_metric_fino_mean_agroindustrial(df: pd.DataFrame) -> float:
-    return round(df["finos_pct_qa_agroindustrial"].mean(), 3)
+    return round(kernels.nanmean(df["finos_pct_qa_agroindustrial"].to_numpy(dtype=float, na_value=np.nan)), 3)
 
 def compute_metric_diferencia_toneladas(df):
-    cond = df["order_produccion_despachada"] == 'Si'
-    df = df[cond].copy()
-    total_toneladas_a_producir = df["toneladas_a_producir"].sum()
-    total_toneladas_producidas = df["toneladas_producidas"].sum()
-    total_toneladas_anuladas = df["toneladas_anuladas"].sum()
-    diferencia_toneladas = total_toneladas_a_producir - total_toneladas_producidas - total_toneladas_anuladas
-    return diferencia_toneladas
+    return ProductionFilter(df).despachada().diferencia_toneladas()
 
 # Funciones de filtrado por Adiflow
 
 def filter_con_adiflow(df: pd.DataFrame) -> pd.DataFrame:
-    cond = df["order_produccion_despachada"] == 'Si'
-    df = df[cond].copy()
-    return df[df["tiene_adiflow"] == "Con Adiflow"]
+    return ProductionFilter(df).despachada().con_adiflow().to_frame()
 
 def filter_sin_adiflow(df: pd.DataFrame) -> pd.DataFrame:
-    cond = df["order_produccion_despachada"] == 'Si'
-    df = df[cond].copy()
-    return df[df["tiene_adiflow"] == "Sin Adiflow"]
+    return ProductionFilter(df).despachada().sin_adiflow().to_frame()
+
+
+# Medidas aditivas por grupo
+
+
+def _compact_codes(codes: np.ndarray, n_combinations: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Códigos combinados presentes (ordenados) y grupo 0..n-1 de cada fila."""
+    if n_combinations <= max(4 * len(codes), 1 << 16):
+        present = np.flatnonzero(np.bincount(codes, minlength=n_combinations))
+        remap = np.zeros(n_combinations, dtype=np.int64)
+        remap[present] = np.arange(len(present))
+        return present, remap[codes]
+    group_codes, group_ids = np.unique(codes, return_inverse=True)
+    return group_codes, group_ids.ravel()
+
+
+def compute_additive_measures(df: pd.DataFrame, by: List[Union[str, pd.Series]],
+                              mask: Optional[np.ndarray] = None, return_group_ids: bool = False):
+    """
+    Agrega en una sola pasada las medidas aditivas de las que se derivan los KPIs.
+
+    Las toneladas se suman solo sobre órdenes despachadas (igual que
+    compute_metric_sackoff); las columnas de calidad se acumulan como suma y
+    conteo de valores no nulos sobre todas las filas (igual que los promedios).
+    No se materializan DataFrames intermedios; las sumas por grupo coinciden
+    con las de filtrar cada grupo por separado salvo redondeo de punto
+    flotante en los últimos bits.
+
+    Args:
+        df: DataFrame con datos de producción
+        by: Columnas (o Series alineadas con df) por las que agrupar
+        mask: Máscara booleana opcional para restringir las filas sin copiar el DataFrame
+        return_group_ids: Devolver también la fila del resultado de cada fila
+            agrupada (de la máscara, si la hay)
+
+    Returns:
+        DataFrame indexado por las llaves de agrupación con las medidas aditivas
+        (y el arreglo de grupos por fila si return_group_ids)
+    """
+    rows = np.flatnonzero(mask) if mask is not None else None
+
+    def take(values) -> Union[np.ndarray, pd.Series]:
+        if isinstance(values, pd.Series):
+            # Se factoriza la Serie: en columnas de texto evita convertirla a objetos
+            return values if rows is None else values.iloc[rows]
+        values = np.asarray(values)
+        return values if rows is None else values[rows]
+
+    def take_float(col: str) -> np.ndarray:
+        values = df[col].to_numpy(dtype=float, na_value=np.nan)
+        return values if rows is None else values[rows]
+
+    # Códigos de grupo combinados (los nulos forman su propio grupo)
+    n_rows = len(df) if rows is None else len(rows)
+    names, uniques, codes = [], [], np.zeros(n_rows, dtype=np.int64)
+    n_combinations = 1
+    for key in by:
+        name = key if isinstance(key, str) else key.name
+        key_codes, key_uniques = pd.factorize(take(df[key] if isinstance(key, str) else key),
+                                              use_na_sentinel=False)
+        codes = codes * max(len(key_uniques), 1) + key_codes
+        n_combinations *= max(len(key_uniques), 1)
+        names.append(name)
+        uniques.append(key_uniques)
+    group_codes, group_ids = _compact_codes(codes, n_combinations)
+    n_groups = len(group_codes)
+
+    # Toneladas: solo órdenes despachadas
+    despachada = np.asarray(take(df["order_produccion_despachada"]).to_numpy() == 'Si')
+    toneladas = np.vstack([take_float(col)[despachada] for col in TONELADAS_COLUMNS])
+    measures = dict(zip(TONELADAS_COLUMNS, kernels.grouped_nansum(toneladas, group_ids[despachada], n_groups).T))
+    measures['ordenes_despachadas'] = np.bincount(group_ids[despachada], minlength=n_groups)
+
+    # Calidad: suma y conteo de valores no nulos sobre todas las filas
+    quality = np.vstack([take_float(col) for col in QUALITY_METRICS.values()])
+    quality_sums = kernels.grouped_nansum(quality, group_ids, n_groups)
+    for i, col in enumerate(QUALITY_METRICS.values()):
+        measures[f'{col}_sum'] = quality_sums[:, i]
+        measures[f'{col}_count'] = kernels.grouped_count(quality[i], group_ids, n_groups)
+
+    if not names:
+        result = pd.DataFrame(measures, index=pd.RangeIndex(n_groups))
+        return (result, group_ids) if return_group_ids else result
+
+    # Reconstruir las llaves de cada grupo a partir del código combinado
+    levels = []
+    remainder = group_codes
+    for key_uniques in reversed(uniques):
+        size = max(len(key_uniques), 1)
+        levels.append(pd.Index(key_uniques)[remainder % size])
+        remainder = remainder // size
+    levels.reverse()
+    if len(levels) == 1:
+        index = pd.Index(levels[0], name=names[0])
+    else:
+        index = pd.MultiIndex.from_arrays(levels, names=names)
+    result = pd.DataFrame(measures, index=index)
+    return (result, group_ids) if return_group_ids else result
+
+
+def derive_kpi_arrays(measures) -> dict:
+    """
+    Deriva sackoff, diferencia de toneladas y promedios de calidad a partir de
+    medidas aditivas, con el mismo redondeo que las funciones compute_metric_*.
+
+    Args:
+        measures: DataFrame o dict de arreglos con las columnas de compute_additive_measures
+
+    Returns:
+        Dict columna -> arreglo con los KPIs derivados de cada grupo
+    """
+    def column(name: str) -> np.ndarray:
+        return np.asarray(measures[name], dtype=float)
+
+    a_producir = column('toneladas_a_producir')
+    producidas = column('toneladas_producidas')
+    anuladas = column('toneladas_anuladas')
+    diferencia = a_producir - producidas - anuladas
+
+    sackoff = kernels.sackoff_from_sums(a_producir, producidas, anuladas)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kpis = {
+            'diferencia_toneladas': diferencia,
+            'sackoff': sackoff,
+            'toneladas_a_producir': a_producir,
+            'toneladas_producidas': producidas,
+            'toneladas_anuladas': anuladas,
+            'ordenes_despachadas': np.asarray(measures['ordenes_despachadas']),
+        }
+        for metric, col in QUALITY_METRICS.items():
+            total = column(f'{col}_sum')
+            count = column(f'{col}_count')
+            kpis[metric] = np.round(np.where(count > 0, total / count, np.nan), 3)
+    return kpis
+
+
+def derive_kpi_columns(measures: pd.DataFrame) -> pd.DataFrame:
+    """
+    Deriva los KPIs de derive_kpi_arrays como DataFrame.
+
+    Args:
+        measures: Resultado de compute_additive_measures (o una suma de ellos)
+
+    Returns:
+        DataFrame con una fila por grupo y las columnas de KPIs derivados
+    """
+    return pd.DataFrame(derive_kpi_arrays(measures), index=measures.index)
+
+
+def compute_product_sackoff(df: pd.DataFrame, mask: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """
+    Calcula el sackoff de todos los productos con una sola agregación.
+
+    Args:
+        df: DataFrame con datos de producción
+        mask: Máscara booleana opcional para restringir las filas
+
+    Returns:
+        DataFrame con nombre_producto, sackoff, diferencia_toneladas y
+        total_toneladas_producidas por producto
+    """
+    measures = compute_additive_measures(df, ['nombre_producto'], mask=mask)
+    kpis = derive_kpi_columns(measures)
+    return pd.DataFrame({
+        'nombre_producto': measures.index.to_numpy(),
+        'sackoff': kpis['sackoff'].to_numpy(),
+        'diferencia_toneladas': kpis['diferencia_toneladas'].to_numpy(),
+        'total_toneladas_producidas': kpis['toneladas_producidas'].to_numpy(),
+    })
+
+
+def _select_k(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Posiciones de los k menores valores, ordenadas, usando argpartition.
+
+    Los empates se resuelven por posición, como nsmallest(keep='first'):
+    argpartition solo fija el valor de corte y, entre los candidatos que no
+    lo superan, se ordena por (valor, posición).
+    """
+    k = min(k, len(values))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    cutoff = values[np.argpartition(values, k - 1)[k - 1]]
+    candidates = np.flatnonzero(values <= cutoff)
+    return candidates[np.lexsort((candidates, values[candidates]))][:k]
+
+
+def rank_products_by_sackoff(df: pd.DataFrame, k: int = 5, min_toneladas_producidas: float = 0.0,
+                             mask: Optional[np.ndarray] = None) -> dict:
+    """
+    Ranking de productos por sackoff (top-k y bottom-k) en una sola pasada.
+
+    Args:
+        df: DataFrame con datos de producción
+        k: Número de productos a devolver en cada extremo
+        min_toneladas_producidas: Volumen mínimo despachado para entrar al ranking
+        mask: Máscara booleana opcional para restringir las filas
+
+    Returns:
+        Diccionario con 'mayor_sackoff' (k productos con sackoff más alto) y
+        'menor_sackoff' (k productos con sackoff más bajo), ambos ordenados
+    """
+    products = compute_product_sackoff(df, mask=mask)
+    products = products[products['total_toneladas_producidas'] >= min_toneladas_producidas].reset_index(drop=True)
+    sackoff = products['sackoff'].to_numpy(dtype=float)
+    return {
+        'mayor_sackoff': products.iloc[_select_k(-sackoff, k)].reset_index(drop=True),
+        'menor_sackoff': products.iloc[_select_k(sackoff, k)].reset_index(drop=True),
+    }
+
+
+def compute_rolling_kpis(df: pd.DataFrame, windows: Tuple[int, ...] = (7, 30, 90),
+                         date_column: str = 'fecha_produccion') -> pd.DataFrame:
+    """
+    Calcula KPIs en ventanas móviles de días calendario para cada día.
+
+    Las medidas aditivas se agregan una vez por día, se completan los días sin
+    producción con ceros y cada ventana se obtiene como diferencia de sumas
+    acumuladas, en O(n) sin volver a filtrar el DataFrame por ventana.
+
+    Args:
+        df: DataFrame con datos de producción
+        windows: Tamaños de ventana en días (la ventana incluye el día de la fila)
+        date_column: Columna de fecha
+
+    Returns:
+        DataFrame indexado por día con columnas sackoff_<w>d,
+        pdi_mean_agroindustrial_<w>d, dureza_mean_agroindustrial_<w>d,
+        fino_mean_agroindustrial_<w>d y toneladas_producidas_<w>d
+    """
+    fechas = pd.to_datetime(df[date_column])
+    valid = fechas.notna().to_numpy()
+    columns = [f'{metric}_{w}d' for w in windows
+               for metric in ['sackoff', *QUALITY_METRICS, 'toneladas_producidas']]
+    if not valid.any():
+        return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name=date_column))
+
+    dia = fechas.dt.normalize().rename(date_column)
+    daily = compute_additive_measures(df, [dia], mask=valid)
+    daily.index = pd.DatetimeIndex(daily.index, name=date_column)
+    days = pd.date_range(daily.index.min(), daily.index.max(), freq='D', name=date_column)
+    daily = daily.reindex(days, fill_value=0)
+
+    # Sumas acumuladas con un cero inicial: ventana [i - w + 1, i] = c[i + 1] - c[max(0, i + 1 - w)]
+    values = daily.to_numpy(dtype=float)
+    cumulative = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    end = np.arange(1, len(days) + 1)
+    despachadas = daily.columns.get_loc('ordenes_despachadas')
+
+    result = {}
+    for w in windows:
+        start = np.maximum(end - w, 0)
+        window_sums = pd.DataFrame(cumulative[end] - cumulative[start], index=days, columns=daily.columns)
+        # Sin órdenes despachadas las toneladas son exactamente cero (evita residuos de redondeo)
+        empty = window_sums.iloc[:, despachadas].to_numpy() == 0
+        window_sums.loc[empty, TONELADAS_COLUMNS] = 0.0
+        kpis = derive_kpi_columns(window_sums)
+        for metric in ['sackoff', *QUALITY_METRICS, 'toneladas_producidas']:
+            result[f'{metric}_{w}d'] = kpis[metric].to_numpy()
+    return pd.DataFrame(result, index=days)[columns]
 
 
 def calculate_kpis(df: pd.DataFrame) -> dict:
@@ -61,41 +415,168 @@ def calculate_kpis(df: pd.DataFrame) -> dict:
     Returns:
         Diccionario con KPIs calculados
     """
-    cond = df["order_produccion_despachada"] == 'Si'
-    df = df[cond].copy()
+    despachadas = ProductionFilter(df).despachada()
+    total_toneladas_producidas = despachadas.sum('toneladas_producidas')
+    total_toneladas_anuladas = despachadas.sum('toneladas_anuladas')
     kpis = {
-        'total_toneladas_producidas': df['toneladas_producidas'].sum(),
-        'total_toneladas_anuladas': df['toneladas_anuladas'].sum(),
-        'total_ordenes': df['orden_produccion'].nunique(),
-        'diferencia_toneladas': compute_metric_diferencia_toneladas(df),
-        'sackoff_global': ((df['toneladas_a_producir'].sum() - df['toneladas_producidas'].sum() - 
-                           df['toneladas_anuladas'].sum()) / df['toneladas_producidas'].sum() * 100),
-        'durabilidad_promedio_qa': df['durabilidad_pct_qa_agroindustrial'].mean(),
-        'dureza_promedio_qa': df['dureza_qa_agroindustrial'].mean(),
-        'finos_promedio_qa': df['finos_pct_qa_agroindustrial'].mean()
+        'total_toneladas_producidas': total_toneladas_producidas,
+        'total_toneladas_anuladas': total_toneladas_anuladas,
+        'total_ordenes': despachadas.nunique('orden_produccion'),
+        'diferencia_toneladas': despachadas.diferencia_toneladas(),
+        'sackoff_global': ((despachadas.sum('toneladas_a_producir') - total_toneladas_producidas - 
+                           total_toneladas_anuladas) / total_toneladas_producidas * 100),
+        'durabilidad_promedio_qa': despachadas.mean('durabilidad_pct_qa_agroindustrial'),
+        'dureza_promedio_qa': despachadas.mean('dureza_qa_agroindustrial'),
+        'finos_promedio_qa': despachadas.mean('finos_pct_qa_agroindustrial')
     }
     
     return {k: round(v, 3) for k, v in kpis.items()}
 
 
-def analyze_trends(df: pd.DataFrame, group_col: str = 'mes_produccion') -> pd.DataFrame:
+TREND_KPIS = ['sackoff', 'diferencia_toneladas', 'toneladas_producidas', *QUALITY_METRICS]
+
+
+def period_start(fechas: pd.Series, freq: str = 'M') -> pd.Series:
     """
-    Analiza tendencias temporales de métricas clave.
-    
+    Fecha de inicio del periodo de cada fecha, en hora de la planta.
+
+    Args:
+        fechas: Serie de fechas (con zona horaria: se pasan a la zona de la planta)
+        freq: 'M' (mes de informes: el fiscal, calendario con FISCAL_MONTH_START_DAY=1)
+            o 'W' (semana ISO, lunes)
+
+    Returns:
+        Serie con el inicio del periodo (NaT donde no hay fecha)
+    """
+    # Importación diferida: period_engine depende de data_cache y config
+    from utils.period_engine import PeriodCalendar
+
+    return PeriodCalendar().period_start(fechas, _period_kind(freq))
+
+
+def _period_kind(freq: str) -> str:
+    from utils.period_engine import REPORTING_MONTH
+
+    kinds = {'M': REPORTING_MONTH, 'W': 'week'}
+    if freq not in kinds:
+        raise ValueError(f"Frecuencia no soportada: {freq}. Usa 'M' o 'W'")
+    return kinds[freq]
+
+
+def _period_range(first: pd.Timestamp, last: pd.Timestamp, freq: str = 'M') -> pd.DatetimeIndex:
+    """Inicios de todos los periodos (como period_start) desde el de `first` hasta el de `last`."""
+    from utils.period_engine import PeriodCalendar
+
+    calendar = PeriodCalendar()
+    period = calendar.period_at(_period_kind(freq), first)
+    starts = []
+    while period.start <= last:
+        starts.append(period.start)
+        period = calendar.offset(period, 1)
+    return pd.DatetimeIndex(starts)
+
+
+def analyze_trends(df: pd.DataFrame, group_col: Optional[str] = None, *, freq: str = 'M',
+                   date_column: str = 'fecha_produccion') -> pd.DataFrame:
+    """
+    Analiza tendencias de los KPIs por periodo (mes o semana) y grupo.
+
+    Agrega las medidas aditivas por (grupo, periodo) en una sola pasada,
+    completa los periodos sin producción de cada grupo y calcula para todos
+    los KPIs y grupos a la vez la variación contra el periodo anterior
+    (absoluta y %), la aceleración (segunda diferencia) y la pendiente
+    lineal por periodo de cada grupo.
+
     Args:
         df: DataFrame con datos de producción
-        group_col: Columna para agrupar (por defecto mes_produccion)
-    
+        group_col: Columna de agrupación opcional (p. ej. 'nombre_producto', 'tiene_adiflow')
+        freq: 'M' para meses o 'W' para semanas (lunes a domingo); solo por nombre
+        date_column: Columna de fecha
+
     Returns:
-        DataFrame con análisis de tendencias
+        DataFrame con una fila por (grupo, periodo) con producción, columnas
+        periodo, ordenes_despachadas y, por cada KPI: <kpi>, <kpi>_delta,
+        <kpi>_variacion_pct, <kpi>_aceleracion y <kpi>_pendiente
     """
-    # Calcular variaciones mes a mes
-    cond = df["order_produccion_despachada"] == 'Si'
-    df = df[cond].copy()
-    df['variacion_sackoff'] = df['sackoff'].pct_change() * 100
-    df['variacion_produccion'] = df['total_toneladas_producidas'].pct_change() * 100
-    
-    return df
+    periodo = period_start(df[date_column], freq).rename('periodo')
+    valid = periodo.notna().to_numpy()
+    by = [group_col, periodo] if group_col else [periodo]
+    kpis = derive_kpi_columns(compute_additive_measures(df, by, mask=valid))
+    if kpis.empty:
+        columns = {group_col: pd.Series(dtype=object)} if group_col else {}
+        columns['periodo'] = pd.Series(dtype='datetime64[ns]')
+        columns['ordenes_despachadas'] = pd.Series(dtype=np.int64)
+        for kpi in TREND_KPIS:
+            for suffix in ('', '_delta', '_variacion_pct', '_aceleracion', '_pendiente'):
+                columns[f'{kpi}{suffix}'] = pd.Series(dtype=float)
+        return pd.DataFrame(columns)
+
+    # Rejilla completa grupo x periodo: un periodo sin producción corta la comparación
+    periods = _period_range(kpis.index.get_level_values('periodo').min(),
+                           kpis.index.get_level_values('periodo').max(), freq)
+    if group_col:
+        grid = pd.MultiIndex.from_product([kpis.index.get_level_values(0).unique(), periods],
+                                          names=[group_col, 'periodo'])
+    else:
+        grid = pd.Index(periods, name='periodo')
+    kpis = kpis.reindex(grid)
+    has_data = kpis['ordenes_despachadas'].fillna(0).to_numpy() > 0
+    values = kpis[TREND_KPIS].where(pd.Series(has_data, index=kpis.index), axis=0)
+
+    keys = kpis.index.get_level_values(0) if group_col else np.zeros(len(kpis), dtype=int)
+    grouped = values.groupby(keys, sort=False)
+    delta = grouped.diff()
+    previous = grouped.shift()
+    variacion = (delta / previous.abs() * 100).where(previous != 0)
+    aceleracion = delta.groupby(keys, sort=False).diff()
+
+    # Pendiente por mínimos cuadrados (por periodo) con sumas agrupadas sobre los periodos con datos
+    position = periods.get_indexer(kpis.index.get_level_values('periodo')).astype(float)
+    x = pd.DataFrame(np.repeat(position[:, None], len(TREND_KPIS), axis=1),
+                     index=kpis.index, columns=TREND_KPIS).where(values.notna())
+    sums = pd.concat({'n': values.notna().astype(float), 'x': x, 'y': values, 'xy': x * values, 'xx': x * x},
+                     axis=1).groupby(keys, sort=False).transform('sum')
+    n = sums['n']
+    denominator = n * sums['xx'] - sums['x'] ** 2
+    pendiente = ((n * sums['xy'] - sums['x'] * sums['y']) / denominator).where((n >= 2) & (denominator != 0))
+
+    result = pd.DataFrame({'ordenes_despachadas': kpis['ordenes_despachadas'].fillna(0).astype(np.int64)},
+                          index=kpis.index)
+    for kpi in TREND_KPIS:
+        result[kpi] = values[kpi]
+        result[f'{kpi}_delta'] = delta[kpi].round(6)
+        result[f'{kpi}_variacion_pct'] = variacion[kpi].round(3)
+        result[f'{kpi}_aceleracion'] = aceleracion[kpi].round(6)
+        result[f'{kpi}_pendiente'] = pendiente[kpi].round(6)
+    return result[has_data].reset_index()
+
+
+def summarize_trends(trends: pd.DataFrame, group_col: Optional[str] = None) -> pd.DataFrame:
+    """
+    Resume el resultado de analyze_trends en una fila por grupo.
+
+    Args:
+        trends: Resultado de analyze_trends
+        group_col: La misma columna de agrupación usada en analyze_trends
+
+    Returns:
+        DataFrame con periodos, último periodo, último valor, última variación %
+        y pendiente de cada KPI por grupo
+    """
+    keys = trends[group_col] if group_col else pd.Series(0, index=trends.index)
+    grouped = trends.groupby(keys, sort=False)
+    last = grouped.tail(1)
+    last.index = keys.loc[last.index]
+    summary = pd.DataFrame({
+        'periodos': grouped.size(),
+        'ultimo_periodo': last['periodo'],
+    })
+    for kpi in TREND_KPIS:
+        summary[kpi] = last[kpi]
+        summary[f'{kpi}_variacion_pct'] = last[f'{kpi}_variacion_pct']
+        summary[f'{kpi}_pendiente'] = last[f'{kpi}_pendiente']
+    summary.index.name = group_col
+    return summary.reset_index(drop=not group_col)
 
 
 def detect_anomalies(df: pd.DataFrame, column: str, threshold: float = 2.0) -> pd.DataFrame:
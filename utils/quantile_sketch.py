@@ -0,0 +1,180 @@
+"""
+Resúmenes de cuantiles combinables (t-digest) para las métricas de calidad.
+Un TDigestSet guarda un t-digest por grupo (p. ej. por celda del cubo de
+KPIs) en arreglos planos: construir, combinar grupos y consultar percentiles
+son operaciones vectorizadas sobre todos los grupos a la vez.
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+
+# δ del t-digest: ~δ/2 centroides por grupo; el error es menor en las colas
+DEFAULT_COMPRESSION = 200
+
+
+def _scale(q: np.ndarray, compression: float) -> np.ndarray:
+    """Función de escala k1 del t-digest: centroides más pequeños cerca de q = 0 y q = 1."""
+    return compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1.0, 1.0))
+
+
+def _group_reduce(func, values: np.ndarray, groups: np.ndarray, n_groups: int, fill: float) -> np.ndarray:
+    result = np.full(n_groups, fill)
+    func.at(result, groups, values)
+    return result
+
+
+class TDigestSet:
+    """
+    Un t-digest por grupo, combinable.
+
+    Cada centroide tiene grupo, media y peso. Combinar grupos (roll-up de
+    celdas del cubo, o el mismo grupo calculado en varios bloques de datos)
+    concatena sus centroides y los vuelve a comprimir: el resultado es el
+    resumen del grupo combinado sin volver a leer las filas originales.
+    """
+
+    def __init__(self, groups: np.ndarray, means: np.ndarray, weights: np.ndarray,
+                 minimum: np.ndarray, maximum: np.ndarray, compression: float = DEFAULT_COMPRESSION):
+        """
+        Args:
+            groups: Grupo de cada centroide
+            means, weights: Media y peso de cada centroide
+            minimum, maximum: Mínimo y máximo de cada grupo (NaN si está vacío)
+            compression: δ del t-digest
+        """
+        self.groups = np.asarray(groups, dtype=np.int64)
+        self.means = np.asarray(means, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.minimum = np.asarray(minimum, dtype=float)
+        self.maximum = np.asarray(maximum, dtype=float)
+        self.compression = compression
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.minimum)
+
+    def __len__(self) -> int:
+        return len(self.means)
+
+    @classmethod
+    def from_values(cls, codes: np.ndarray, values: np.ndarray, n_groups: int,
+                    compression: float = DEFAULT_COMPRESSION) -> 'TDigestSet':
+        """
+        Construye los resúmenes de todos los grupos con un solo ordenamiento.
+
+        Args:
+            codes: Grupo de cada valor (negativo = fuera de todo grupo)
+            values: Valores (los NaN se descartan)
+            n_groups: Número de grupos
+            compression: δ del t-digest
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        keep = (codes >= 0) & ~np.isnan(values)
+        codes, values = codes[keep], values[keep]
+        minimum = _group_reduce(np.fmin, values, codes, n_groups, np.nan)
+        maximum = _group_reduce(np.fmax, values, codes, n_groups, np.nan)
+        return cls(codes, values, np.ones_like(values), minimum, maximum, compression)._compress()
+
+    def _compress(self) -> 'TDigestSet':
+        """
+        Reagrupa los centroides de cada grupo según la función de escala.
+
+        Con los centroides ordenados por (grupo, media), cada uno cae en el
+        intervalo entero de k1 de su cuantil central; los de un mismo
+        intervalo se funden en un centroide con su peso y media ponderada.
+        """
+        order = np.lexsort((self.means, self.groups))
+        groups, means, weights = self.groups[order], self.means[order], self.weights[order]
+        totals = np.bincount(groups, weights=weights, minlength=self.n_groups)
+        cumulative = np.cumsum(weights)
+        starts = np.searchsorted(groups, np.arange(self.n_groups))
+        before = np.concatenate([[0.0], cumulative])[starts]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            q = (cumulative - weights / 2 - before[groups]) / totals[groups]
+        bucket = np.floor(_scale(q, self.compression)).astype(np.int64)
+
+        boundaries = np.flatnonzero((np.diff(groups) != 0) | (np.diff(bucket) != 0)) + 1
+        first = np.concatenate([[0], boundaries]) if len(groups) else np.zeros(0, dtype=np.int64)
+        merged_weights = np.add.reduceat(weights, first) if len(groups) else weights
+        merged_sums = np.add.reduceat(weights * means, first) if len(groups) else weights
+        return TDigestSet(groups[first], merged_sums / np.where(merged_weights > 0, merged_weights, 1.0),
+                          merged_weights, self.minimum, self.maximum, self.compression)
+
+    def merge(self, mapping: np.ndarray, n_groups: int) -> 'TDigestSet':
+        """
+        Combina grupos: el grupo g pasa a ser mapping[g] (negativo = se descarta).
+
+        Args:
+            mapping: Grupo de destino de cada grupo actual
+            n_groups: Número de grupos de destino
+        """
+        mapping = np.asarray(mapping, dtype=np.int64)
+        target = mapping[self.groups]
+        keep = target >= 0
+        source = np.flatnonzero(mapping >= 0)
+        minimum = _group_reduce(np.fmin, self.minimum[source], mapping[source], n_groups, np.nan)
+        maximum = _group_reduce(np.fmax, self.maximum[source], mapping[source], n_groups, np.nan)
+        return TDigestSet(target[keep], self.means[keep], self.weights[keep],
+                          minimum, maximum, self.compression)._compress()
+
+    @classmethod
+    def concat(cls, sketches: Sequence['TDigestSet']) -> 'TDigestSet':
+        """
+        Combina resúmenes de los mismos grupos calculados por separado (p. ej. por bloques de filas).
+
+        Args:
+            sketches: TDigestSet con el mismo número de grupos
+        """
+        sketches = list(sketches)
+        if len({sketch.n_groups for sketch in sketches}) != 1:
+            raise ValueError("Los resúmenes deben tener los mismos grupos")
+        return cls(
+            np.concatenate([s.groups for s in sketches]),
+            np.concatenate([s.means for s in sketches]),
+            np.concatenate([s.weights for s in sketches]),
+            np.fmin.reduce([s.minimum for s in sketches]),
+            np.fmax.reduce([s.maximum for s in sketches]),
+            max(s.compression for s in sketches),
+        )._compress()
+
+    def count(self) -> np.ndarray:
+        """Número de valores resumidos en cada grupo."""
+        return np.bincount(self.groups, weights=self.weights, minlength=self.n_groups)
+
+    def quantiles(self, q: Sequence[float]) -> np.ndarray:
+        """
+        Cuantiles de todos los grupos con una sola interpolación.
+
+        Dentro de cada grupo se interpola entre las medias de los centroides
+        (ubicadas en el centro de su peso acumulado) y los extremos mínimo y
+        máximo. Las posiciones de todos los grupos se concatenan como
+        2·grupo + fracción acumulada, así un solo np.interp resuelve todas
+        las consultas.
+
+        Args:
+            q: Cuantiles entre 0 y 1
+
+        Returns:
+            Matriz (grupos × cuantiles); NaN en los grupos vacíos
+        """
+        q = np.asarray(q, dtype=float)
+        if not len(self):
+            return np.full((self.n_groups, len(q)), np.nan)
+        order = np.lexsort((self.means, self.groups))
+        groups, means, weights = self.groups[order], self.means[order], self.weights[order]
+        totals = self.count()
+        cumulative = np.cumsum(weights)
+        before = np.concatenate([[0.0], cumulative])[np.searchsorted(groups, np.arange(self.n_groups))]
+        center = (cumulative - weights / 2 - before[groups]) / totals[groups]
+
+        filled = np.flatnonzero(totals > 0)
+        positions = np.concatenate([2.0 * groups + center, 2.0 * filled, 2.0 * filled + 1])
+        values = np.concatenate([means, self.minimum[filled], self.maximum[filled]])
+        ranking = np.argsort(positions, kind='stable')
+        result = np.interp(2.0 * np.arange(self.n_groups)[:, None] + q[None, :],
+                           positions[ranking], values[ranking])
+        result[totals == 0] = np.nan
+        return result
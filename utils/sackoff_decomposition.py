@@ -0,0 +1,175 @@
+"""
+Descomposición del cambio de sackoff entre dos periodos.
+Separa, para todos los productos a la vez, el efecto de la mezcla de productos,
+el de la adopción de Adiflow dentro de cada producto y el del desempeño
+(tasa de sackoff) de cada combinación producto/Adiflow.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import memoize_kpis
+from utils.period_engine import REPORTING_MONTH, get_period_engine
+from utils.production_metrics import compute_additive_measures
+
+
+MISSING_GROUP = '(sin dato)'
+ADIFLOW_VALUE = 'Con Adiflow'
+PERIODS = ['anterior', 'actual']
+EFFECTS = ['efecto_mix', 'efecto_adopcion', 'efecto_tasa']
+
+
+def _points(value: float) -> float:
+    # + 0.0 evita mostrar -0.0 en efectos nulos
+    return round(float(value), 3) + 0.0
+
+
+def _fill_between(previous: pd.Series, current: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Completa el valor faltante de un periodo con el del otro (sin cambio atribuible)."""
+    return previous.fillna(current).fillna(0.0), current.fillna(previous).fillna(0.0)
+
+
+def decompose_sackoff_change(df: pd.DataFrame, kind: str = REPORTING_MONTH,
+                             current: Optional[Tuple] = None, previous: Optional[Tuple] = None,
+                             group_col: str = 'nombre_producto',
+                             adoption_col: str = 'tiene_adiflow') -> Dict:
+    """
+    Descompone el cambio de sackoff entre dos periodos en mezcla, adopción y tasa.
+
+    El sackoff total es la media de los sackoff de cada celda (producto,
+    Adiflow) ponderada por toneladas producidas: S = Σ_g W_g Σ_a q_ga s_ga,
+    con W_g la participación del producto en la producción, q_ga la
+    participación de cada grupo de Adiflow dentro del producto y s_ga su
+    sackoff. Con la descomposición de punto medio (Δ(xy) = Δx·ȳ + x̄·Δy):
+
+    - efecto_mix = Σ_g ΔW_g · R̄_g, con R_g el sackoff del producto
+    - efecto_adopcion = Σ_g W̄_g Σ_a Δq_ga · s̄_ga
+    - efecto_tasa = Σ_g W̄_g Σ_a q̄_ga · Δs_ga
+
+    Los tres efectos suman exactamente el cambio. Un producto o celda sin
+    producción en uno de los periodos toma el valor del otro periodo, así
+    su aparición o desaparición cuenta solo como mezcla. El residuo
+    recoge las toneladas de celdas sin producción (p = 0), que no tienen tasa
+    propia.
+
+    Args:
+        df: DataFrame con datos de producción
+        kind: Tipo de periodo del calendario ('fiscal_month', 'month', 'week', ...)
+        current: Llave del periodo actual, p. ej. (2025, 6) (por defecto, el periodo en curso)
+        previous: Llave del periodo de comparación (por defecto, el anterior a `current`)
+        group_col: Columna de producto para el efecto mezcla
+        adoption_col: Columna de Adiflow para el efecto adopción
+
+    Returns:
+        Diccionario con periodo_actual, periodo_anterior (etiquetas),
+        sackoff_anterior, sackoff_actual, cambio, efecto_mix, efecto_adopcion,
+        efecto_tasa y residuo (puntos porcentuales de sackoff), y 'productos':
+        DataFrame con la contribución de cada producto ordenado por
+        |efecto_total|
+    """
+    engine = get_period_engine(df)
+    calendar = engine.calendar
+    current = calendar.period(kind) if current is None else calendar.from_key(kind, tuple(current))
+    previous = calendar.offset(current, -1) if previous is None else calendar.from_key(kind, tuple(previous))
+
+    # Una sola agregación sobre las filas de ambos periodos (rebanadas del DataFrame ordenado)
+    data = engine.df
+    codes = np.full(len(data), -1, dtype=np.int8)
+    for code, period in enumerate([previous, current]):
+        start, end = engine.bounds(period)
+        codes[start:end] = code
+    periodo = pd.Series(pd.Categorical.from_codes(codes, PERIODS), name='periodo')
+    keys = [
+        periodo,
+        data[group_col].fillna(MISSING_GROUP).rename(group_col),
+        data[adoption_col].fillna(MISSING_GROUP).rename(adoption_col),
+    ]
+    measures = compute_additive_measures(data, keys, mask=codes >= 0)
+
+    def by_period(values: pd.Series) -> pd.DataFrame:
+        return values.unstack('periodo', fill_value=0.0).reindex(columns=PERIODS, fill_value=0.0)
+
+    producidas = by_period(measures['toneladas_producidas'])
+    diferencia = by_period(measures['toneladas_a_producir'] - measures['toneladas_producidas']
+                           - measures['toneladas_anuladas'])
+
+    # Participaciones y sackoff de cada producto y celda (producto, Adiflow)
+    product_tons = producidas.groupby(level=group_col).sum()
+    total_tons = product_tons.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = product_tons / total_tons.where(total_tons > 0)
+        share = producidas / product_tons.reindex(producidas.index, level=group_col).where(lambda t: t > 0)
+        rate = 100 * diferencia / producidas.where(producidas > 0)
+    weight = weight.fillna(0.0)
+    q0, q1 = _fill_between(share['anterior'], share['actual'])
+    s0, s1 = _fill_between(rate['anterior'], rate['actual'])
+
+    # Sackoff de cada producto como mezcla de sus celdas
+    r0 = (q0 * s0).groupby(level=group_col).sum()
+    r1 = (q1 * s1).groupby(level=group_col).sum()
+    w0, w1 = weight['anterior'], weight['actual']
+    w_mid = ((w0 + w1) / 2).reindex(producidas.index, level=group_col)
+
+    products = pd.DataFrame({
+        'toneladas_anterior': product_tons['anterior'],
+        'toneladas_actual': product_tons['actual'],
+        'peso_anterior': 100 * w0,
+        'peso_actual': 100 * w1,
+        'sackoff_anterior': r0.where(product_tons['anterior'] > 0),
+        'sackoff_actual': r1.where(product_tons['actual'] > 0),
+        'efecto_mix': (w1 - w0) * (r0 + r1) / 2,
+        'efecto_adopcion': (w_mid * (q1 - q0) * (s0 + s1) / 2).groupby(level=group_col).sum(),
+        'efecto_tasa': (w_mid * (q0 + q1) / 2 * (s1 - s0)).groupby(level=group_col).sum(),
+    })
+    adiflow = producidas.xs(ADIFLOW_VALUE, level=adoption_col) if ADIFLOW_VALUE in \
+        producidas.index.get_level_values(adoption_col) else producidas.iloc[:0].droplevel(adoption_col)
+    adiflow = adiflow.reindex(products.index, fill_value=0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        products['adopcion_anterior'] = 100 * adiflow['anterior'] / product_tons['anterior'].where(lambda t: t > 0)
+        products['adopcion_actual'] = 100 * adiflow['actual'] / product_tons['actual'].where(lambda t: t > 0)
+    products['efecto_total'] = products[EFFECTS].sum(axis=1)
+    products = products.iloc[np.argsort(-products['efecto_total'].abs().to_numpy(), kind='stable')]
+
+    sackoff = 100 * diferencia.sum() / total_tons.where(total_tons > 0)
+    sackoff = sackoff.fillna(0.0)
+    effects = products[EFFECTS].sum()
+    cambio = sackoff['actual'] - sackoff['anterior']
+    return {
+        'periodo_actual': current.label,
+        'periodo_anterior': previous.label,
+        'sackoff_anterior': _points(sackoff['anterior']),
+        'sackoff_actual': _points(sackoff['actual']),
+        'cambio': _points(cambio),
+        **{effect: _points(effects[effect]) for effect in EFFECTS},
+        'residuo': _points(cambio - effects.sum()),
+        'productos': products.round(3).reset_index(),
+    }
+
+
+def get_sackoff_decomposition(df: pd.DataFrame, kind: str = REPORTING_MONTH,
+                              current: Optional[Tuple] = None, previous: Optional[Tuple] = None,
+                              group_col: str = 'nombre_producto',
+                              adoption_col: str = 'tiene_adiflow') -> Dict:
+    """
+    Descomposición del cambio de sackoff memorizada por versión de datos y par de periodos.
+
+    Args:
+        df: DataFrame con datos de producción
+        kind, current, previous, group_col, adoption_col: Ver decompose_sackoff_change
+
+    Returns:
+        Copia del diccionario de decompose_sackoff_change
+    """
+    calendar = get_period_engine(df).calendar
+    current_key = calendar.period(kind).key if current is None else tuple(current)
+    previous_key = calendar.offset(calendar.from_key(kind, current_key), -1).key if previous is None \
+        else tuple(previous)
+    params = {'group_col': group_col, 'adoption_col': adoption_col}
+    result = memoize_kpis(
+        df, 'sackoff_decomposition',
+        lambda: decompose_sackoff_change(df, kind, current_key, previous_key, **params),
+        period=(kind, previous_key, current_key), params=params,
+    )
+    return {**result, 'productos': result['productos'].copy()}
@@ -0,0 +1,118 @@
+"""
+Ejecución en paralelo de secciones con dependencias.
+Cada sección es una función cuyos argumentos son los resultados de otras
+secciones; las que no dependen entre sí corren a la vez en un pool de hilos
+(pandas y NumPy liberan el GIL en la mayor parte de su trabajo).
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+
+class Section(NamedTuple):
+    """Función de una sección y nombres de las secciones cuyos resultados recibe, en orden."""
+    func: Callable[..., Any]
+    deps: Tuple[str, ...] = ()
+
+
+class SectionRun(NamedTuple):
+    """
+    Resultados por sección, duración de cada una (s), duración total (s) y
+    duración de la cadena de dependencias más lenta (s), que es el mínimo
+    alcanzable con hilos suficientes.
+    """
+    results: Dict[str, Any]
+    timings: Dict[str, float]
+    total: float
+    critical_path: float
+
+
+def _check_graph(sections: Dict[str, Section]) -> None:
+    """Valida que las dependencias existan y no formen ciclos."""
+    for name, section in sections.items():
+        missing = [dep for dep in section.deps if dep not in sections]
+        if missing:
+            raise ValueError(f"La sección '{name}' depende de secciones inexistentes: {missing}")
+    done, pending = set(), dict(sections)
+    while pending:
+        ready = [name for name, section in pending.items() if all(dep in done for dep in section.deps)]
+        if not ready:
+            raise ValueError(f"Dependencias circulares entre las secciones: {sorted(pending)}")
+        for name in ready:
+            done.add(name)
+            del pending[name]
+
+
+def critical_path(sections: Dict[str, Section], timings: Dict[str, float]) -> float:
+    """Suma de duraciones de la cadena de dependencias más lenta."""
+    finish: Dict[str, float] = {}
+
+    def finish_time(name: str) -> float:
+        if name not in finish:
+            section = sections[name]
+            finish[name] = timings.get(name, 0.0) + max((finish_time(dep) for dep in section.deps), default=0.0)
+        return finish[name]
+
+    return max((finish_time(name) for name in sections), default=0.0)
+
+
+def run_sections(sections: Dict[str, Section], max_workers: Optional[int] = None) -> SectionRun:
+    """
+    Ejecuta las secciones respetando sus dependencias.
+
+    Una sección se lanza en cuanto terminan todas sus dependencias, así el
+    tiempo total queda acotado por la cadena de dependencias más lenta y no
+    por la suma de las secciones. Si una sección falla, no se lanzan más
+    secciones y el error se propaga al terminar las que ya corrían.
+
+    Args:
+        sections: Nombre -> Section
+        max_workers: Hilos del pool (1 o menos = secuencial, en el hilo actual)
+
+    Returns:
+        SectionRun con el resultado y la duración de cada sección
+    """
+    _check_graph(sections)
+    results: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+
+    def timed(name: str) -> Any:
+        section = sections[name]
+        began = time.perf_counter()
+        try:
+            return section.func(*[results[dep] for dep in section.deps])
+        finally:
+            timings[name] = time.perf_counter() - began
+
+    if max_workers is not None and max_workers <= 1:
+        pending = dict(sections)
+        while pending:
+            for name in [n for n, s in pending.items() if all(dep in results for dep in s.deps)]:
+                results[name] = timed(name)
+                del pending[name]
+        return SectionRun(results, timings, time.perf_counter() - start, critical_path(sections, timings))
+
+    pending = dict(sections)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='section') as pool:
+        error = None
+        while pending or running:
+            if error is None:
+                ready = [n for n, s in pending.items() if all(dep in results for dep in s.deps)]
+                for name in ready:
+                    running[pool.submit(timed, name)] = name
+                    del pending[name]
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as exc:
+                    error = error or exc
+        if error is not None:
+            raise error
+    return SectionRun(results, timings, time.perf_counter() - start, critical_path(sections, timings))
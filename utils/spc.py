@@ -0,0 +1,299 @@
+"""
+Control estadístico de procesos (SPC) de las métricas de calidad por producto.
+Límites Shewhart de valores individuales (sigma por rango móvil) y EWMA,
+calculados para todos los productos y métricas con operaciones agrupadas y
+mantenidos como estado aditivo que se actualiza al llegar nuevas órdenes.
+"""
+
+import copy
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import IncrementalStates, memoize_kpis
+from utils.period_engine import get_period_engine
+
+
+# Métricas de calidad bajo control -> nombre para mostrar
+SPC_METRICS = {
+    'durabilidad_pct_qa_agroindustrial': 'Durabilidad (PDI)',
+    'dureza_qa_agroindustrial': 'Dureza',
+    'finos_pct_qa_agroindustrial': 'Finos',
+}
+MISSING_GROUP = '(sin dato)'
+# d2 para rangos móviles de 2 observaciones: sigma = MR̄ / d2
+D2 = 1.128
+SHEWHART_L = 3.0
+EWMA_LAMBDA = 0.2
+EWMA_L = 3.0
+
+STATE_COLUMNS = ['n', 'suma', 'suma_mr', 'n_mr', 'ultimo', 'ewma']
+LIMIT_COLUMNS = [
+    'metrica', 'producto', 'n', 'centro', 'sigma', 'lci', 'lcs',
+    'ewma', 'ewma_lci', 'ewma_lcs', 'estado_ewma',
+]
+
+
+def _empty_state() -> pd.DataFrame:
+    return pd.DataFrame({col: pd.Series(dtype=float) for col in STATE_COLUMNS},
+                        index=pd.MultiIndex.from_arrays([[], []], names=['metrica', 'producto']))
+
+
+class SPCState:
+    """
+    Estado de SPC por (métrica, producto).
+
+    Guarda n, Σx, Σ|rango móvil|, número de rangos, el último valor y el
+    último EWMA de cada serie. Los límites salen de las sumas, así que
+    agregar órdenes nuevas cuesta O(órdenes nuevas) y da el mismo estado
+    que procesar todo el histórico de una vez. Las órdenes deben llegar en
+    orden de fecha: los rangos móviles y el EWMA siguen ese orden.
+    """
+
+    def __init__(self, df: Optional[pd.DataFrame] = None, group_col: str = 'nombre_producto',
+                 date_column: str = 'fecha_produccion', ewma_lambda: float = EWMA_LAMBDA):
+        """
+        Args:
+            df: Órdenes iniciales (opcional)
+            group_col: Columna de producto
+            date_column: Columna de fecha que ordena las órdenes
+            ewma_lambda: Peso de la observación nueva en el EWMA
+        """
+        self.group_col = group_col
+        self.date_column = date_column
+        self.ewma_lambda = ewma_lambda
+        self.state = _empty_state()
+        self.rows = 0
+        self.last_date = None
+        if df is not None:
+            self.add(df)
+
+    def _series_update(self, col: str, rows: pd.DataFrame) -> pd.DataFrame:
+        """Estado de las órdenes nuevas de una métrica, encadenado al estado previo."""
+        values = pd.to_numeric(rows[col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        keep = ~np.isnan(values)
+        products = rows[self.group_col].fillna(MISSING_GROUP).to_numpy()[keep]
+        codes, labels = pd.factorize(products)
+        values = values[keep]
+        if not len(values):
+            return _empty_state()
+
+        # Orden estable por producto: dentro de cada producto se conserva el orden de fecha
+        order = np.argsort(codes, kind='stable')
+        codes, values = codes[order], values[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], len(codes)]
+        position = np.arange(len(codes)) - np.repeat(starts, ends - starts)
+
+        previous = self.state.reindex(pd.MultiIndex.from_product([[col], labels]))
+        prev_last = previous['ultimo'].to_numpy()
+        prev_ewma = previous['ewma'].to_numpy()
+
+        # Rangos móviles dentro del bloque y entre el último valor previo y el primero nuevo
+        moving = np.r_[np.abs(np.diff(values)), 0.0]
+        moving[ends - 1] = 0.0
+        first = values[starts]
+        joint = np.abs(first - prev_last)
+        suma_mr = np.add.reduceat(moving, starts) + np.nan_to_num(joint)
+        n_mr = (ends - starts - 1) + ~np.isnan(prev_last)
+
+        # EWMA agrupado; empieza en la primera observación del producto o sigue el EWMA previo
+        lam = self.ewma_lambda
+        ewma = pd.Series(values).groupby(codes, sort=False).ewm(alpha=lam, adjust=False).mean().to_numpy()
+        offset = np.where(np.isnan(prev_ewma), 0.0, prev_ewma - first)
+        ewma = ewma + (1 - lam) ** (position + 1) * np.repeat(offset, ends - starts)
+
+        return pd.DataFrame({
+            'n': ends - starts,
+            'suma': np.add.reduceat(values, starts),
+            'suma_mr': suma_mr,
+            'n_mr': n_mr,
+            'ultimo': values[ends - 1],
+            'ewma': ewma[ends - 1],
+        }, index=pd.MultiIndex.from_arrays([[col] * len(labels), labels], names=['metrica', 'producto']))
+
+    def add(self, rows: pd.DataFrame) -> 'SPCState':
+        """
+        Agrega órdenes posteriores a las ya procesadas.
+
+        Args:
+            rows: Órdenes nuevas (se ordenan por fecha; las que no tienen fecha se descartan)
+        """
+        fechas = pd.to_datetime(rows[self.date_column])
+        rows = rows[fechas.notna().to_numpy()]
+        fechas = fechas[fechas.notna()]
+        if not fechas.is_monotonic_increasing:
+            order = np.argsort(fechas.to_numpy(), kind='stable')
+            rows, fechas = rows.iloc[order], fechas.iloc[order]
+        if rows.empty:
+            return self
+
+        update = pd.concat([self._series_update(col, rows) for col in SPC_METRICS if col in rows.columns])
+        state = self.state.reindex(self.state.index.union(update.index, sort=False))
+        new = update.reindex(state.index)
+        for col in ['n', 'suma', 'suma_mr', 'n_mr']:
+            state[col] = state[col].fillna(0.0) + new[col].fillna(0.0)
+        for col in ['ultimo', 'ewma']:
+            state[col] = new[col].fillna(state[col])
+        self.state = state
+        self.rows += len(rows)
+        self.last_date = fechas.iloc[-1]
+        return self
+
+    def extends(self, data: pd.DataFrame) -> bool:
+        """
+        True si las primeras filas de `data` (ordenado por fecha) son las ya procesadas.
+
+        Compara el número de filas hasta la última fecha procesada y las
+        sumas de cada métrica, sin volver a recorrer las series.
+        """
+        if self.last_date is None or len(data) < self.rows:
+            return False
+        fechas = data[self.date_column]
+        if fechas.iloc[self.rows - 1] != self.last_date or \
+                (len(data) > self.rows and not fechas.iloc[self.rows] > self.last_date):
+            return False
+        prefix = data.iloc[:self.rows]
+        for col in SPC_METRICS:
+            if col not in prefix.columns:
+                continue
+            values = pd.to_numeric(prefix[col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            totals = self.state.xs(col, level='metrica')[['n', 'suma']].sum() if col in \
+                self.state.index.get_level_values('metrica') else pd.Series({'n': 0.0, 'suma': 0.0})
+            if np.count_nonzero(~np.isnan(values)) != totals['n'] or \
+                    not np.isclose(np.nansum(values), totals['suma'], rtol=1e-9, atol=1e-9):
+                return False
+        return True
+
+    def limits(self) -> pd.DataFrame:
+        """
+        Límites de control actuales de cada (métrica, producto).
+
+        Returns:
+            DataFrame con metrica, producto, n, centro, sigma (MR̄ / d2),
+            lci y lcs (centro ∓ 3σ), ewma (valor actual), ewma_lci y
+            ewma_lcs (límites asintóticos del EWMA) y estado_ewma ('en
+            control', 'alto' o 'bajo'), ordenado por métrica y producto
+        """
+        # Orden fijo: el estado acumulado y el recalculado dan la misma tabla
+        state = self.state.sort_index()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            centro = state['suma'] / state['n']
+            sigma = (state['suma_mr'] / state['n_mr']) / D2
+        width = EWMA_L * sigma * np.sqrt(self.ewma_lambda / (2 - self.ewma_lambda))
+        limits = pd.DataFrame({
+            'n': state['n'].astype(np.int64),
+            'centro': centro,
+            'sigma': sigma,
+            'lci': centro - SHEWHART_L * sigma,
+            'lcs': centro + SHEWHART_L * sigma,
+            'ewma': state['ewma'],
+            'ewma_lci': centro - width,
+            'ewma_lcs': centro + width,
+        })
+        limits['estado_ewma'] = np.select(
+            [limits['ewma'] > limits['ewma_lcs'], limits['ewma'] < limits['ewma_lci']],
+            ['alto', 'bajo'], 'en control')
+        return limits.round(3).reset_index()[LIMIT_COLUMNS]
+
+
+def out_of_control(rows: pd.DataFrame, limits: pd.DataFrame, group_col: str = 'nombre_producto') -> pd.DataFrame:
+    """
+    Órdenes fuera de los límites Shewhart, para todas las métricas a la vez.
+
+    Args:
+        rows: Órdenes a evaluar (p. ej. las de las últimas semanas)
+        limits: Resultado de SPCState.limits
+        group_col: Columna de producto
+
+    Returns:
+        DataFrame con metrica, producto, evaluadas, fuera_control, sobre_lcs,
+        bajo_lci y pct_fuera por serie con órdenes en `rows`
+    """
+    metrics = [col for col in SPC_METRICS if col in rows.columns]
+    long = rows[[group_col] + metrics].melt(id_vars=group_col, var_name='metrica', value_name='valor')
+    long = long.assign(producto=long[group_col].fillna(MISSING_GROUP),
+                       valor=pd.to_numeric(long['valor'], errors='coerce')).dropna(subset=['valor'])
+    long = long.merge(limits[['metrica', 'producto', 'lci', 'lcs']], on=['metrica', 'producto'], how='inner')
+    long['sobre_lcs'] = long['valor'] > long['lcs']
+    long['bajo_lci'] = long['valor'] < long['lci']
+    table = long.groupby(['metrica', 'producto'], sort=False).agg(
+        evaluadas=('valor', 'size'), sobre_lcs=('sobre_lcs', 'sum'), bajo_lci=('bajo_lci', 'sum'))
+    table['fuera_control'] = table['sobre_lcs'] + table['bajo_lci']
+    table['pct_fuera'] = (100 * table['fuera_control'] / table['evaluadas']).round(1)
+    table = table.reset_index()
+    return table[['metrica', 'producto', 'evaluadas', 'fuera_control', 'sobre_lcs', 'bajo_lci', 'pct_fuera']]
+
+
+# Estados recientes: si los datos nuevos solo agregan órdenes, se actualiza en lugar de recalcular
+_states = IncrementalStates()
+
+
+def build_spc_state(df: pd.DataFrame, group_col: str = 'nombre_producto') -> SPCState:
+    """
+    Estado de SPC de todas las órdenes con fecha, incremental respecto del último estado.
+
+    Args:
+        df: DataFrame con datos de producción
+        group_col: Columna de producto
+
+    Returns:
+        SPCState con todas las órdenes de df
+    """
+    data = get_period_engine(df).slice_range()
+    # La copia deja intacto el estado que otra versión de datos pueda tener en caché
+    return _states.build(group_col, lambda previous: previous.extends(data),
+                         lambda previous: copy.copy(previous).add(data.iloc[previous.rows:]),
+                         lambda: SPCState(data, group_col=group_col))
+
+
+def get_spc_limits(df: pd.DataFrame, group_col: str = 'nombre_producto') -> pd.DataFrame:
+    """
+    Límites de control Shewhart y EWMA por métrica y producto, memorizados por versión de datos.
+
+    Args:
+        df: DataFrame con datos de producción
+        group_col: Columna de producto
+
+    Returns:
+        Copia de SPCState.limits
+    """
+    limits = memoize_kpis(df, 'spc_limits', lambda: build_spc_state(df, group_col).limits(),
+                          params={'group_col': group_col})
+    return limits.copy()
+
+
+def get_spc_summary(df: pd.DataFrame, days: int = 28, group_col: str = 'nombre_producto',
+                    metrics: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Límites de control con las órdenes fuera de control de los últimos días.
+
+    Args:
+        df: DataFrame con datos de producción
+        days: Días recientes a evaluar contra los límites
+        group_col: Columna de producto
+        metrics: Métricas a incluir (por defecto, todas las de SPC_METRICS)
+
+    Returns:
+        DataFrame de get_spc_limits con evaluadas, fuera_control, sobre_lcs,
+        bajo_lci y pct_fuera de los últimos `days` días, ordenado por
+        fuera_control
+    """
+    def compute() -> pd.DataFrame:
+        limits = get_spc_limits(df, group_col)
+        recent = out_of_control(get_period_engine(df).last_n_days(days), limits, group_col)
+        summary = limits.merge(recent, on=['metrica', 'producto'], how='left')
+        counts = ['evaluadas', 'fuera_control', 'sobre_lcs', 'bajo_lci']
+        summary[counts] = summary[counts].fillna(0).astype(np.int64)
+        summary['pct_fuera'] = summary['pct_fuera'].fillna(0.0)
+        return summary.sort_values(['fuera_control', 'pct_fuera'], ascending=False, kind='stable') \
+            .reset_index(drop=True)
+
+    # Los últimos días se cuentan desde hoy (hora de la planta): la llave incluye el día
+    today = get_period_engine(df).calendar.period('day').key
+    summary = memoize_kpis(df, 'spc_summary', compute, period=today,
+                           params={'days': days, 'group_col': group_col})
+    if metrics is not None:
+        summary = summary[summary['metrica'].isin(list(metrics))]
+    return summary.copy()
@@ -0,0 +1,120 @@
+"""
+Índice temporal para datos de producción.
+Mantiene el DataFrame ordenado por fecha y corta periodos con búsqueda binaria.
+"""
+
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+DateLike = Union[str, date, datetime, pd.Timestamp]
+
+
+class TimeIndex:
+    """
+    Índice ordenado por fecha que resuelve periodos con searchsorted.
+
+    Las filas sin fecha (NaT) quedan al final y nunca forman parte de un
+    periodo. Los cortes devueltos son rebanadas posicionales (iloc) del
+    DataFrame ordenado, sin copiar los datos.
+    """
+
+    def __init__(self, df: pd.DataFrame, date_column: str = 'fecha_produccion'):
+        """
+        Args:
+            df: DataFrame con datos de producción
+            date_column: Columna de fecha usada como índice temporal
+        """
+        fechas = pd.to_datetime(df[date_column])
+        if not (fechas.is_monotonic_increasing and fechas.notna().all()):
+            # Con zona horaria se ordena por los valores UTC; NaT queda al final en numpy
+            keys = fechas.dt.tz_convert('UTC').dt.tz_localize(None) if fechas.dt.tz is not None else fechas
+            order = np.argsort(keys.to_numpy(), kind='stable')
+            df = df.iloc[order]
+            fechas = fechas.iloc[order]
+
+        if df[date_column].dtype != fechas.dtype:
+            df = df.assign(**{date_column: fechas.to_numpy()})
+
+        self.df = df
+        self.date_column = date_column
+        self._n_valid = int(fechas.notna().sum())
+        self._index = pd.DatetimeIndex(fechas.iloc[:self._n_valid])
+        self._month_bounds: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        self._week_bounds: Dict[Tuple[int, int], Tuple[int, int]] = {}
+
+    @property
+    def tz(self):
+        return self._index.tz
+
+    def _timestamp(self, value: DateLike) -> pd.Timestamp:
+        """Convierte un valor a Timestamp comparable con el índice."""
+        ts = pd.Timestamp(value)
+        if self.tz is not None and ts.tz is None:
+            return ts.tz_localize(self.tz)
+        if self.tz is None and ts.tz is not None:
+            return ts.tz_localize(None)
+        return ts
+
+    def bounds(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> Tuple[int, int]:
+        """
+        Posiciones [i, j) de las filas con start <= fecha < end.
+
+        Args:
+            start: Inicio del periodo (incluido); None para el inicio de los datos
+            end: Fin del periodo (excluido); None para el final de los datos
+
+        Returns:
+            Tupla (inicio, fin) de posiciones en el DataFrame ordenado
+        """
+        i = 0 if start is None else int(self._index.searchsorted(self._timestamp(start), side='left'))
+        j = self._n_valid if end is None else int(self._index.searchsorted(self._timestamp(end), side='left'))
+        return i, max(i, j)
+
+    def slice(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> pd.DataFrame:
+        """Filas con start <= fecha < end."""
+        i, j = self.bounds(start, end)
+        return self.df.iloc[i:j]
+
+    def month_bounds(self, year: int, month: int) -> Tuple[int, int]:
+        """Posiciones [i, j) de un mes calendario (cacheadas)."""
+        key = (year, month)
+        if key not in self._month_bounds:
+            start = pd.Timestamp(year=year, month=month, day=1)
+            self._month_bounds[key] = self.bounds(start, start + pd.offsets.MonthBegin(1))
+        return self._month_bounds[key]
+
+    def month(self, year: int, month: int) -> pd.DataFrame:
+        """Filas de un mes calendario."""
+        i, j = self.month_bounds(year, month)
+        return self.df.iloc[i:j]
+
+    def week_bounds(self, iso_year: int, iso_week: int) -> Tuple[int, int]:
+        """Posiciones [i, j) de una semana ISO, de lunes a domingo (cacheadas)."""
+        key = (iso_year, iso_week)
+        if key not in self._week_bounds:
+            start = pd.Timestamp(date.fromisocalendar(iso_year, iso_week, 1))
+            self._week_bounds[key] = self.bounds(start, start + pd.Timedelta(days=7))
+        return self._week_bounds[key]
+
+    def week(self, iso_year: int, iso_week: int) -> pd.DataFrame:
+        """Filas de una semana ISO."""
+        i, j = self.week_bounds(iso_year, iso_week)
+        return self.df.iloc[i:j]
+
+    def since(self, start: DateLike) -> pd.DataFrame:
+        """Filas con fecha >= start."""
+        return self.slice(start, None)
+
+    def last_n_days(self, n: int, now: Optional[DateLike] = None) -> pd.DataFrame:
+        """Filas de los últimos n días respecto a now (por defecto, la hora actual de la planta)."""
+        if now is None and self.tz is not None:
+            now = pd.Timestamp.now(tz=self.tz)
+        elif now is None:
+            # Importación diferida: period_engine depende de este módulo
+            from utils.period_engine import plant_now
+            now = plant_now()
+        return self.since(pd.Timestamp(now) - pd.Timedelta(days=n))